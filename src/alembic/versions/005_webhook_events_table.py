@@ -0,0 +1,49 @@
+"""webhook_events inbox table
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "005"
+down_revision = "004"
+
+
+def upgrade():
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "gateway", sa.String(50), nullable=False, server_default="mercadopago"
+        ),
+        sa.Column("topic", sa.String(50), nullable=False),
+        sa.Column("resource_id", sa.String(255), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.String(500), nullable=True),
+        sa.Column(
+            "available_at", sa.DateTime(), nullable=False, server_default=sa.func.now()
+        ),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            onupdate=sa.func.now(),
+        ),
+    )
+    op.create_index(
+        "ix_webhook_events_status_available_at",
+        "webhook_events",
+        ["status", "available_at"],
+    )
+
+
+def downgrade():
+    op.drop_table("webhook_events")
@@ -0,0 +1,36 @@
+"""one pending webhook event per resource
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "006"
+down_revision = "005"
+
+
+def upgrade():
+    # Collapse duplicates already waiting in the inbox before enforcing uniqueness
+    op.execute(
+        """
+        DELETE FROM webhook_events a
+        USING webhook_events b
+        WHERE a.status = 'pending' AND b.status = 'pending'
+          AND a.gateway = b.gateway AND a.topic = b.topic AND a.resource_id = b.resource_id
+          AND a.id > b.id
+        """
+    )
+    op.create_index(
+        "uq_webhook_events_pending_resource",
+        "webhook_events",
+        ["gateway", "topic", "resource_id"],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade():
+    op.drop_index("uq_webhook_events_pending_resource", table_name="webhook_events")
@@ -0,0 +1,47 @@
+"""payment_outbox table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "007"
+down_revision = "006"
+
+
+def upgrade():
+    op.create_table(
+        "payment_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "payment_id",
+            sa.Integer(),
+            sa.ForeignKey("payments.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("idempotency_key", sa.String(64), nullable=False, unique=True),
+        sa.Column("request_body", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.String(500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            onupdate=sa.func.now(),
+        ),
+    )
+    op.create_index("ix_payment_outbox_payment_id", "payment_outbox", ["payment_id"])
+    op.create_index(
+        "ix_payment_outbox_status_created_at",
+        "payment_outbox",
+        ["status", "created_at"],
+    )
+
+
+def downgrade():
+    op.drop_table("payment_outbox")
@@ -0,0 +1,21 @@
+"""add mp_customer_email to payment_methods
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "008"
+down_revision = "007"
+
+
+def upgrade():
+    op.add_column(
+        "payment_methods", sa.Column("mp_customer_email", sa.String(255), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("payment_methods", "mp_customer_email")
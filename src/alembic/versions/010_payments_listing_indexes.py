@@ -0,0 +1,49 @@
+"""payments listing indexes
+
+Composite indexes matching GET /payments: every listing is ordered by
+(created_at, id) and optionally filtered by user_id or status, so each filter
+gets an index ending in the sort key and pages are read straight from it.
+They make the single-column user_id and status indexes redundant.
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = "010"
+down_revision = "009"
+
+
+def upgrade():
+    # CONCURRENTLY keeps payments writable while the indexes build on large tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_payments_created_at_id",
+            "payments",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_payments_user_id_created_at_id",
+            "payments",
+            ["user_id", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_payments_status_created_at_id",
+            "payments",
+            ["status", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index("ix_payments_user_id", "payments", postgresql_concurrently=True)
+        op.drop_index("ix_payments_status", "payments", postgresql_concurrently=True)
+
+
+def downgrade():
+    op.create_index("ix_payments_status", "payments", ["status"])
+    op.create_index("ix_payments_user_id", "payments", ["user_id"])
+    op.drop_index("ix_payments_status_created_at_id", "payments")
+    op.drop_index("ix_payments_user_id_created_at_id", "payments")
+    op.drop_index("ix_payments_created_at_id", "payments")
@@ -0,0 +1,92 @@
+"""indexes matching payment method and subscription queries
+
+Saved cards are read per user ordered by (is_default DESC, created_at DESC)
+or filtered on is_default = 1, and subscriptions per user ordered by
+created_at DESC; composite indexes serve both the filter and the sort and
+replace the single-column user_id indexes. A unique partial index enforces
+one default card per user, and mp_customer_id gets an index for lookups by
+MercadoPago customer. Payment listings filtered by external_reference get
+the same (created_at, id) suffix as the other listing indexes.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "011"
+down_revision = "010"
+
+
+def upgrade():
+    # Keep only the newest default card per user before enforcing uniqueness
+    op.execute(
+        """
+        UPDATE payment_methods SET is_default = 0
+        WHERE is_default = 1 AND id NOT IN (
+            SELECT DISTINCT ON (user_id) id FROM payment_methods
+            WHERE is_default = 1
+            ORDER BY user_id, created_at DESC, id DESC
+        )
+        """
+    )
+    # CONCURRENTLY keeps the tables writable while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_payment_methods_user_id_default_created_at",
+            "payment_methods",
+            ["user_id", "is_default", "created_at"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "uq_payment_methods_user_default",
+            "payment_methods",
+            ["user_id"],
+            unique=True,
+            postgresql_where=sa.text("is_default = 1"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_payment_methods_mp_customer_id",
+            "payment_methods",
+            ["mp_customer_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_subscriptions_user_id_created_at",
+            "subscriptions",
+            ["user_id", "created_at"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_payments_external_reference_created_at_id",
+            "payments",
+            ["external_reference", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_payment_methods_user_id",
+            "payment_methods",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_subscriptions_user_id", "subscriptions", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_payments_external_reference", "payments", postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.create_index(
+        "ix_payments_external_reference", "payments", ["external_reference"]
+    )
+    op.create_index("ix_subscriptions_user_id", "subscriptions", ["user_id"])
+    op.create_index("ix_payment_methods_user_id", "payment_methods", ["user_id"])
+    op.drop_index("ix_payments_external_reference_created_at_id", "payments")
+    op.drop_index("ix_subscriptions_user_id_created_at", "subscriptions")
+    op.drop_index("ix_payment_methods_mp_customer_id", "payment_methods")
+    op.drop_index("uq_payment_methods_user_default", "payment_methods")
+    op.drop_index("ix_payment_methods_user_id_default_created_at", "payment_methods")
@@ -0,0 +1,44 @@
+"""subscription billing anchor and renewal index
+
+billing_anchor keeps the start of a subscription's first period so renewals
+compute every period boundary from it. The renewal job looks for authorized
+subscriptions whose current_period_end has passed; (status,
+current_period_end) serves that range scan and replaces the single-column
+status index.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "012"
+down_revision = "011"
+
+
+def upgrade():
+    op.add_column(
+        "subscriptions", sa.Column("billing_anchor", sa.DateTime(), nullable=True)
+    )
+    op.execute(
+        "UPDATE subscriptions SET billing_anchor = current_period_start WHERE current_period_start IS NOT NULL"
+    )
+    # CONCURRENTLY keeps subscriptions writable while the index builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_subscriptions_status_current_period_end",
+            "subscriptions",
+            ["status", "current_period_end"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_subscriptions_status", "subscriptions", postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.create_index("ix_subscriptions_status", "subscriptions", ["status"])
+    op.drop_index("ix_subscriptions_status_current_period_end", "subscriptions")
+    op.drop_column("subscriptions", "billing_anchor")
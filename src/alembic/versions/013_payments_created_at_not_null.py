@@ -0,0 +1,39 @@
+"""payments.created_at NOT NULL
+
+Listings page on (created_at, id) and the cursor carries both, so a payment
+without created_at could not be paged past. Rows that somehow got none take
+their updated_at (or now) before the column is made NOT NULL.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "013"
+down_revision = "012"
+
+
+def upgrade():
+    op.execute(
+        "UPDATE payments SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL"
+    )
+    op.alter_column(
+        "payments",
+        "created_at",
+        existing_type=sa.DateTime(),
+        existing_server_default=sa.func.now(),
+        nullable=False,
+    )
+
+
+def downgrade():
+    op.alter_column(
+        "payments",
+        "created_at",
+        existing_type=sa.DateTime(),
+        existing_server_default=sa.func.now(),
+        nullable=True,
+    )
@@ -0,0 +1,56 @@
+"""payment_outbox next_attempt_at
+
+Recovery re-sends a pending entry once next_attempt_at has passed and pushes
+it out exponentially after each failed re-send, so entries that keep failing
+no longer fill every batch. Existing entries are due at once. (status, next_attempt_at) serves the recovery query and replaces
+(status, created_at).
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "014"
+down_revision = "013"
+
+
+def upgrade():
+    op.add_column(
+        "payment_outbox", sa.Column("next_attempt_at", sa.DateTime(), nullable=True)
+    )
+    op.execute(
+        "UPDATE payment_outbox SET next_attempt_at = COALESCE(created_at, CURRENT_TIMESTAMP)"
+    )
+    op.alter_column(
+        "payment_outbox",
+        "next_attempt_at",
+        existing_type=sa.DateTime(),
+        nullable=False,
+        server_default=sa.func.now(),
+    )
+    # CONCURRENTLY keeps the outbox writable while the index builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_payment_outbox_status_next_attempt_at",
+            "payment_outbox",
+            ["status", "next_attempt_at"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_payment_outbox_status_created_at",
+            "payment_outbox",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    op.create_index(
+        "ix_payment_outbox_status_created_at",
+        "payment_outbox",
+        ["status", "created_at"],
+    )
+    op.drop_index("ix_payment_outbox_status_next_attempt_at", "payment_outbox")
+    op.drop_column("payment_outbox", "next_attempt_at")
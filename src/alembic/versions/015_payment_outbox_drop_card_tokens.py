@@ -0,0 +1,26 @@
+"""drop card tokens from payment_outbox request bodies
+
+The outbox no longer stores the card token of the payment it re-sends;
+bodies written before that are stripped of it.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = "015"
+down_revision = "014"
+
+
+def upgrade():
+    op.execute(
+        "UPDATE payment_outbox SET request_body = (request_body::jsonb - 'token')::text "
+        "WHERE request_body::jsonb ? 'token'"
+    )
+
+
+def downgrade():
+    # The tokens are gone; nothing to restore
+    pass
@@ -0,0 +1,36 @@
+"""idempotency_keys locked_at
+
+An in_progress key whose owner crashed used to block retries until it
+expired. locked_at starts the owner's lease; once IDEMPOTENCY_LOCK_TIMEOUT has
+passed a retry takes the key over.
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "016"
+down_revision = "015"
+
+
+def upgrade():
+    op.add_column(
+        "idempotency_keys", sa.Column("locked_at", sa.DateTime(), nullable=True)
+    )
+    op.execute(
+        "UPDATE idempotency_keys SET locked_at = COALESCE(created_at, CURRENT_TIMESTAMP)"
+    )
+    op.alter_column(
+        "idempotency_keys",
+        "locked_at",
+        existing_type=sa.DateTime(),
+        nullable=False,
+        server_default=sa.func.now(),
+    )
+
+
+def downgrade():
+    op.drop_column("idempotency_keys", "locked_at")
@@ -1,9 +1,21 @@
+import time
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from config import settings
+from db.async_session import dispose_async_engine
 from gateways.mercadopago.exceptions import MercadopagoAPIException
+from observability.logs import configure_logging, stop_logging
+from observability.metrics import HTTP_REQUEST_DURATION, route_template
+from observability.tracing import tracer
+from gateways.mercadopago.transport import close_async_transport, close_transport
+from workers.payment_outbox import PaymentOutboxRecovery
+from workers.payment_status_refresh import PaymentStatusRefresh
+from workers.subscription_renewal import SubscriptionRenewal
+from workers.webhooks import WebhookWorkerPool
 from .v1 import routers
 from .v1.routers.mercadopago import mercado_pago_api_error_handler
 
@@ -40,13 +52,107 @@ async def api_key_middleware(request: Request, call_next):
         return JSONResponse(status_code=401, content={"detail": "unauthorized"})
     return await call_next(request)
 
+
+# Registered after the API key check so it wraps it and also times rejected requests
+@app.middleware("http")
+async def observability_middleware(request: Request, call_next):
+    route = route_template(request)
+    span, token = tracer.start(
+        f"{request.method} {route}", traceparent=request.headers.get("traceparent")
+    )
+    span.set_attribute("http.method", request.method)
+    span.set_attribute("http.route", route)
+    started = time.perf_counter()
+    status = 500
+    error = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if span.sampled:
+            response.headers["traceparent"] = span.traceparent
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        HTTP_REQUEST_DURATION.labels(request.method, route, str(status)).observe(
+            time.perf_counter() - started
+        )
+        span.set_attribute("http.status_code", status)
+        tracer.finish(span, token, error)
+
+
 # routers
 app.include_router(routers.router, prefix="/api/v1", tags=["v1"])
 
+# lifecycle
+app.add_event_handler("startup", configure_logging)
+
+webhook_workers = WebhookWorkerPool()
+payment_outbox_recovery = PaymentOutboxRecovery()
+payment_status_refresh = PaymentStatusRefresh()
+subscription_renewal = SubscriptionRenewal()
+
+
+@app.on_event("startup")
+def start_webhook_workers():
+    if settings.webhook_worker_concurrency > 0:
+        webhook_workers.start()
+
+
+@app.on_event("startup")
+def start_payment_outbox_recovery():
+    if settings.payment_outbox_recovery_interval > 0:
+        payment_outbox_recovery.start()
+
+
+@app.on_event("startup")
+def start_payment_status_refresh():
+    if settings.payment_status_refresh_interval > 0:
+        payment_status_refresh.start()
+
+
+@app.on_event("startup")
+def start_subscription_renewal():
+    if settings.subscription_renewal_interval > 0:
+        subscription_renewal.start()
+
+
+@app.on_event("shutdown")
+def stop_webhook_workers():
+    webhook_workers.stop()
+
+
+@app.on_event("shutdown")
+def stop_payment_outbox_recovery():
+    payment_outbox_recovery.stop()
+
+
+@app.on_event("shutdown")
+def stop_payment_status_refresh():
+    payment_status_refresh.stop()
+
+
+@app.on_event("shutdown")
+def stop_subscription_renewal():
+    subscription_renewal.stop()
+
+
+app.add_event_handler("shutdown", close_transport)
+app.add_event_handler("shutdown", close_async_transport)
+app.add_event_handler("shutdown", dispose_async_engine)
+app.add_event_handler("shutdown", tracer.exporter.shutdown)
+app.add_event_handler("shutdown", stop_logging)
+
 # exception handlers
 app.add_exception_handler(MercadopagoAPIException, mercado_pago_api_error_handler)
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 # Route that lists all available routes in a module
 @app.get("/{module}/")
 def list_routes(module: str):
@@ -1,23 +1,18 @@
-from typing import Generator
-
-from sqlalchemy.orm import Session
-
 from config.settings import settings
-from db.session import SessionLocal
-from gateways.mercadopago.payment_service import MercadopagoPaymentService
-from gateways.mercadopago.subscriptions_service import MercadopagoSubscriptionService
-
-
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from gateways.mercadopago.payment_service import (
+    AsyncMercadopagoPaymentService,
+    MercadopagoPaymentService,
+)
+from gateways.mercadopago.subscriptions_service import (
+    AsyncMercadopagoSubscriptionService,
+    MercadopagoSubscriptionService,
+)
 
 
 def get_mp_subscription_service() -> MercadopagoSubscriptionService:
-    return MercadopagoSubscriptionService(access_token=settings.mercadopago_access_token)
+    return MercadopagoSubscriptionService(
+        access_token=settings.mercadopago_access_token
+    )
 
 
 def get_mp_payment_service() -> MercadopagoPaymentService:
@@ -25,3 +20,18 @@ def get_mp_payment_service() -> MercadopagoPaymentService:
         access_token=settings.mercadopago_access_token,
         checkout_pro_access_token=settings.mercadopago_checkout_pro_access_token,
     )
+
+
+# The async clients share an httpx.AsyncClient bound to the event loop, so these
+# dependencies are coroutines and are resolved on the loop instead of the threadpool.
+async def get_async_mp_subscription_service() -> AsyncMercadopagoSubscriptionService:
+    return AsyncMercadopagoSubscriptionService(
+        access_token=settings.mercadopago_access_token
+    )
+
+
+async def get_async_mp_payment_service() -> AsyncMercadopagoPaymentService:
+    return AsyncMercadopagoPaymentService(
+        access_token=settings.mercadopago_access_token,
+        checkout_pro_access_token=settings.mercadopago_checkout_pro_access_token,
+    )
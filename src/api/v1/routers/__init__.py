@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from .admin import router as admin_router
+from .exports import router as exports_router
 from .mercadopago import router as mercadopago_router
 from .payment_methods import router as payment_methods_router
 from .payments import router as payments_router
@@ -29,3 +31,11 @@ router.include_router(
     webhooks_router,
     prefix="/webhooks",
 )
+router.include_router(
+    exports_router,
+    prefix="/exports",
+)
+router.include_router(
+    admin_router,
+    prefix="/admin",
+)
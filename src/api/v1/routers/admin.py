@@ -0,0 +1,121 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from db.async_session import pool_stats as async_pool_stats
+from db.session import get_db, pool_stats
+from gateways.mercadopago.bin_resolver import bin_resolver_stats
+from gateways.mercadopago.circuit_breaker import gateway_breakers
+from gateways.mercadopago.cache import catalog_cache, customer_emails
+from gateways.mercadopago.installments import installments_quotes
+from gateways.mercadopago.retry import retry_stats
+from gateways.mercadopago.singleflight import gateway_reads
+from gateways.mercadopago.transport import get_async_transport, get_transport
+from observability.tracing import InMemoryExporter, tracer
+from services.webhook_service import WebhookInboxService, webhook_dedup_stats
+from workers.payment_status_refresh import status_refresh_stats
+from workers.subscription_renewal import renewal_stats
+from workers.webhooks import reconciliation_stats
+
+router = APIRouter()
+
+
+@router.get("/gateway/pool")
+async def get_gateway_pool_stats() -> dict[str, Any]:
+    return {
+        "sync": get_transport().stats(),
+        "async": get_async_transport().stats(),
+        "retries": retry_stats.snapshot(),
+    }
+
+
+@router.get("/gateway/breakers")
+async def get_gateway_breakers() -> dict[str, Any]:
+    return gateway_breakers.snapshot()
+
+
+@router.delete("/gateway/breakers")
+async def reset_gateway_breakers() -> dict[str, int]:
+    return {"reset": gateway_breakers.reset()}
+
+
+@router.get("/db/pool")
+async def get_db_pool_stats() -> dict[str, Any]:
+    return {**pool_stats(), "async": async_pool_stats()}
+
+
+@router.get("/gateway/single-flight")
+async def get_single_flight_stats() -> dict[str, int]:
+    return gateway_reads.stats()
+
+
+@router.get("/cache/catalog")
+async def get_catalog_cache_stats() -> dict[str, Any]:
+    return catalog_cache.stats()
+
+
+@router.delete("/cache/catalog")
+async def invalidate_catalog_cache() -> dict[str, int]:
+    return {"invalidated": catalog_cache.invalidate()}
+
+
+@router.get("/cache/customers")
+async def get_customer_cache_stats() -> dict[str, Any]:
+    return customer_emails.stats()
+
+
+@router.delete("/cache/customers")
+async def invalidate_customer_cache() -> dict[str, int]:
+    return {"invalidated": customer_emails.invalidate()}
+
+
+@router.get("/cache/installments")
+async def get_installments_cache_stats() -> dict[str, Any]:
+    return installments_quotes.stats()
+
+
+@router.delete("/cache/installments")
+async def invalidate_installments_cache() -> dict[str, int]:
+    return {"invalidated": installments_quotes.invalidate()}
+
+
+@router.get("/bin-resolver")
+async def get_bin_resolver_stats() -> dict[str, int]:
+    return bin_resolver_stats.snapshot()
+
+
+@router.get("/webhooks/inbox")
+def get_webhook_inbox_stats(db: Session = Depends(get_db)) -> dict[str, Any]:
+    return {
+        "pending": WebhookInboxService(db).pending_count(),
+        **webhook_dedup_stats.snapshot(),
+        "reconciliation": reconciliation_stats.snapshot(),
+    }
+
+
+@router.get("/payments/status-refresh")
+async def get_payment_status_refresh_stats() -> dict[str, Any]:
+    return status_refresh_stats.snapshot()
+
+
+@router.get("/subscriptions/renewal")
+async def get_subscription_renewal_stats() -> dict[str, Any]:
+    return renewal_stats.snapshot()
+
+
+@router.get("/traces")
+async def get_traces(
+    limit: int = 100, trace_id: str | None = None
+) -> list[dict[str, Any]]:
+    """Most recent spans, newest first; only available with TRACING_EXPORTER=memory."""
+    if not isinstance(tracer.exporter, InMemoryExporter):
+        raise HTTPException(
+            status_code=404, detail="in-memory trace exporter is not enabled"
+        )
+    spans = [
+        s
+        for s in reversed(tracer.exporter.spans)
+        if trace_id is None or s.trace_id == trace_id
+    ]
+    return [s.to_dict() for s in spans[:limit]]
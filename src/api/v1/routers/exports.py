@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.async_session import AsyncSessionLocal
+from services.export_service import (
+    FORMATS,
+    payments_query,
+    stream_export,
+    subscriptions_query,
+)
+
+router = APIRouter()
+
+_FORMAT = Query("csv", regex="^(csv|ndjson)$")
+
+
+def _sessions() -> async_sessionmaker:
+    return AsyncSessionLocal
+
+
+def _response(name: str, body, fmt: str) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/payments")
+async def export_payments(
+    format: str = _FORMAT,
+    user_id: str | None = None,
+    status: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    sessions: async_sessionmaker = Depends(_sessions),
+):
+    query = payments_query(
+        user_id=user_id, status=status, created_from=created_from, created_to=created_to
+    )
+    return _response("payments", stream_export(sessions, query, format), format)
+
+
+@router.get("/subscriptions")
+async def export_subscriptions(
+    format: str = _FORMAT,
+    user_id: str | None = None,
+    status: str | None = None,
+    plan_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    sessions: async_sessionmaker = Depends(_sessions),
+):
+    query = subscriptions_query(
+        user_id=user_id,
+        status=status,
+        plan_id=plan_id,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return _response("subscriptions", stream_export(sessions, query, format), format)
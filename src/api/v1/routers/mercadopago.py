@@ -1,3 +1,4 @@
+import math
 from typing import Annotated
 
 from fastapi import APIRouter, Query, Depends, Request
@@ -12,7 +13,10 @@ from gateways.mercadopago.models import (
     TokenResponse,
 )
 from gateways.mercadopago.constants import MIN_BIN_LENGTH
-from gateways.mercadopago.exceptions import MercadopagoAPIException
+from gateways.mercadopago.exceptions import (
+    MercadopagoAPIException,
+    MercadopagoCircuitOpenError,
+)
 from gateways.mercadopago.services import MercadopagoService
 
 
@@ -22,12 +26,16 @@ router = APIRouter()
 async def mercado_pago_api_error_handler(
     request: Request, exc: MercadopagoAPIException
 ):
+    headers = None
+    if isinstance(exc, MercadopagoCircuitOpenError):
+        headers = {"Retry-After": str(math.ceil(exc.retry_after))}
     return JSONResponse(
         status_code=exc.status_code,
         content={
             "code": exc.error_code,
             "message": exc.error_msg,
         },
+        headers=headers,
     )
 
 
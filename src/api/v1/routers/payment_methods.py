@@ -1,10 +1,21 @@
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from api.v1.dependencies.subscriptions import get_db, get_mp_payment_service
-from gateways.mercadopago.payment_service import MercadopagoPaymentService
-from schemas.payment_methods import PaymentMethodCreate, PaymentMethodResponse, PaymentMethodUpdate
-from services.payment_method_service import PaymentMethodService
+from api.v1.dependencies.subscriptions import get_async_mp_payment_service
+from db.async_session import get_async_db
+from db.session import get_db
+from gateways.mercadopago.payment_service import AsyncMercadopagoPaymentService
+from schemas.payment_methods import (
+    PaymentMethodCreate,
+    PaymentMethodResponse,
+    PaymentMethodUpdate,
+)
+from services.payment_method_service import (
+    AsyncPaymentMethodService,
+    DefaultPaymentMethodConflict,
+    PaymentMethodService,
+)
 
 router = APIRouter()
 
@@ -13,14 +24,26 @@ def _service(db: Session = Depends(get_db)) -> PaymentMethodService:
     return PaymentMethodService(db=db)
 
 
+def _async_service(
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncPaymentMethodService:
+    return AsyncPaymentMethodService(db=db)
+
+
+# Saving a card calls MercadoPago, so it is async; the other routes only touch the database.
 @router.post("/", response_model=PaymentMethodResponse)
-def create_payment_method(
+async def create_payment_method(
     user_id: str = Query(...),
     data: PaymentMethodCreate = Body(...),
-    service: PaymentMethodService = Depends(_service),
-    mp: MercadopagoPaymentService = Depends(get_mp_payment_service),
+    service: AsyncPaymentMethodService = Depends(_async_service),
+    mp: AsyncMercadopagoPaymentService = Depends(get_async_mp_payment_service),
 ):
-    payment_method = service.create_payment_method(user_id, data, mp_payment_service=mp)
+    try:
+        payment_method = await service.create_payment_method(
+            user_id, data, mp_payment_service=mp
+        )
+    except DefaultPaymentMethodConflict:
+        raise HTTPException(status_code=409, detail="default_payment_method_conflict")
     return payment_method
 
 
@@ -59,7 +82,10 @@ def update_payment_method(
     data: PaymentMethodUpdate = Body(...),
     service: PaymentMethodService = Depends(_service),
 ):
-    payment_method = service.update_payment_method(payment_method_id, user_id, data)
+    try:
+        payment_method = service.update_payment_method(payment_method_id, user_id, data)
+    except DefaultPaymentMethodConflict:
+        raise HTTPException(status_code=409, detail="default_payment_method_conflict")
     if not payment_method:
         raise HTTPException(status_code=404, detail="payment_method_not_found")
     return payment_method
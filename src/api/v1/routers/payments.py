@@ -1,61 +1,213 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Any, Awaitable, Callable
 
-from api.v1.dependencies.subscriptions import get_db, get_mp_payment_service
-from gateways.mercadopago.exceptions import MercadopagoAPIException
-from gateways.mercadopago.payment_service import MercadopagoPaymentService
-from schemas.payments import PaymentCreate, PaymentResponse, PaymentWithSavedMethodCreate, PreferenceCreate, PreferenceResponse
-from services.payment_service import PaymentService
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.v1.dependencies.subscriptions import get_async_mp_payment_service
+from db.async_session import get_async_db
+from db.models import Payment
+from gateways.mercadopago.exceptions import (
+    MercadopagoAPIException,
+    MercadopagoCircuitOpenError,
+)
+from gateways.mercadopago.payment_service import AsyncMercadopagoPaymentService
+from schemas.payments import (
+    PaymentCreate,
+    PaymentPage,
+    PaymentResponse,
+    PaymentWithSavedMethodCreate,
+    PreferenceCreate,
+    PreferenceResponse,
+)
+from services.idempotency_service import (
+    AsyncIdempotencyService,
+    IdempotencyConflict,
+    idempotency_lock,
+    request_fingerprint,
+)
+from services.payment_service import (
+    AsyncPaymentService,
+    PaymentOutcomeUnknown,
+    PendingHook,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
 
 
 def _service(
-    db: Session = Depends(get_db),
-    mp: MercadopagoPaymentService = Depends(get_mp_payment_service),
-) -> PaymentService:
-    return PaymentService(db=db, mp_payment=mp)
+    db: AsyncSession = Depends(get_async_db),
+    mp: AsyncMercadopagoPaymentService = Depends(get_async_mp_payment_service),
+) -> AsyncPaymentService:
+    return AsyncPaymentService(db=db, mp_payment=mp)
 
 
-@router.post("/", response_model=PaymentResponse)
-def create_payment(
-    data: PaymentCreate,
-    service: PaymentService = Depends(_service),
-):
-    try:
-        payment = service.create_payment(data)
-        return payment
-    except MercadopagoAPIException as e:
-        raise HTTPException(
+def _idempotency(db: AsyncSession = Depends(get_async_db)) -> AsyncIdempotencyService:
+    return AsyncIdempotencyService(db)
+
+
+def _http_error(e: Exception) -> HTTPException:
+    if isinstance(e, MercadopagoAPIException):
+        return HTTPException(
             status_code=e.status_code,
             detail={"code": e.error_code, "message": e.error_msg},
         )
+    if isinstance(e, PaymentOutcomeUnknown):
+        return HTTPException(
+            status_code=504,
+            detail={
+                "code": "payment_outcome_unknown",
+                "message": "MercadoPago did not answer; the payment is completed in the background",
+                "payment_id": e.payment_id,
+            },
+        )
+    return HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/with-saved-method", response_model=PaymentResponse)
-def create_payment_with_saved_method(
-    data: PaymentWithSavedMethodCreate,
-    service: PaymentService = Depends(_service),
+async def _create_once(
+    scope: str,
+    key: str | None,
+    data: PaymentCreate | PaymentWithSavedMethodCreate,
+    idempotency: AsyncIdempotencyService,
+    create: Callable[[PendingHook | None], Awaitable[Payment]],
+) -> Any:
+    """Run ``create``, or replay its stored outcome when ``key`` was already used.
+
+    Successes and errors are both stored. Only failures known to happen
+    before the payment reached MercadoPago (an open circuit, or anything
+    raised before it was sent) release the key so a retry runs again. A 5xx
+    from MercadoPago or a payment whose answer was lost is replayed: outbox
+    recovery may still complete it, and running the request again would
+    charge twice. For the same reason the pending payment is checkpointed on
+    the key, so a retry after this request crashed replays its 504.
+    """
+    if key is None:
+        try:
+            return await create(None)
+        except (ValueError, MercadopagoAPIException, PaymentOutcomeUnknown) as e:
+            raise _http_error(e)
+    fingerprint = request_fingerprint(data.dict())
+    try:
+        async with idempotency_lock(scope, key, idempotency.wait_seconds):
+            stored = await idempotency.begin(scope, key, fingerprint)
+            if stored is None:
+                return await _create_and_store(
+                    scope, key, fingerprint, idempotency, create
+                )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return JSONResponse(
+        status_code=stored.status_code,
+        content=stored.body,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def _create_and_store(
+    scope: str,
+    key: str,
+    fingerprint: str,
+    idempotency: AsyncIdempotencyService,
+    create: Callable[[PendingHook | None], Awaitable[Payment]],
+) -> Any:
+    pending = []
+
+    async def checkpoint(payment: Payment):
+        error = _http_error(PaymentOutcomeUnknown(payment.id))
+        await idempotency.checkpoint(
+            scope, key, error.status_code, {"detail": error.detail}
+        )
+        pending.append(payment.id)
+
+    try:
+        payment = await create(checkpoint)
+    except (ValueError, MercadopagoAPIException, PaymentOutcomeUnknown) as e:
+        error = _http_error(e)
+        if isinstance(e, MercadopagoCircuitOpenError):
+            await idempotency.release(scope, key)
+        else:
+            await idempotency.complete(
+                scope, key, fingerprint, error.status_code, {"detail": error.detail}
+            )
+        raise error
+    except Exception:
+        # Raised before the pending payment was handed to MercadoPago. Once it
+        # was written, recovery will send it, so the key keeps its checkpoint.
+        if not pending:
+            await idempotency.release(scope, key)
+        raise
+    body = jsonable_encoder(PaymentResponse.from_orm(payment))
+    await idempotency.complete(scope, key, fingerprint, 200, body)
+    return body
+
+
+@router.get("/", response_model=PaymentPage)
+async def list_payments(
+    user_id: str | None = None,
+    status: str | None = None,
+    external_reference: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    service: AsyncPaymentService = Depends(_service),
 ):
     try:
-        payment = service.create_payment_with_saved_method(data)
-        return payment
+        items, next_cursor = await service.list_payments(
+            user_id=user_id,
+            status=status,
+            external_reference=external_reference,
+            created_from=created_from,
+            created_to=created_to,
+            cursor=cursor,
+            limit=limit,
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except MercadopagoAPIException as e:
-        raise HTTPException(
-            status_code=e.status_code,
-            detail={"code": e.error_code, "message": e.error_msg},
-        )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.post("/", response_model=PaymentResponse)
+async def create_payment(
+    data: PaymentCreate,
+    idempotency_key: str | None = Header(None),
+    service: AsyncPaymentService = Depends(_service),
+    idempotency: AsyncIdempotencyService = Depends(_idempotency),
+):
+    return await _create_once(
+        "payments",
+        idempotency_key,
+        data,
+        idempotency,
+        lambda on_pending: service.create_payment(data, on_pending),
+    )
+
+
+@router.post("/with-saved-method", response_model=PaymentResponse)
+async def create_payment_with_saved_method(
+    data: PaymentWithSavedMethodCreate,
+    idempotency_key: str | None = Header(None),
+    service: AsyncPaymentService = Depends(_service),
+    idempotency: AsyncIdempotencyService = Depends(_idempotency),
+):
+    return await _create_once(
+        "payments/with-saved-method",
+        idempotency_key,
+        data,
+        idempotency,
+        lambda on_pending: service.create_payment_with_saved_method(data, on_pending),
+    )
 
 
 @router.post("/preferences", response_model=PreferenceResponse)
-def create_preference(
+async def create_preference(
     data: PreferenceCreate,
-    service: PaymentService = Depends(_service),
+    service: AsyncPaymentService = Depends(_service),
 ):
     try:
-        return service.create_preference(data)
+        return await service.create_preference(data)
     except MercadopagoAPIException as e:
         raise HTTPException(
             status_code=e.status_code,
@@ -64,11 +216,11 @@ def create_preference(
 
 
 @router.get("/{payment_id}", response_model=PaymentResponse)
-def get_payment(
+async def get_payment(
     payment_id: int,
-    service: PaymentService = Depends(_service),
+    service: AsyncPaymentService = Depends(_service),
 ):
-    payment = service.get_payment(payment_id)
+    payment = await service.get_payment(payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="payment_not_found")
     return payment
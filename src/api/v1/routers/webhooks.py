@@ -1,62 +1,36 @@
-from fastapi import APIRouter, Request, BackgroundTasks
+from fastapi import APIRouter, Request
+from starlette.concurrency import run_in_threadpool
 
-from config.settings import settings
 from db.session import SessionLocal
-from gateways.mercadopago.payment_service import MercadopagoPaymentService
-from gateways.mercadopago.subscriptions_service import MercadopagoSubscriptionService
-from services.payment_service import PaymentService
-from services.subscription_service import SubscriptionService
+from services.webhook_service import (
+    PAYMENT_TOPICS,
+    SUBSCRIPTION_TOPICS,
+    WebhookInboxService,
+)
 
 router = APIRouter()
 
 
-def _update_subscription_from_mp(gateway_subscription_id: str, status: str):
+def _enqueue(topic: str, resource_id: str, body: dict):
     db = SessionLocal()
     try:
-        mp = MercadopagoSubscriptionService(access_token=settings.mercadopago_access_token)
-        svc = SubscriptionService(db=db, mp_subscription=mp)
-        svc.update_subscription_status(gateway_subscription_id, status)
-    finally:
-        db.close()
-
-
-def _update_payment_from_mp(gateway_payment_id: str, status: str):
-    db = SessionLocal()
-    try:
-        mp = MercadopagoPaymentService(access_token=settings.mercadopago_access_token)
-        svc = PaymentService(db=db, mp_payment=mp)
-        svc.update_payment_status(gateway_payment_id, status)
+        WebhookInboxService(db).enqueue(topic, resource_id, payload=body)
     finally:
         db.close()
 
 
 @router.post("/mercadopago")
-async def mercadopago_webhook(
-    request: Request,
-    background_tasks: BackgroundTasks,
-):
+async def mercadopago_webhook(request: Request):
     body = await request.json()
     topic = body.get("type") or body.get("topic")
     data = body.get("data") or {}
     resource_id = data.get("id") if isinstance(data, dict) else body.get("id")
-    if not resource_id:
+    if not resource_id or not topic:
         return {"ok": False}
-    if topic == "payment":
-        try:
-            mp = MercadopagoPaymentService(access_token=settings.mercadopago_access_token)
-            result = mp.get_payment(str(resource_id))
-            status = result.get("status", "")
-            if status:
-                background_tasks.add_task(_update_payment_from_mp, str(resource_id), status)
-        except Exception:
-            pass
-    elif topic in ("preapproval", "authorized_payment"):
-        try:
-            mp = MercadopagoSubscriptionService(access_token=settings.mercadopago_access_token)
-            result = mp.get_subscription(str(resource_id))
-            status = result.get("status", "")
-            if status:
-                background_tasks.add_task(_update_subscription_from_mp, str(resource_id), status)
-        except Exception:
-            pass
+    # Acknowledged but not stored: no worker would ever process it
+    if topic not in PAYMENT_TOPICS + SUBSCRIPTION_TOPICS:
+        return {"ok": True}
+    # The notification is persisted before acknowledging so it survives restarts;
+    # the webhook workers fetch the resource from MercadoPago and apply it.
+    await run_in_threadpool(_enqueue, str(topic), str(resource_id), body)
     return {"ok": True}
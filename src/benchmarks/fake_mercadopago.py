@@ -0,0 +1,354 @@
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import urlsplit
+
+from gateways.mercadopago.models import (
+    IdentificationType,
+    InstallmentsInfo,
+    PaymentMethod,
+)
+
+
+class FaultProfile:
+    """Latency and error injection applied to every request of the fake server.
+
+    Each response is delayed ``latency_ms`` plus a uniform ``jitter_ms``; a
+    ``slow_rate`` fraction of requests take ``slow_ms`` instead, to model the
+    gateway's long tail. An ``error_rate`` fraction fail with ``error_status``.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def delay(self) -> float:
+        if self.slow_rate and random.random() < self.slow_rate:
+            return self.slow_ms / 1000
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+
+    def fails(self) -> bool:
+        return bool(self.error_rate) and random.random() < self.error_rate
+
+
+class _FakeState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1_000_000_000)
+        self.payments: dict[str, dict[str, Any]] = {}
+        self.payments_by_key: dict[str, dict[str, Any]] = {}
+        self.preapprovals: dict[str, dict[str, Any]] = {}
+        self.requests = 0
+        self.errors = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def create_payment(
+        self, body: dict[str, Any], idempotency_key: str | None
+    ) -> dict[str, Any]:
+        with self._lock:
+            # MercadoPago answers a repeated idempotency key with the original payment
+            if idempotency_key and idempotency_key in self.payments_by_key:
+                return self.payments_by_key[idempotency_key]
+            payment = {
+                "id": next(self._ids),
+                "status": "approved",
+                "status_detail": "accredited",
+                "transaction_amount": body.get("transaction_amount"),
+                "external_reference": body.get("external_reference"),
+                "date_approved": datetime.utcnow().isoformat(),
+            }
+            self.payments[str(payment["id"])] = payment
+            if idempotency_key:
+                self.payments_by_key[idempotency_key] = payment
+            return payment
+
+
+_PAYMENT_METHODS = [
+    PaymentMethod.Config.schema_extra,
+    {
+        **PaymentMethod.Config.schema_extra,
+        "id": "master",
+        "name": "Mastercard",
+        "settings": [
+            {
+                **PaymentMethod.Config.schema_extra["settings"][0],
+                "bin": {
+                    "pattern": "^(5)",
+                    "exclusion_pattern": None,
+                    "installments_pattern": "^(5)",
+                },
+            }
+        ],
+    },
+]
+_INSTALLMENTS = [InstallmentsInfo.Config.schema_extra]
+_IDENTIFICATION_TYPES = [IdentificationType.Config.schema_extra]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeMercadopagoServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def _handle(self, method: str):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        state = self.server.state
+        with state._lock:
+            state.requests += 1
+        time.sleep(self.server.faults.delay())
+        if self.server.faults.fails():
+            with state._lock:
+                state.errors += 1
+            status = self.server.faults.error_status
+            self._reply(
+                status,
+                {
+                    "message": "internal_error",
+                    "error": "internal_error",
+                    "status": status,
+                    "cause": [],
+                },
+            )
+            return
+        try:
+            body = json.loads(raw) if raw and raw[:1] in (b"{", b"[") else {}
+        except ValueError:
+            body = {}
+        path = urlsplit(self.path).path
+        for route_method, pattern, handler in _ROUTES:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                self._reply(200, handler(self, body, *match.groups()))
+                return
+        self._reply(
+            404,
+            {
+                "message": "resource not found",
+                "error": "not_found",
+                "status": 404,
+                "cause": [],
+            },
+        )
+
+    def _reply(self, status: int, payload: Any):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Routes
+
+    def payment_methods(self, body):
+        return _PAYMENT_METHODS
+
+    def search_payment_methods(self, body):
+        return {"results": _PAYMENT_METHODS[:1]}
+
+    def installments(self, body):
+        return _INSTALLMENTS
+
+    def identification_types(self, body):
+        return _IDENTIFICATION_TYPES
+
+    def card_token(self, body):
+        return {"id": uuid.uuid4().hex}
+
+    def create_payment(self, body):
+        return self.server.state.create_payment(
+            body, self.headers.get("X-Idempotency-Key")
+        )
+
+    def get_payment(self, body, payment_id):
+        payment = self.server.state.payments.get(payment_id)
+        return payment or {
+            "id": int(payment_id),
+            "status": "approved",
+            "status_detail": "accredited",
+        }
+
+    def search_customers(self, body):
+        return {"results": [{"id": f"cus-{self.server.state.next_id()}"}]}
+
+    def create_customer(self, body):
+        return {"id": f"cus-{self.server.state.next_id()}", "email": body.get("email")}
+
+    def get_customer(self, body, customer_id):
+        return {"id": customer_id, "email": f"{customer_id}@example.com"}
+
+    def save_card(self, body, customer_id):
+        return {"id": str(self.server.state.next_id()), "customer_id": customer_id}
+
+    def preference(self, body):
+        preference_id = uuid.uuid4().hex
+        return {
+            "id": preference_id,
+            "init_point": f"https://www.mercadopago.com/checkout?pref_id={preference_id}",
+            "sandbox_init_point": f"https://sandbox.mercadopago.com/checkout?pref_id={preference_id}",
+        }
+
+    def create_plan(self, body):
+        return {
+            "id": uuid.uuid4().hex,
+            "status": "active",
+            "reason": body.get("reason"),
+        }
+
+    def create_preapproval(self, body):
+        now = datetime.utcnow().isoformat()
+        preapproval = {
+            "id": uuid.uuid4().hex,
+            "status": "authorized",
+            "date_created": now,
+            "date_approved": now,
+            "payer_email": body.get("payer_email"),
+            "external_reference": body.get("external_reference"),
+        }
+        self.server.state.preapprovals[preapproval["id"]] = preapproval
+        return preapproval
+
+    def get_preapproval(self, body, preapproval_id):
+        return self.server.state.preapprovals.get(preapproval_id) or {
+            "id": preapproval_id,
+            "status": "authorized",
+        }
+
+    def update_preapproval(self, body, preapproval_id):
+        preapproval = {**self.get_preapproval(body, preapproval_id), **body}
+        self.server.state.preapprovals[preapproval_id] = preapproval
+        return preapproval
+
+
+_ROUTES = [
+    (method, re.compile(pattern), handler)
+    for method, pattern, handler in [
+        ("GET", r"/v1/payment_methods", _Handler.payment_methods),
+        ("GET", r"/v1/payment_methods/search", _Handler.search_payment_methods),
+        ("GET", r"/v1/payment_methods/installments", _Handler.installments),
+        ("GET", r"/v1/identification_types", _Handler.identification_types),
+        ("POST", r"/v1/card_tokens", _Handler.card_token),
+        ("POST", r"/v1/payments", _Handler.create_payment),
+        ("GET", r"/v1/payments/([^/]+)", _Handler.get_payment),
+        ("GET", r"/v1/customers/search", _Handler.search_customers),
+        ("POST", r"/v1/customers", _Handler.create_customer),
+        ("GET", r"/v1/customers/([^/]+)", _Handler.get_customer),
+        ("POST", r"/v1/customers/([^/]+)/cards", _Handler.save_card),
+        ("POST", r"/checkout/preferences", _Handler.preference),
+        ("POST", r"/preapproval_plan", _Handler.create_plan),
+        ("POST", r"/preapproval", _Handler.create_preapproval),
+        ("GET", r"/preapproval/([^/]+)", _Handler.get_preapproval),
+        ("PUT", r"/preapproval/([^/]+)", _Handler.update_preapproval),
+    ]
+]
+
+
+class FakeMercadopagoServer(ThreadingHTTPServer):
+    """Local stand-in for the MercadoPago endpoints used by this service.
+
+    Point the API at it with ``MP_API_BASE_URL=http://127.0.0.1:<port>``.
+    Responses have the shape of the real API (ids, statuses, the model
+    examples for catalog endpoints) but no validation is performed.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, faults: FaultProfile | None = None
+    ):
+        super().__init__((host, port), _Handler)
+        self.faults = faults or FaultProfile()
+        self.state = _FakeState()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeMercadopagoServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="fake-mercadopago", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict[str, int]:
+        with self.state._lock:
+            return {"requests": self.state.requests, "errors": self.state.errors}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Run a local MercadoPago stand-in for load tests."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args(argv)
+    faults = FaultProfile(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+    )
+    server = FakeMercadopagoServer(args.host, args.port, faults)
+    print(f"Fake MercadoPago listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.fake_mercadopago --latency-ms 80 --error-rate 0.01
+    main()
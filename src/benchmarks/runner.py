@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any
+
+import httpx
+
+from .fake_mercadopago import FakeMercadopagoServer, FaultProfile
+from .scenarios import SCENARIOS, Scenario, build_scenarios
+
+API = "/api/v1"
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class ScenarioResult:
+    def __init__(self, name: str, rps: float):
+        self.name = name
+        self.rps = rps
+        self.latencies: list[float] = []
+        self.statuses: Counter[str] = Counter()
+        self.errors = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+
+    def record(self, latency: float, status: int | str):
+        self.latencies.append(latency)
+        self.statuses[str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+
+    def summary(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+        completed = len(ordered)
+        attempted = completed + self.dropped
+        return {
+            "scenario": self.name,
+            "target_rps": self.rps,
+            "requests": completed,
+            "throughput_rps": round(completed / self.elapsed, 2)
+            if self.elapsed
+            else 0.0,
+            "errors": self.errors,
+            "error_rate": round((self.errors + self.dropped) / attempted, 4)
+            if attempted
+            else 0.0,
+            "dropped": self.dropped,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "statuses": dict(self.statuses),
+        }
+
+
+class PoolSampler:
+    """Polls the admin pool endpoints during the run and keeps the peaks."""
+
+    def __init__(self, client: httpx.AsyncClient, interval: float = 1.0):
+        self.client = client
+        self.interval = interval
+        self.first: dict[str, Any] | None = None
+        self.last: dict[str, Any] | None = None
+        self.peaks: Counter[str] = Counter()
+
+    async def sample(self):
+        try:
+            db = (await self.client.get(f"{API}/admin/db/pool")).json()
+            gateway = (await self.client.get(f"{API}/admin/gateway/pool")).json()
+        except (httpx.HTTPError, ValueError):
+            return
+        current = {"db": db, "gateway": gateway}
+        if self.first is None:
+            self.first = current
+        self.last = current
+        for key, value in (
+            ("db_checked_out", db.get("checked_out", 0)),
+            ("db_overflow", db.get("overflow", 0)),
+            ("db_async_checked_out", db.get("async", {}).get("checked_out", 0)),
+            ("db_async_overflow", db.get("async", {}).get("overflow", 0)),
+            ("gateway_async_in_flight", gateway.get("async", {}).get("in_flight", 0)),
+        ):
+            self.peaks[key] = max(self.peaks[key], value)
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            await self.sample()
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        await self.sample()
+
+    def summary(self) -> dict[str, Any]:
+        if self.first is None or self.last is None:
+            return {}
+        first_db, last_db = self.first["db"], self.last["db"]
+        return {
+            "db_pool_size": last_db.get("size"),
+            **dict(self.peaks),
+            "db_checkout_timeouts": last_db.get("timeouts", 0)
+            - first_db.get("timeouts", 0),
+            "db_max_checkout_wait_ms": round(
+                last_db.get("max_wait_seconds", 0.0) * 1000, 2
+            ),
+            "gateway_reuse_ratio": self.last["gateway"]
+            .get("sync", {})
+            .get("reuse_ratio"),
+        }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    rps: float,
+    duration: float,
+    max_in_flight: int,
+) -> ScenarioResult:
+    """Drive ``scenario`` open-loop at ``rps`` for ``duration`` seconds.
+
+    Requests are issued on a fixed schedule whatever the response times, and
+    latency is measured from the scheduled send time, so a stalled server
+    shows up in the percentiles instead of silently lowering the offered load.
+    Requests that would exceed ``max_in_flight`` are counted as dropped.
+    """
+    result = ScenarioResult(scenario.name, rps)
+    in_flight: set[asyncio.Task] = set()
+    started = time.perf_counter()
+
+    async def fire(i: int, scheduled: float):
+        method, path, kwargs = scenario.build(i)
+        try:
+            response = await client.request(method, path, **kwargs)
+            status: int | str = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        result.record(time.perf_counter() - scheduled, status)
+
+    for i in range(int(rps * duration)):
+        scheduled = started + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            result.dropped += 1
+            continue
+        task = asyncio.create_task(fire(i, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def compare(
+    summaries: list[dict[str, Any]], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Regressions of p95/p99 beyond ``tolerance`` (a fraction) against a previous report."""
+    previous = {s["scenario"]: s for s in baseline.get("scenarios", [])}
+    regressions = []
+    for summary in summaries:
+        before = previous.get(summary["scenario"])
+        if before is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if before[key] and summary[key] > before[key] * (1 + tolerance):
+                regressions.append(
+                    f"{summary['scenario']} {key}: {before[key]} -> {summary[key]}"
+                )
+        if summary["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{summary['scenario']} throughput_rps: {before['throughput_rps']} -> {summary['throughput_rps']}"
+            )
+    return regressions
+
+
+def format_report(summaries: list[dict[str, Any]], pools: dict[str, Any]) -> str:
+    columns = (
+        "scenario",
+        "requests",
+        "throughput_rps",
+        "error_rate",
+        "dropped",
+        "p50_ms",
+        "p95_ms",
+        "p99_ms",
+        "max_ms",
+    )
+    rows = [columns] + [tuple(str(s[c]) for c in columns) for s in summaries]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    lines = [
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    ]
+    if pools:
+        lines.append("")
+        lines.extend(f"{key}: {value}" for key, value in pools.items())
+    return "\n".join(lines)
+
+
+async def _wait_until_ready(
+    client: httpx.AsyncClient, api: subprocess.Popen | None, timeout: float = 30.0
+):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get(f"{API}/admin/db/pool")
+            return
+        except httpx.HTTPError:
+            if api is not None and api.poll() is not None:
+                raise RuntimeError(
+                    f"the API process exited with status {api.returncode}"
+                )
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(
+    args: argparse.Namespace, api: subprocess.Popen | None = None
+) -> dict[str, Any]:
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    limits = httpx.Limits(
+        max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight
+    )
+    async with httpx.AsyncClient(
+        base_url=args.base_url, headers=headers, limits=limits, timeout=args.timeout
+    ) as client:
+        await _wait_until_ready(client, api)
+        scenarios = build_scenarios(args.scenario, args.payment_method_id)
+        for scenario in scenarios:
+            await scenario.setup(client)
+        if args.warmup:
+            await asyncio.gather(
+                *(
+                    run_scenario(client, s, args.rps, args.warmup, args.max_in_flight)
+                    for s in scenarios
+                )
+            )
+        sampler = PoolSampler(client)
+        stop = asyncio.Event()
+        sampling = asyncio.create_task(sampler.run(stop))
+        results = await asyncio.gather(
+            *(
+                run_scenario(client, s, args.rps, args.duration, args.max_in_flight)
+                for s in scenarios
+            )
+        )
+        stop.set()
+        await sampling
+    return {
+        "target": {
+            "rps": args.rps,
+            "duration": args.duration,
+            "max_in_flight": args.max_in_flight,
+        },
+        "scenarios": [r.summary() for r in results],
+        "pools": sampler.summary(),
+    }
+
+
+def _spawn_api(args: argparse.Namespace, mp_base_url: str) -> subprocess.Popen:
+    port = args.base_url.rsplit(":", 1)[-1].strip("/")
+    env = {**os.environ, "MP_API_BASE_URL": mp_base_url}
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.main:app",
+            "--port",
+            port,
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Drive the payments API at a target rate and report latency."
+    )
+    parser.add_argument("--base-url", default="http://127.0.0.1:8008")
+    parser.add_argument("--api-key", default=os.environ.get("PAYMENTS_API_KEY", ""))
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="repeatable; defaults to every scenario but saved-method",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=20.0,
+        help="target requests per second, per scenario",
+    )
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--payment-method-id",
+        type=int,
+        help="saved PaymentMethod id for the saved-method scenario",
+    )
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="previous --json report to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed p95/p99/throughput regression",
+    )
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--spawn",
+        action="store_true",
+        help="start the fake MercadoPago and the API locally",
+    )
+    parser.add_argument("--mp-latency-ms", type=float, default=80.0)
+    parser.add_argument("--mp-jitter-ms", type=float, default=40.0)
+    parser.add_argument("--mp-error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    args.scenario = args.scenario or [s for s in SCENARIOS if s != "saved-method"]
+
+    fake_mp = api = None
+    if args.spawn:
+        faults = FaultProfile(
+            latency_ms=args.mp_latency_ms,
+            jitter_ms=args.mp_jitter_ms,
+            error_rate=args.mp_error_rate,
+        )
+        fake_mp = FakeMercadopagoServer(faults=faults).start()
+        api = _spawn_api(args, fake_mp.base_url)
+    try:
+        report = asyncio.run(run(args, api))
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait()
+        if fake_mp is not None:
+            report_mp = fake_mp.stats()
+            fake_mp.stop()
+    if fake_mp is not None:
+        report["mercadopago"] = report_mp
+
+    print(format_report(report["scenarios"], report["pools"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = [
+        f"{s['scenario']} error_rate {s['error_rate']} > {args.max_error_rate}"
+        for s in report["scenarios"]
+        if s["error_rate"] > args.max_error_rate
+    ]
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += compare(report["scenarios"], json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.runner --spawn --scenario payments --rps 50 --duration 60
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import random
+import uuid
+from typing import Any
+
+import httpx
+
+API = "/api/v1"
+# BINs matching the fake server's catalog, so local BIN resolution is exercised
+_BINS = ("450995", "411111", "503175", "542878")
+
+
+class Scenario:
+    """One kind of request driven by the runner.
+
+    ``build`` returns the (method, path, request kwargs) of the ``i``-th
+    request; ``setup`` runs once before the load starts and may create the
+    records the requests depend on.
+    """
+
+    name = ""
+
+    async def setup(self, client: httpx.AsyncClient):
+        pass
+
+    def build(self, i: int) -> tuple[str, str, dict[str, Any]]:
+        raise NotImplementedError
+
+
+class CatalogScenario(Scenario):
+    """Checkout pre-purchase reads: payment methods, BIN lookup, installments and ID types."""
+
+    name = "catalog"
+
+    def build(self, i: int) -> tuple[str, str, dict[str, Any]]:
+        bin = random.choice(_BINS)
+        kind = i % 4
+        if kind == 0:
+            return "GET", f"{API}/mercadopago/payment_methods", {}
+        if kind == 1:
+            return "GET", f"{API}/mercadopago/payment_method", {"params": {"bin": bin}}
+        if kind == 2:
+            amount = random.choice((1000, 2500, 5900, 12000))
+            return (
+                "GET",
+                f"{API}/mercadopago/installments",
+                {"params": {"bin": bin, "amount": amount}},
+            )
+        return "GET", f"{API}/mercadopago/identification_types", {}
+
+
+class PaymentsScenario(Scenario):
+    name = "payments"
+
+    def build(self, i: int) -> tuple[str, str, dict[str, Any]]:
+        body = {
+            "transaction_amount": round(random.uniform(100, 20000), 2),
+            "token": uuid.uuid4().hex,
+            "payment_method_id": "visa",
+            "payer": {"email": f"bench-{i % 1000}@example.com"},
+            "installments": 1,
+            "external_reference": f"bench-{uuid.uuid4().hex}",
+            "user_id": f"bench-{i % 1000}",
+        }
+        return "POST", f"{API}/payments/", {"json": body}
+
+
+class SavedMethodPaymentsScenario(Scenario):
+    """Payments with a saved card; ``payment_method_id`` must exist in the target database."""
+
+    name = "saved-method"
+
+    def __init__(self, payment_method_id: int):
+        self.payment_method_id = payment_method_id
+
+    def build(self, i: int) -> tuple[str, str, dict[str, Any]]:
+        body = {
+            "transaction_amount": round(random.uniform(100, 20000), 2),
+            "payment_method_id": self.payment_method_id,
+            "payer": {"email": "bench-saved@example.com"},
+            "installments": 1,
+            "external_reference": f"bench-{uuid.uuid4().hex}",
+            "security_code": "123",
+        }
+        return "POST", f"{API}/payments/with-saved-method", {"json": body}
+
+
+class SubscriptionsScenario(Scenario):
+    name = "subscriptions"
+
+    def __init__(self):
+        self.plan_id: int | None = None
+
+    async def setup(self, client: httpx.AsyncClient):
+        response = await client.post(
+            f"{API}/subscriptions/plans",
+            json={
+                "name": f"bench-{uuid.uuid4().hex[:8]}",
+                "amount": 4999.0,
+                "interval": "month",
+            },
+        )
+        response.raise_for_status()
+        self.plan_id = response.json()["id"]
+
+    def build(self, i: int) -> tuple[str, str, dict[str, Any]]:
+        body = {
+            "plan_id": self.plan_id,
+            "user_id": f"bench-{uuid.uuid4().hex}",
+            "payer_email": f"bench-{i % 1000}@example.com",
+            "card_token_id": uuid.uuid4().hex,
+        }
+        return "POST", f"{API}/subscriptions/subscriptions", {"json": body}
+
+
+class WebhooksScenario(Scenario):
+    """Payment notifications; ``duplicate_rate`` of them redeliver a recent resource id."""
+
+    name = "webhooks"
+
+    def __init__(self, duplicate_rate: float = 0.3):
+        self.duplicate_rate = duplicate_rate
+        self._recent: list[int] = []
+
+    def build(self, i: int) -> tuple[str, str, dict[str, Any]]:
+        if self._recent and random.random() < self.duplicate_rate:
+            resource_id = random.choice(self._recent)
+        else:
+            resource_id = random.randint(10**9, 2 * 10**9)
+            self._recent = [*self._recent[-99:], resource_id]
+        body = {
+            "type": "payment",
+            "action": "payment.updated",
+            "data": {"id": str(resource_id)},
+        }
+        return "POST", f"{API}/webhooks/mercadopago", {"json": body}
+
+
+def build_scenarios(
+    names: list[str], payment_method_id: int | None = None
+) -> list[Scenario]:
+    scenarios: list[Scenario] = []
+    for name in names:
+        if name == "catalog":
+            scenarios.append(CatalogScenario())
+        elif name == "payments":
+            scenarios.append(PaymentsScenario())
+        elif name == "saved-method":
+            if payment_method_id is None:
+                raise ValueError("the saved-method scenario needs --payment-method-id")
+            scenarios.append(SavedMethodPaymentsScenario(payment_method_id))
+        elif name == "subscriptions":
+            scenarios.append(SubscriptionsScenario())
+        elif name == "webhooks":
+            scenarios.append(WebhooksScenario())
+        else:
+            raise ValueError(f"unknown scenario {name!r}")
+    return scenarios
+
+
+SCENARIOS = ("catalog", "payments", "saved-method", "subscriptions", "webhooks")
@@ -0,0 +1,55 @@
+from typing import Any, AsyncGenerator
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config.settings import settings
+
+
+def _connect_args(database_url: str) -> dict[str, Any]:
+    if (
+        settings.db_statement_timeout_ms > 0
+        and make_url(database_url).get_backend_name() == "postgresql"
+    ):
+        return {
+            "server_settings": {
+                "statement_timeout": str(settings.db_statement_timeout_ms)
+            }
+        }
+    return {}
+
+
+# Same pool sizing as the sync engine; asyncpg connections never pin a threadpool thread.
+async_engine = create_async_engine(
+    settings.async_database_url,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_use_lifo=True,
+    connect_args=_connect_args(settings.async_database_url),
+)
+# Attributes cannot be lazily reloaded outside an await, so objects are never expired on commit.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    await async_engine.dispose()
+
+
+def pool_stats() -> dict[str, Any]:
+    pool = async_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import String, bindparam, column, select, update, values
+from sqlalchemy.orm import Session
+
+
+def bulk_update_status(
+    db: Session, model, key: str, updates: dict[str, str]
+) -> dict[str, Any]:
+    """Set ``status`` on every ``model`` row whose ``key`` column is in ``updates``.
+
+    On PostgreSQL this is a single ``UPDATE ... FROM (VALUES ...) RETURNING``;
+    other dialects select the existing keys and run one executemany UPDATE.
+    Does not commit. Returns the number of rows updated and the keys with no
+    matching row.
+    """
+    if not updates:
+        return {"updated": 0, "not_found": []}
+    table = model.__table__
+    key_column = table.c[key]
+    now = datetime.utcnow()
+    if db.get_bind().dialect.name == "postgresql":
+        rows = values(column("key", String), column("status", String), name="v").data(
+            list(updates.items())
+        )
+        result = db.execute(
+            update(table)
+            .where(key_column == rows.c.key)
+            .values(status=rows.c.status, updated_at=now)
+            .returning(key_column)
+        )
+        found = [row[0] for row in result]
+    else:
+        found = [
+            row[0]
+            for row in db.execute(
+                select(key_column).where(key_column.in_(list(updates)))
+            )
+        ]
+        if found:
+            db.execute(
+                update(table)
+                .where(key_column == bindparam("b_key"))
+                .values(status=bindparam("b_status"), updated_at=now),
+                [{"b_key": k, "b_status": updates[k]} for k in set(found)],
+            )
+    found_keys = set(found)
+    return {
+        "updated": len(found),
+        "not_found": [k for k in updates if k not in found_keys],
+    }
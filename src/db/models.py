@@ -1,5 +1,17 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Enum as SQLEnum
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    Enum as SQLEnum,
+    text,
+)
 from sqlalchemy.orm import relationship
 
 from .session import Base
@@ -29,12 +41,14 @@ class Subscription(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     plan_id = Column(Integer, ForeignKey("plans.id"), nullable=False)
-    user_id = Column(String(255), nullable=False, index=True)
+    user_id = Column(String(255), nullable=False)
     gateway = Column(String(50), nullable=False, default="mercadopago")
     gateway_subscription_id = Column(String(255), nullable=True, index=True)
-    status = Column(String(50), nullable=False, default="pending", index=True)
+    status = Column(String(50), nullable=False, default="pending")
     current_period_start = Column(DateTime, nullable=True)
     current_period_end = Column(DateTime, nullable=True)
+    # Start of the first period; every later period boundary is computed from it
+    billing_anchor = Column(DateTime, nullable=True)
     cancel_at_period_end = Column(Integer, default=0)
     cancelled_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -42,6 +56,14 @@ class Subscription(Base):
 
     plan = relationship("Plan", back_populates="subscriptions")
 
+    __table_args__ = (
+        Index("ix_subscriptions_user_id_created_at", "user_id", "created_at"),
+        # Renewal scans for subscriptions in a status whose period already ended
+        Index(
+            "ix_subscriptions_status_current_period_end", "status", "current_period_end"
+        ),
+    )
+
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -51,23 +73,70 @@ class Payment(Base):
     gateway_payment_id = Column(String(255), nullable=True, index=True)
     amount = Column(Float, nullable=False)
     currency = Column(String(3), default="ARS")
-    status = Column(String(50), nullable=False, index=True)
-    user_id = Column(String(255), nullable=True, index=True)
-    external_reference = Column(String(255), nullable=True, index=True)
+    status = Column(String(50), nullable=False)
+    user_id = Column(String(255), nullable=True)
+    external_reference = Column(String(255), nullable=True)
     description = Column(String(500), nullable=True)
+    # NOT NULL: listing cursors are (created_at, id)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Listings are ordered by (created_at, id), optionally filtered by user, status or reference
+        Index("ix_payments_created_at_id", "created_at", "id"),
+        Index("ix_payments_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_payments_status_created_at_id", "status", "created_at", "id"),
+        Index(
+            "ix_payments_external_reference_created_at_id",
+            "external_reference",
+            "created_at",
+            "id",
+        ),
+    )
+
+
+class PaymentOutbox(Base):
+    """Gateway request for a payment, minus its card token, kept until MercadoPago's answer is recorded.
+
+    Written in the same transaction as the pending payment, before the gateway
+    call, so a payment left ``pending`` by a crash can be re-sent with the same
+    idempotency key.
+    """
+
+    __tablename__ = "payment_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    payment_id = Column(
+        Integer,
+        ForeignKey("payments.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    idempotency_key = Column(String(64), nullable=False, unique=True)
+    request_body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(500), nullable=True)
+    # When recovery may re-send a pending entry; pushed out after each failed re-send
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_payment_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
 
 class PaymentMethod(Base):
     __tablename__ = "payment_methods"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String(255), nullable=False, index=True)
+    user_id = Column(String(255), nullable=False)
     gateway = Column(String(50), nullable=False, default="mercadopago")
     card_token_id = Column(String(255), nullable=False)
-    mp_customer_id = Column(String(255), nullable=True)
+    mp_customer_id = Column(String(255), nullable=True, index=True)
     mp_card_id = Column(String(255), nullable=True)
+    mp_customer_email = Column(String(255), nullable=True)
     last_four_digits = Column(String(4), nullable=False)
     payment_method_id = Column(String(50), nullable=False)
     cardholder_name = Column(String(255), nullable=False)
@@ -76,3 +145,81 @@ class PaymentMethod(Base):
     is_default = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Serves both "cards of a user, default first, newest first" and the default-card lookup
+        Index(
+            "ix_payment_methods_user_id_default_created_at",
+            "user_id",
+            "is_default",
+            "created_at",
+        ),
+        # At most one default card per user
+        Index(
+            "uq_payment_methods_user_default",
+            "user_id",
+            unique=True,
+            postgresql_where=text("is_default = 1"),
+            sqlite_where=text("is_default = 1"),
+        ),
+    )
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    gateway = Column(String(50), nullable=False, default="mercadopago")
+    topic = Column(String(50), nullable=False)
+    resource_id = Column(String(255), nullable=False)
+    payload = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(500), nullable=True)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_webhook_events_status_available_at", "status", "available_at"),
+        # At most one pending event per resource; redeliveries coalesce into it
+        Index(
+            "uq_webhook_events_pending_resource",
+            "gateway",
+            "topic",
+            "resource_id",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+
+class IdempotencyKey(Base):
+    """Response to a client request sent with an ``Idempotency-Key`` header.
+
+    The row is inserted ``in_progress`` before the request is handled, so a
+    duplicate arriving meanwhile waits instead of running again, and holds the
+    response once ``completed`` so retries replay it until ``expires_at``.
+    ``locked_at`` starts the owner's lease; a request may checkpoint the
+    response a retry should get should it die before completing.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(100), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False, default="in_progress")
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    locked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
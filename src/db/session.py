@@ -1,20 +1,114 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Generator
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from config.settings import settings
 
 Base = declarative_base()
 
+
+class PoolCheckoutStats:
+    """Thread-safe accumulator for connection checkouts from the database pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, seconds: float, overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.overflow_checkouts += overflow
+            self.total_wait_seconds += seconds
+            if seconds > self.max_wait_seconds:
+                self.max_wait_seconds = seconds
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            avg = self.total_wait_seconds / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "total_wait_seconds": round(self.total_wait_seconds, 6),
+                "avg_wait_seconds": round(avg, 6),
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+
+pool_checkout_stats = PoolCheckoutStats()
+
+
+class _TimedQueuePool(QueuePool):
+    # Time spent here is queueing for a free connection, plus the connect
+    # itself when the pool grows into its overflow.
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_stats.record_timeout()
+            raise
+        pool_checkout_stats.record(
+            time.perf_counter() - started, overflow=self.overflow() > 0
+        )
+        return conn
+
+
+def _connect_args(database_url: str) -> dict[str, Any]:
+    if (
+        settings.db_statement_timeout_ms > 0
+        and make_url(database_url).get_backend_name() == "postgresql"
+    ):
+        return {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return {}
+
+
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,
+    poolclass=_TimedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_use_lifo=True,
+    connect_args=_connect_args(settings.database_url),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# For the background workers, which keep using rows loaded before a commit; expiring
+# them would reload each one with its own SELECT. Anything needing fresh state refreshes it.
+BatchSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 
-def get_db():
+def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def pool_stats() -> dict[str, Any]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **pool_checkout_stats.snapshot(),
+    }
@@ -0,0 +1,102 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from .constants import MAX_BIN_LENGTH
+
+logger = logging.getLogger(__name__)
+
+
+class BinResolverStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unavailable = 0
+        self.builds = 0
+
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "unavailable": self.unavailable,
+                "builds": self.builds,
+            }
+
+
+bin_resolver_stats = BinResolverStats()
+
+
+class BinResolver:
+    """Resolves a card BIN to a payment method from the payment methods catalog.
+
+    Every ``settings[].bin`` pattern and exclusion pattern of the catalog is
+    compiled once, in catalog order. Results are memoized per
+    ``MAX_BIN_LENGTH`` prefix, which is all MercadoPago's BIN patterns look at,
+    so repeated BINs are a dict lookup.
+    """
+
+    def __init__(self, catalog: list[dict[str, Any]], memo_size: int = 50_000):
+        self.memo_size = memo_size
+        self._rules: list[tuple[re.Pattern, re.Pattern | None, dict[str, Any]]] = []
+        self._memo: OrderedDict[str, dict[str, Any] | None] = OrderedDict()
+        self._lock = threading.Lock()
+        for payment_method in catalog:
+            if payment_method.get("status") != "active":
+                continue
+            for setting in payment_method.get("settings") or []:
+                bin_settings = setting.get("bin") or {}
+                if not bin_settings.get("pattern"):
+                    continue
+                try:
+                    pattern = re.compile(bin_settings["pattern"])
+                    exclusion = bin_settings.get("exclusion_pattern")
+                    exclusion = re.compile(exclusion) if exclusion else None
+                except re.error:
+                    logger.warning(
+                        "Skipping invalid BIN pattern for payment method %s",
+                        payment_method.get("id"),
+                    )
+                    continue
+                self._rules.append((pattern, exclusion, payment_method))
+
+    def resolve(self, bin: str) -> dict[str, Any] | None:
+        prefix = bin[:MAX_BIN_LENGTH]
+        with self._lock:
+            if prefix in self._memo:
+                self._memo.move_to_end(prefix)
+                return self._memo[prefix]
+        result = None
+        for pattern, exclusion, payment_method in self._rules:
+            if pattern.match(prefix) and not (exclusion and exclusion.match(prefix)):
+                result = payment_method
+                break
+        with self._lock:
+            self._memo[prefix] = result
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return result
+
+
+_resolvers: dict[str, tuple[list[dict[str, Any]], BinResolver]] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_bin_resolver(public_key: str, catalog: list[dict[str, Any]]) -> BinResolver:
+    """Return the resolver for ``catalog``, rebuilding it when the cached catalog is replaced."""
+    with _resolvers_lock:
+        current = _resolvers.get(public_key)
+        if current is not None and current[0] is catalog:
+            return current[1]
+    resolver = BinResolver(catalog)
+    bin_resolver_stats.incr("builds")
+    with _resolvers_lock:
+        _resolvers[public_key] = (catalog, resolver)
+    return resolver
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class TTLCache:
+    """Bounded in-process cache with TTL, stale-while-revalidate and stale-if-error.
+
+    Fresh entries are served from memory. Entries older than ``ttl`` but within
+    ``stale_ttl`` are still served while a background thread refreshes them,
+    and when a load fails the last known value is served instead of the error.
+    The least recently used entry is evicted once ``maxsize`` is reached.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, stale_ttl: float = 0.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._refreshing: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.load_errors = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now < entry.fresh_until:
+                    self.hits += 1
+                    return entry.value
+                if now < entry.stale_until:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader), daemon=True
+                        ).start()
+                    return entry.value
+            self.misses += 1
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.load_errors += 1
+            if entry is not None:
+                logger.warning(
+                    "%s cache: load failed for %r, serving last known value",
+                    self.name,
+                    key,
+                )
+                return entry.value
+            raise
+        self.set(key, value)
+        return value
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the value for ``key`` while it is fresh, without loading it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry.fresh_until:
+                return None
+            return entry.value
+
+    def set(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = _Entry(
+                value, now + self.ttl, now + self.ttl + self.stale_ttl
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable | None = None) -> int:
+        with self._lock:
+            if key is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            return 1 if self._entries.pop(key, None) is not None else 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "load_errors": self.load_errors,
+            }
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        try:
+            self.set(key, loader())
+        except Exception:
+            with self._lock:
+                self.load_errors += 1
+            logger.warning(
+                "%s cache: background refresh failed for %r",
+                self.name,
+                key,
+                exc_info=True,
+            )
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+# Payment methods and identification types change a few times a year.
+catalog_cache = TTLCache(
+    name="catalog",
+    maxsize=settings.mp_catalog_cache_maxsize,
+    ttl=settings.mp_catalog_cache_ttl,
+    stale_ttl=settings.mp_catalog_cache_stale_ttl,
+)
+
+# A MercadoPago customer's email only changes when the customer is edited;
+# entries are invalidated when a saved payment method for it changes.
+customer_emails = TTLCache(
+    name="customer_emails",
+    maxsize=settings.mp_customer_cache_maxsize,
+    ttl=settings.mp_customer_cache_ttl,
+)
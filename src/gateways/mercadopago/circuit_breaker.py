@@ -0,0 +1,270 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+from config.settings import settings
+
+from .exceptions import MercadopagoCircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# First path segment (after /v1) -> endpoint family sharing a breaker
+_FAMILIES = {
+    "payments": "payments",
+    "checkout": "payments",
+    "customers": "customers",
+    "card_tokens": "card_tokens",
+    "preapproval": "preapproval",
+    "preapproval_plan": "preapproval",
+    "payment_methods": "catalog",
+    "identification_types": "catalog",
+}
+
+
+def endpoint_family(url: str) -> str:
+    segments = [s for s in urlsplit(url).path.split("/") if s]
+    if segments and segments[0] == "v1":
+        segments = segments[1:]
+    return _FAMILIES.get(segments[0], "other") if segments else "other"
+
+
+def is_failure(status_code: int) -> bool:
+    """Whether a response counts against the breaker: 4xx are the caller's fault, not MercadoPago's."""
+    return status_code >= 500 or status_code == 429
+
+
+class _Bucket:
+    __slots__ = ("second", "calls", "failures", "slow")
+
+    def __init__(self, second: int):
+        self.second = second
+        self.calls = 0
+        self.failures = 0
+        self.slow = 0
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one MercadoPago endpoint family.
+
+    Outcomes are aggregated in one-second buckets over the last ``window``
+    seconds. Once at least ``min_requests`` calls were made, a failure rate
+    of ``failure_rate`` or a rate of calls slower than ``slow_call_seconds``
+    of ``slow_call_rate`` opens the breaker: calls fail fast with
+    MercadopagoCircuitOpenError for ``open_seconds``. The breaker then lets
+    ``half_open_probes`` calls through; if all succeed it closes, and any
+    failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_requests: int = 20,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_call_rate: float = 0.8,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: deque[_Bucket] = deque()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Reserve a call, or raise MercadopagoCircuitOpenError while the breaker is open."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = self._clock()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    self.rejected += 1
+                    raise MercadopagoCircuitOpenError(self.name, remaining)
+                self.state = HALF_OPEN
+                self._probes_started = self._probes_succeeded = 0
+                logger.info(
+                    "MercadoPago circuit half-open", extra={"breaker": self.name}
+                )
+            if self._probes_started >= self.half_open_probes:
+                self.rejected += 1
+                raise MercadopagoCircuitOpenError(self.name, self.open_seconds)
+            self._probes_started += 1
+
+    def after_call(self, seconds: float, failed: bool):
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            now = self._clock()
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_probes:
+                        self.state = CLOSED
+                        self._buckets.clear()
+                        logger.info(
+                            "MercadoPago circuit closed", extra={"breaker": self.name}
+                        )
+                return
+            if self.state == OPEN:
+                # A call started before the breaker opened; the window was already judged.
+                return
+            bucket = self._bucket(now)
+            bucket.calls += 1
+            bucket.failures += failed
+            bucket.slow += slow
+            calls, failures, slow_calls = self._totals()
+            if calls >= self.min_requests and (
+                failures / calls >= self.failure_rate
+                or slow_calls / calls >= self.slow_call_rate
+            ):
+                self._open(now)
+
+    def cancel(self):
+        """Release a reserved call that was cancelled before MercadoPago answered."""
+        with self._lock:
+            if (
+                self.state == HALF_OPEN
+                and self._probes_started > self._probes_succeeded
+            ):
+                self._probes_started -= 1
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._buckets.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            if self.state == CLOSED:
+                self._prune(now)
+            calls, failures, slow_calls = self._totals()
+            retry_after = (
+                max(self._opened_at + self.open_seconds - now, 0.0)
+                if self.state == OPEN
+                else 0.0
+            )
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failures": failures,
+                "slow_calls": slow_calls,
+                "failure_rate": round(failures / calls, 4) if calls else 0.0,
+                "retry_after_seconds": round(retry_after, 3),
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self.opened += 1
+        logger.warning("MercadoPago circuit opened", extra={"breaker": self.name})
+
+    def _bucket(self, now: float) -> _Bucket:
+        self._prune(now)
+        second = math.floor(now)
+        if not self._buckets or self._buckets[-1].second != second:
+            self._buckets.append(_Bucket(second))
+        return self._buckets[-1]
+
+    def _prune(self, now: float):
+        oldest = math.floor(now - self.window)
+        while self._buckets and self._buckets[0].second <= oldest:
+            self._buckets.popleft()
+
+    def _totals(self) -> tuple[int, int, int]:
+        calls = failures = slow = 0
+        for bucket in self._buckets:
+            calls += bucket.calls
+            failures += bucket.failures
+            slow += bucket.slow
+        return calls, failures, slow
+
+
+class _DisabledBreaker:
+    def before_call(self):
+        pass
+
+    def after_call(self, seconds: float, failed: bool):
+        pass
+
+    def cancel(self):
+        pass
+
+
+class CircuitBreakerRegistry:
+    """One breaker per endpoint family, created on first use with the configured thresholds."""
+
+    def __init__(self, enabled: bool = True, **options: Any):
+        self.enabled = enabled
+        self.options = options
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._disabled = _DisabledBreaker()
+
+    def get(self, family: str) -> CircuitBreaker:
+        breaker = self._breakers.get(family)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    family, CircuitBreaker(family, **self.options)
+                )
+        return breaker
+
+    def for_url(self, url: str) -> CircuitBreaker | _DisabledBreaker:
+        if not self.enabled:
+            return self._disabled
+        return self.get(endpoint_family(url))
+
+    def reset(self) -> int:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
+        return len(breakers)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            "enabled": self.enabled,
+            "breakers": {name: b.snapshot() for name, b in sorted(breakers.items())},
+        }
+
+
+gateway_breakers = CircuitBreakerRegistry(
+    enabled=settings.mp_breaker_enabled,
+    window=settings.mp_breaker_window,
+    min_requests=settings.mp_breaker_min_requests,
+    failure_rate=settings.mp_breaker_failure_rate,
+    slow_call_seconds=settings.mp_breaker_slow_call_seconds,
+    slow_call_rate=settings.mp_breaker_slow_call_rate,
+    open_seconds=settings.mp_breaker_open_seconds,
+    half_open_probes=settings.mp_breaker_half_open_probes,
+)
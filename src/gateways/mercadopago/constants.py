@@ -1 +1,2 @@
 MIN_BIN_LENGTH = 6
+MAX_BIN_LENGTH = 8
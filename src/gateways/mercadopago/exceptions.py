@@ -11,3 +11,18 @@ class MercadopagoAPIException(Exception):
         super().__init__(
             f"MercadoPago API error: {self.status_code} {self.error_code} {self.error_msg} | body={body}"
         )
+
+
+class MercadopagoCircuitOpenError(MercadopagoAPIException):
+    """Raised without calling MercadoPago while the circuit breaker for an endpoint family is open."""
+
+    def __init__(self, family: str, retry_after: float):
+        self.status_code = 503
+        self.error_code = "circuit_open"
+        self.error_msg = f"MercadoPago {family} endpoints are unavailable, retry later"
+        self.full_body = {}
+        self.family = family
+        self.retry_after = retry_after
+        Exception.__init__(
+            self, f"MercadoPago circuit open for {family}, retry in {retry_after:.1f}s"
+        )
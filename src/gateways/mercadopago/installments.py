@@ -0,0 +1,115 @@
+import copy
+import re
+import threading
+from typing import Any, Callable
+
+from config.settings import settings
+
+from .cache import TTLCache
+from .constants import MAX_BIN_LENGTH
+
+_RECOMMENDED_MESSAGE = re.compile(
+    r"^(\d+) cuotas? de \$ [\d.]+,\d{2} \(\$ [\d.]+,\d{2}\)$"
+)
+
+
+def _format_amount(amount: float) -> str:
+    # MercadoPago formats amounts as "$ 5.900,00" in recommended messages
+    return f"{amount:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def derive_installments(
+    base: list[dict[str, Any]], amount: float
+) -> list[dict[str, Any]] | None:
+    """Re-price a cached installments response for a new amount.
+
+    Only responses whose payer costs carry a plain ``installment_rate`` (no
+    discount), a recommended message in the usual "N cuotas de $ X ($ Y)"
+    shape, and allowed-amount bounds that include ``amount`` can be derived;
+    anything else returns None and the quote is fetched from MercadoPago.
+    """
+    derived = copy.deepcopy(base)
+    for info in derived:
+        for payer_cost in info.get("payer_costs") or []:
+            rate = payer_cost.get("installment_rate")
+            installments = payer_cost.get("installments")
+            message = payer_cost.get("recommended_message") or ""
+            if (
+                not isinstance(rate, (int, float))
+                or not installments
+                or payer_cost.get("discount_rate")
+            ):
+                return None
+            if (
+                not payer_cost.get("min_allowed_amount", 0)
+                <= amount
+                <= payer_cost.get("max_allowed_amount", 0)
+            ):
+                return None
+            if not _RECOMMENDED_MESSAGE.match(message):
+                return None
+            total_amount = round(amount * (1 + rate / 100), 2)
+            installment_amount = round(total_amount / installments, 2)
+            payer_cost["total_amount"] = total_amount
+            payer_cost["installment_amount"] = installment_amount
+            payer_cost["recommended_message"] = (
+                f"{installments} {'cuota' if installments == 1 else 'cuotas'} de "
+                f"$ {_format_amount(installment_amount)} ($ {_format_amount(total_amount)})"
+            )
+    return derived
+
+
+class InstallmentsQuoteCache:
+    """Installments quotes keyed by (public key, BIN prefix, payment method id, amount).
+
+    The last response per (public key, BIN prefix, payment method id) is also
+    kept as a base quote, so with ``derive`` enabled a new amount for the same
+    issuer is priced locally from the cached rates.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, derive: bool = False):
+        self.derive = derive
+        self.quotes = TTLCache(name="installments", maxsize=maxsize, ttl=ttl)
+        self._base_quotes = TTLCache(name="installments_base", maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.derived = 0
+
+    def get_or_load(
+        self,
+        public_key: str,
+        bin: str,
+        payment_method_id: str | None,
+        amount: float,
+        loader: Callable[[], list[dict[str, Any]]],
+    ) -> list[dict[str, Any]]:
+        issuer_key = (public_key, bin[:MAX_BIN_LENGTH], payment_method_id)
+
+        def load() -> list[dict[str, Any]]:
+            if self.derive:
+                base = self._base_quotes.get(issuer_key)
+                derived = derive_installments(base, amount) if base else None
+                if derived is not None:
+                    with self._lock:
+                        self.derived += 1
+                    return derived
+            installments = loader()
+            self._base_quotes.set(issuer_key, installments)
+            return installments
+
+        return self.quotes.get_or_load((*issuer_key, amount), load)
+
+    def invalidate(self) -> int:
+        self._base_quotes.invalidate()
+        return self.quotes.invalidate()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            derived = self.derived
+        return {**self.quotes.stats(), "derive": self.derive, "derived": derived}
+
+
+installments_quotes = InstallmentsQuoteCache(
+    maxsize=settings.mp_installments_cache_maxsize,
+    ttl=settings.mp_installments_cache_ttl,
+    derive=settings.mp_installments_derive,
+)
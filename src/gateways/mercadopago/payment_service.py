@@ -1,17 +1,32 @@
+import logging
 import uuid
-import requests
 from typing import Any
 
+from config.settings import settings
+from observability.instrumentation import instrument_gateway
+
+from .cache import customer_emails
 from .exceptions import MercadopagoAPIException
 from .models import TokenDataInput
 from .payment_models import PaymentCreate
+from .singleflight import gateway_reads
+from .transport import (
+    AsyncGatewayTransport,
+    GatewayTransport,
+    get_async_transport,
+    get_transport,
+)
+
+logger = logging.getLogger(__name__)
+
 
+class _MercadopagoPaymentBase:
+    """Request building shared by the sync and async payment clients."""
 
-class MercadopagoPaymentService:
     def __init__(self, access_token: str, checkout_pro_access_token: str = ""):
         self.access_token = access_token
         self.checkout_pro_access_token = checkout_pro_access_token or access_token
-        self.base_url = "https://api.mercadopago.com/v1"
+        self.base_url = f"{settings.mp_api_base_url}/v1"
 
     def _headers(self, idempotency_key: str | None = None) -> dict[str, str]:
         headers = {
@@ -22,25 +37,17 @@ class MercadopagoPaymentService:
             headers["X-Idempotency-Key"] = idempotency_key
         return headers
 
-    def _send_request(
+    def _request_kwargs(
         self,
-        method: str,
-        path: str,
         json_body: dict[str, Any] | None = None,
         idempotency_key: str | None = None,
     ) -> dict[str, Any]:
-        url = f"{self.base_url}{path}"
-        kwargs = {"headers": self._headers(idempotency_key), "timeout": 30}
+        kwargs = {"headers": self._headers(idempotency_key)}
         if json_body is not None:
             kwargs["json"] = json_body
-        response = requests.request(method, url, **kwargs)
-        if not response.ok:
-            raise MercadopagoAPIException(response)
-        if response.status_code == 204 or not response.content:
-            return {}
-        return response.json()
+        return kwargs
 
-    def create_payment(self, data: PaymentCreate) -> dict[str, Any]:
+    def _payment_body(self, data: PaymentCreate) -> dict[str, Any]:
         # When using a customer card (type="customer" + id), MP expects ONLY type+id in payer,
         # not email. Including email alongside type+id causes 500 internal_error.
         if data.payer.type == "customer" and data.payer.id:
@@ -66,42 +73,13 @@ class MercadopagoPaymentService:
             body["description"] = data.description
         if data.external_reference:
             body["external_reference"] = data.external_reference
-        import json as _json
-        print(f"[DEBUG] MP /payments request body: {_json.dumps(body)}", flush=True)
-        return self._send_request("POST", "/payments", json_body=body, idempotency_key=str(uuid.uuid4()))
-
-    def get_payment(self, payment_id: int | str) -> dict[str, Any]:
-        return self._send_request("GET", f"/payments/{payment_id}")
+        return body
 
-    def get_or_create_customer(self, email: str) -> str:
-        """Find existing MP customer by email or create new one. Returns customer_id."""
-        resp = self._send_request("GET", f"/customers/search?email={email}")
-        results = resp.get("results", [])
-        if results:
-            return results[0]["id"]
-        resp = self._send_request("POST", "/customers", json_body={"email": email})
-        return resp["id"]
-
-    def save_card_to_customer(self, customer_id: str, token: str) -> str:
-        """Save card to MP customer using a one-time token. Returns mp_card_id."""
-        resp = self._send_request(
-            "POST",
-            f"/customers/{customer_id}/cards",
-            json_body={"token": token},
-        )
-        return resp["id"]
-
-    def get_customer_email(self, customer_id: str) -> str:
-        """Get the email of an MP customer. Returns email."""
-        resp = self._send_request("GET", f"/customers/{customer_id}")
-        return resp.get("email", "")
-
-    def create_card_token(self, token_data: TokenDataInput) -> str:
-        """Create a card token server-side using the access_token. Returns token id."""
+    def _card_token_body(self, token_data: TokenDataInput) -> dict[str, Any]:
         year = token_data.card_expiration_year
         if len(year) == 2:
             year = "20" + year
-        body = {
+        return {
             "card_number": token_data.card_number,
             "security_code": token_data.security_code,
             "expiration_month": token_data.card_expiration_month,
@@ -114,11 +92,24 @@ class MercadopagoPaymentService:
                 },
             },
         }
-        resp = self._send_request("POST", "/card_tokens", json_body=body)
-        return resp["id"]
 
-    def create_preference(self, items: list[dict], payer_email: str, external_reference: str, back_urls: dict, notification_url: str | None = None) -> dict[str, Any]:
-        """Create a Checkout Pro preference. Returns preference with init_point."""
+    def _saved_card_token_body(
+        self, customer_id: str, card_id: str, security_code: str | None = None
+    ) -> dict[str, Any]:
+        body = {"customer_id": customer_id, "card_id": card_id}
+        if security_code:
+            body["security_code"] = security_code
+        return body
+
+    def _preference_request(
+        self,
+        items: list[dict],
+        payer_email: str,
+        external_reference: str,
+        back_urls: dict,
+        notification_url: str | None = None,
+    ) -> tuple[str, dict[str, Any]]:
+        """Build the Checkout Pro preference URL and request kwargs."""
         body: dict[str, Any] = {
             "items": items,
             "payer": {"email": payer_email},
@@ -126,7 +117,11 @@ class MercadopagoPaymentService:
         }
         # Only add back_urls and auto_return if success URL is a proper public URL
         success_url = back_urls.get("success", "")
-        if success_url and not success_url.startswith("http://localhost") and "localhost" not in success_url:
+        if (
+            success_url
+            and not success_url.startswith("http://localhost")
+            and "localhost" not in success_url
+        ):
             body["back_urls"] = back_urls
             body["auto_return"] = "approved"
         if notification_url:
@@ -141,22 +136,248 @@ class MercadopagoPaymentService:
             "Content-Type": "application/json",
             "X-Idempotency-Key": idempotency_key,
         }
-        import requests as _requests
-        response = _requests.post(url, headers=headers, json=body, timeout=30)
+        return url, {"headers": headers, "json": body}
+
+
+@instrument_gateway("mercadopago")
+class MercadopagoPaymentService(_MercadopagoPaymentBase):
+    def __init__(
+        self,
+        access_token: str,
+        checkout_pro_access_token: str = "",
+        transport: GatewayTransport | None = None,
+    ):
+        super().__init__(access_token, checkout_pro_access_token)
+        self.transport = transport or get_transport()
+
+    def _send_request(
+        self,
+        method: str,
+        path: str,
+        json_body: dict[str, Any] | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        response = self.transport.request(
+            method, url, **self._request_kwargs(json_body, idempotency_key)
+        )
         if not response.ok:
-            from .exceptions import MercadopagoAPIException
             raise MercadopagoAPIException(response)
+        if response.status_code == 204 or not response.content:
+            return {}
         return response.json()
 
-    def create_card_token_from_saved(self, customer_id: str, card_id: str, security_code: str | None = None) -> str:
+    def _get(self, path: str) -> dict[str, Any]:
+        # Concurrent identical reads share a single upstream request
+        return gateway_reads.do(
+            (self.access_token, path), lambda: self._send_request("GET", path)
+        )
+
+    def create_payment(
+        self, data: PaymentCreate, idempotency_key: str | None = None
+    ) -> dict[str, Any]:
+        body = self._payment_body(data)
+        # Never log the body: it carries the card token and payer data
+        logger.debug(
+            "Creating MP payment",
+            extra={
+                "payment_method_id": body.get("payment_method_id"),
+                "external_reference": data.external_reference,
+            },
+        )
+        return self._send_request(
+            "POST",
+            "/payments",
+            json_body=body,
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+
+    def get_payment(self, payment_id: int | str) -> dict[str, Any]:
+        return self._get(f"/payments/{payment_id}")
+
+    def get_or_create_customer(self, email: str) -> str:
+        """Find existing MP customer by email or create new one. Returns customer_id."""
+        resp = self._send_request("GET", f"/customers/search?email={email}")
+        results = resp.get("results", [])
+        if results:
+            return results[0]["id"]
+        resp = self._send_request("POST", "/customers", json_body={"email": email})
+        return resp["id"]
+
+    def save_card_to_customer(self, customer_id: str, token: str) -> str:
+        """Save card to MP customer using a one-time token. Returns mp_card_id."""
+        resp = self._send_request(
+            "POST",
+            f"/customers/{customer_id}/cards",
+            json_body={"token": token},
+        )
+        return resp["id"]
+
+    def delete_customer_card(self, customer_id: str, card_id: str):
+        """Remove a saved card from an MP customer."""
+        self._send_request("DELETE", f"/customers/{customer_id}/cards/{card_id}")
+
+    def get_customer_email(self, customer_id: str) -> str:
+        """Get the email of an MP customer. Returns email."""
+        email = customer_emails.get(customer_id)
+        if email is None:
+            email = self._get(f"/customers/{customer_id}").get("email", "")
+            if email:
+                customer_emails.set(customer_id, email)
+        return email
+
+    def create_card_token(self, token_data: TokenDataInput) -> str:
+        """Create a card token server-side using the access_token. Returns token id."""
+        resp = self._send_request(
+            "POST", "/card_tokens", json_body=self._card_token_body(token_data)
+        )
+        return resp["id"]
+
+    def create_preference(
+        self,
+        items: list[dict],
+        payer_email: str,
+        external_reference: str,
+        back_urls: dict,
+        notification_url: str | None = None,
+    ) -> dict[str, Any]:
+        """Create a Checkout Pro preference. Returns preference with init_point."""
+        url, kwargs = self._preference_request(
+            items, payer_email, external_reference, back_urls, notification_url
+        )
+        response = self.transport.request("POST", url, **kwargs)
+        if not response.ok:
+            raise MercadopagoAPIException(response)
+        return response.json()
+
+    def create_card_token_from_saved(
+        self, customer_id: str, card_id: str, security_code: str | None = None
+    ) -> str:
         """Create a fresh card token from a saved customer card. Returns token id."""
-        body = {"customer_id": customer_id, "card_id": card_id}
-        if security_code:
-            body["security_code"] = security_code
         resp = self._send_request(
             "POST",
             "/card_tokens",
+            json_body=self._saved_card_token_body(customer_id, card_id, security_code),
+            idempotency_key=str(uuid.uuid4()),
+        )
+        return resp["id"]
+
+
+@instrument_gateway("mercadopago")
+class AsyncMercadopagoPaymentService(_MercadopagoPaymentBase):
+    """asyncio variant of MercadopagoPaymentService; every gateway call is awaitable."""
+
+    def __init__(
+        self,
+        access_token: str,
+        checkout_pro_access_token: str = "",
+        transport: AsyncGatewayTransport | None = None,
+    ):
+        super().__init__(access_token, checkout_pro_access_token)
+        self.transport = transport or get_async_transport()
+
+    async def _send_request(
+        self,
+        method: str,
+        path: str,
+        json_body: dict[str, Any] | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        response = await self.transport.request(
+            method, url, **self._request_kwargs(json_body, idempotency_key)
+        )
+        if not response.is_success:
+            raise MercadopagoAPIException(response)
+        if response.status_code == 204 or not response.content:
+            return {}
+        return response.json()
+
+    async def _get(self, path: str) -> dict[str, Any]:
+        # Concurrent identical reads share a single upstream request
+        return await gateway_reads.do_async(
+            (self.access_token, path), lambda: self._send_request("GET", path)
+        )
+
+    async def create_payment(
+        self, data: PaymentCreate, idempotency_key: str | None = None
+    ) -> dict[str, Any]:
+        body = self._payment_body(data)
+        return await self._send_request(
+            "POST",
+            "/payments",
             json_body=body,
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+
+    async def get_payment(self, payment_id: int | str) -> dict[str, Any]:
+        return await self._get(f"/payments/{payment_id}")
+
+    async def get_or_create_customer(self, email: str) -> str:
+        """Find existing MP customer by email or create new one. Returns customer_id."""
+        resp = await self._send_request("GET", f"/customers/search?email={email}")
+        results = resp.get("results", [])
+        if results:
+            return results[0]["id"]
+        resp = await self._send_request(
+            "POST", "/customers", json_body={"email": email}
+        )
+        return resp["id"]
+
+    async def save_card_to_customer(self, customer_id: str, token: str) -> str:
+        """Save card to MP customer using a one-time token. Returns mp_card_id."""
+        resp = await self._send_request(
+            "POST",
+            f"/customers/{customer_id}/cards",
+            json_body={"token": token},
+        )
+        return resp["id"]
+
+    async def delete_customer_card(self, customer_id: str, card_id: str):
+        """Remove a saved card from an MP customer."""
+        await self._send_request("DELETE", f"/customers/{customer_id}/cards/{card_id}")
+
+    async def get_customer_email(self, customer_id: str) -> str:
+        """Get the email of an MP customer. Returns email."""
+        email = customer_emails.get(customer_id)
+        if email is None:
+            email = (await self._get(f"/customers/{customer_id}")).get("email", "")
+            if email:
+                customer_emails.set(customer_id, email)
+        return email
+
+    async def create_card_token(self, token_data: TokenDataInput) -> str:
+        """Create a card token server-side using the access_token. Returns token id."""
+        resp = await self._send_request(
+            "POST", "/card_tokens", json_body=self._card_token_body(token_data)
+        )
+        return resp["id"]
+
+    async def create_preference(
+        self,
+        items: list[dict],
+        payer_email: str,
+        external_reference: str,
+        back_urls: dict,
+        notification_url: str | None = None,
+    ) -> dict[str, Any]:
+        """Create a Checkout Pro preference. Returns preference with init_point."""
+        url, kwargs = self._preference_request(
+            items, payer_email, external_reference, back_urls, notification_url
+        )
+        response = await self.transport.request("POST", url, **kwargs)
+        if not response.is_success:
+            raise MercadopagoAPIException(response)
+        return response.json()
+
+    async def create_card_token_from_saved(
+        self, customer_id: str, card_id: str, security_code: str | None = None
+    ) -> str:
+        """Create a fresh card token from a saved customer card. Returns token id."""
+        resp = await self._send_request(
+            "POST",
+            "/card_tokens",
+            json_body=self._saved_card_token_body(customer_id, card_id, security_code),
             idempotency_key=str(uuid.uuid4()),
         )
         return resp["id"]
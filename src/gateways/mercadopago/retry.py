@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from typing import Any, Callable
+
+import httpx
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from config.settings import settings
+
+_SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+_RETRYABLE_STATUSES = frozenset((500, 502, 503, 504))
+# Errors after which the request may or may not have reached MercadoPago
+_TRANSIENT_ERRORS = (
+    requests.ConnectionError,
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.ReadError,
+    httpx.WriteError,
+    httpx.RemoteProtocolError,
+)
+# Errors raised before the request was sent, safe to retry for any method
+_NOT_SENT_ERRORS = (
+    requests.ConnectTimeout,
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+)
+
+
+class RetryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.recovered = 0
+        self.budget_exhausted = 0
+
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "recovered": self.recovered,
+                "budget_exhausted": self.budget_exhausted,
+            }
+
+
+retry_stats = RetryStats()
+
+
+class RetryBudget:
+    """Token bucket capping retries to a fraction of the traffic.
+
+    Every first attempt deposits ``ratio`` tokens and every retry withdraws
+    one, so retries stay below ``ratio`` of requests when MercadoPago is
+    failing across the board; ``min_per_second`` tokens are added over time
+    so low traffic can still retry.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max(10.0, min_per_second * 10)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._refilled_at = clock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self._tokens + (now - self._refilled_at) * self.min_per_second,
+                self.max_tokens,
+            )
+            self._refilled_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def _retry_after(headers: Any) -> float | None:
+    value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _never_sent(error: BaseException) -> bool:
+    if isinstance(error, _NOT_SENT_ERRORS):
+        return True
+    # requests wraps a refused connection in ConnectionError(MaxRetryError(reason=NewConnectionError))
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class RetryPolicy:
+    """Decides whether a failed MercadoPago call is retried, and after how long.
+
+    Connection failures and 5xx responses are retried for idempotent methods
+    and for requests carrying an ``X-Idempotency-Key`` (MercadoPago answers a
+    repeated key with the original result, so a retried payment is never
+    charged twice). Other POSTs are only retried when they never left the
+    process. 429 is always retried. Delays grow exponentially from
+    ``base_delay`` up to ``max_delay`` with full jitter, honouring
+    ``Retry-After``, and every retry draws from the shared ``budget``.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        budget: RetryBudget | None = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+
+    def start(self):
+        self.budget.deposit()
+
+    def delay(
+        self,
+        method: str,
+        headers: dict[str, str] | None,
+        attempt: int,
+        response: Any = None,
+        error: BaseException | None = None,
+    ) -> float | None:
+        """Seconds to wait before attempt ``attempt + 1``, or None to give up."""
+        if attempt >= self.max_attempts:
+            return None
+        safe = method.upper() in _SAFE_METHODS or "X-Idempotency-Key" in (headers or {})
+        if error is not None:
+            retryable = (safe and isinstance(error, _TRANSIENT_ERRORS)) or _never_sent(
+                error
+            )
+        else:
+            retryable = response.status_code == 429 or (
+                safe and response.status_code in _RETRYABLE_STATUSES
+            )
+        if not retryable:
+            return None
+        if not self.budget.withdraw():
+            retry_stats.incr("budget_exhausted")
+            return None
+        retry_stats.incr("retries")
+        delay = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+        retry_after = _retry_after(response.headers) if response is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+def default_retry_policy() -> RetryPolicy | None:
+    if settings.mp_retry_max_attempts <= 1:
+        return None
+    return RetryPolicy(
+        max_attempts=settings.mp_retry_max_attempts,
+        base_delay=settings.mp_retry_base_delay,
+        max_delay=settings.mp_retry_max_delay,
+        budget=RetryBudget(
+            settings.mp_retry_budget_ratio, settings.mp_retry_budget_min_per_second
+        ),
+    )
@@ -1,7 +1,15 @@
-import requests
+import logging
 from typing import Any
 
+import requests
+
+from config.settings import settings
+from observability.instrumentation import instrument_gateway
+
+from .bin_resolver import bin_resolver_stats, get_bin_resolver
+from .cache import catalog_cache
 from .exceptions import MercadopagoAPIException
+from .installments import installments_quotes
 from .models import (
     PaymentMethod,
     InstallmentsInfo,
@@ -9,49 +17,101 @@ from .models import (
     TokenDataInput,
     TokenResponse,
 )
+from .singleflight import gateway_reads
+from .transport import GatewayTransport, get_transport
+
+logger = logging.getLogger(__name__)
 
 
+@instrument_gateway("mercadopago")
 class MercadopagoService:
-    def __init__(self, public_key: str):
+    def __init__(self, public_key: str, transport: GatewayTransport | None = None):
         self.public_key: str = public_key
-        self.base_url: str = "https://api.mercadopago.com/v1"
+        self.base_url: str = f"{settings.mp_api_base_url}/v1"
+        self.transport: GatewayTransport = transport or get_transport()
+
+    def _params(self, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        return {**(params or {}), "public_key": self.public_key}
+
+    def _read_key(self, url: str, params: dict[str, Any] | None = None) -> tuple:
+        return (self.public_key, url, tuple(sorted((params or {}).items())))
 
     def _send_request(
         self,
         method: str,
         url: str,
-        params: dict[str, Any] | None = {},
-        data: dict[str, Any] | None = {},
+        params: dict[str, Any] | None = None,
+        data: dict[str, Any] | None = None,
     ):
-        params["public_key"] = self.public_key
-        response = requests.request(method, url, params=params, data=data)
+        response = self.transport.request(
+            method, url, params=self._params(params), data=data or {}
+        )
         if not response.ok:
             raise MercadopagoAPIException(response)
         return response.json()
 
+    def _get(self, url: str, params: dict[str, Any] | None = None):
+        # Concurrent identical reads share a single upstream request
+        return gateway_reads.do(
+            self._read_key(url, params),
+            lambda: self._send_request("GET", url, params=params),
+        )
+
     def get_payment_methods(self) -> list[PaymentMethod]:
         url = f"{self.base_url}/payment_methods"
-        payment_methods = self._send_request("GET", url)
+        payment_methods = catalog_cache.get_or_load(
+            ("payment_methods", self.public_key), lambda: self._get(url)
+        )
         return payment_methods
 
     def get_payment_method(self, bin: str) -> PaymentMethod | None:
+        local_match = self._resolve_bin_locally(bin, record_stats=True)
+        if local_match is not None:
+            return local_match
         params = {"bins": bin, "marketplace": "NONE"}
         url = f"{self.base_url}/payment_methods/search"
-        payment_method = self._send_request("GET", url, params=params)["results"]
+        payment_method = self._get(url, params=params)["results"]
         return payment_method[0] if payment_method else None
 
+    def _resolve_bin_locally(
+        self, bin: str, record_stats: bool = False
+    ) -> PaymentMethod | None:
+        # Only get_payment_method records stats: they count the BIN searches saved
+        try:
+            catalog = self.get_payment_methods()
+        except (MercadopagoAPIException, requests.RequestException):
+            logger.warning(
+                "Payment methods catalog unavailable, resolving BIN remotely"
+            )
+            if record_stats:
+                bin_resolver_stats.incr("unavailable")
+            return None
+        payment_method = get_bin_resolver(self.public_key, catalog).resolve(bin)
+        if record_stats:
+            bin_resolver_stats.incr("hits" if payment_method is not None else "misses")
+        return payment_method
+
     def get_installments(self, bin: str, amount: float) -> list[InstallmentsInfo]:
         params = {
             "bin": bin,
             "amount": amount,
         }
         url = f"{self.base_url}/payment_methods/installments"
-        installments = self._send_request("GET", url, params=params)
+        payment_method = self._resolve_bin_locally(bin)
+        installments = installments_quotes.get_or_load(
+            self.public_key,
+            bin,
+            payment_method["id"] if payment_method else None,
+            amount,
+            lambda: self._get(url, params=params),
+        )
         return installments
 
     def get_identification_types(self) -> list[IdentificationType]:
         url = f"{self.base_url}/identification_types"
-        identification_types = self._send_request("GET", url)
+        identification_types = catalog_cache.get_or_load(
+            ("identification_types", self.public_key), lambda: self._get(url)
+        )
         return identification_types
 
     def create_token(self, token_data: TokenDataInput) -> TokenResponse:
@@ -69,8 +129,7 @@ class MercadopagoService:
                 },
             },
         }
-        params = {"public_key": self.public_key}
-        response = requests.post(url, json=body, params=params)
+        response = self.transport.request("POST", url, json=body, params=self._params())
         if not response.ok:
             raise MercadopagoAPIException(response)
         return response.json()
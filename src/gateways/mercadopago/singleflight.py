@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one upstream request.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for and share its result (or exception). Nothing is cached
+    once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._async_calls: dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Only called from the event loop thread; the lock guards the shared counters.
+        # The upstream call runs in its own task that every caller awaits through
+        # a shield, so cancelling one caller (the first included) never cancels
+        # the call or hands a CancelledError to the others.
+        task = self._async_calls.get(key)
+        if task is not None:
+            with self._lock:
+                self.collapsed += 1
+        else:
+            task = self._async_calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._finish_async(key, t))
+            with self._lock:
+                self.executed += 1
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key: Hashable, task: asyncio.Future):
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        # Mark the exception as retrieved when every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls) + len(self._async_calls),
+            }
+
+
+gateway_reads = SingleFlight()
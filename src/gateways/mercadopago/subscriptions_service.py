@@ -1,14 +1,28 @@
-import requests
 from typing import Any
 
+from config.settings import settings
+from observability.instrumentation import instrument_gateway
+
 from .exceptions import MercadopagoAPIException
-from .subscriptions_models import MPPlanCreate, MPSubscriptionCreate, MPSubscriptionResponse
+from .subscriptions_models import (
+    MPPlanCreate,
+    MPSubscriptionCreate,
+    MPSubscriptionResponse,
+)
+from .transport import (
+    AsyncGatewayTransport,
+    GatewayTransport,
+    get_async_transport,
+    get_transport,
+)
+
 
+class _MercadopagoSubscriptionBase:
+    """Request building shared by the sync and async subscription clients."""
 
-class MercadopagoSubscriptionService:
     def __init__(self, access_token: str):
         self.access_token = access_token
-        self.base_url = "https://api.mercadopago.com"
+        self.base_url = settings.mp_api_base_url
 
     def _headers(self) -> dict[str, str]:
         return {
@@ -16,27 +30,19 @@ class MercadopagoSubscriptionService:
             "Content-Type": "application/json",
         }
 
-    def _send_request(
+    def _request_kwargs(
         self,
-        method: str,
-        path: str,
         json_body: dict[str, Any] | None = None,
         params: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
-        url = f"{self.base_url}{path}"
-        kwargs = {"headers": self._headers(), "timeout": 30}
+        kwargs = {"headers": self._headers()}
         if json_body is not None:
             kwargs["json"] = json_body
         if params:
             kwargs["params"] = params
-        response = requests.request(method, url, **kwargs)
-        if not response.ok:
-            raise MercadopagoAPIException(response)
-        if response.status_code == 204 or not response.content:
-            return {}
-        return response.json()
+        return kwargs
 
-    def create_plan(
+    def _plan_body(
         self,
         reason: str,
         amount: float,
@@ -44,7 +50,7 @@ class MercadopagoSubscriptionService:
         frequency: int = 1,
         frequency_type: str = "months",
     ) -> dict[str, Any]:
-        body = {
+        return {
             "reason": reason,
             "auto_recurring": {
                 "frequency": frequency,
@@ -52,11 +58,13 @@ class MercadopagoSubscriptionService:
                 "transaction_amount": amount,
                 "currency_id": currency,
             },
-            "payment_methods_allowed": [{"payment_type_id": "credit_card"}, {"payment_type_id": "debit_card"}],
+            "payment_methods_allowed": [
+                {"payment_type_id": "credit_card"},
+                {"payment_type_id": "debit_card"},
+            ],
         }
-        return self._send_request("POST", "/preapproval_plan", json_body=body)
 
-    def create_subscription(
+    def _subscription_body(
         self,
         preapproval_plan_id: str,
         reason: str,
@@ -76,13 +84,142 @@ class MercadopagoSubscriptionService:
             body["external_reference"] = external_reference
         if notification_url:
             body["notification_url"] = notification_url
+        return body
+
+
+@instrument_gateway("mercadopago")
+class MercadopagoSubscriptionService(_MercadopagoSubscriptionBase):
+    def __init__(self, access_token: str, transport: GatewayTransport | None = None):
+        super().__init__(access_token)
+        self.transport = transport or get_transport()
+
+    def _send_request(
+        self,
+        method: str,
+        path: str,
+        json_body: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        response = self.transport.request(
+            method, url, **self._request_kwargs(json_body, params)
+        )
+        if not response.ok:
+            raise MercadopagoAPIException(response)
+        if response.status_code == 204 or not response.content:
+            return {}
+        return response.json()
+
+    def create_plan(
+        self,
+        reason: str,
+        amount: float,
+        currency: str = "ARS",
+        frequency: int = 1,
+        frequency_type: str = "months",
+    ) -> dict[str, Any]:
+        body = self._plan_body(reason, amount, currency, frequency, frequency_type)
+        return self._send_request("POST", "/preapproval_plan", json_body=body)
+
+    def create_subscription(
+        self,
+        preapproval_plan_id: str,
+        reason: str,
+        payer_email: str,
+        card_token_id: str,
+        external_reference: str | None = None,
+        notification_url: str | None = None,
+    ) -> dict[str, Any]:
+        body = self._subscription_body(
+            preapproval_plan_id,
+            reason,
+            payer_email,
+            card_token_id,
+            external_reference,
+            notification_url,
+        )
         return self._send_request("POST", "/preapproval", json_body=body)
 
     def get_subscription(self, preapproval_id: str) -> dict[str, Any]:
         return self._send_request("GET", f"/preapproval/{preapproval_id}")
 
     def cancel_subscription(self, preapproval_id: str) -> dict[str, Any]:
-        return self._send_request("PUT", f"/preapproval/{preapproval_id}", json_body={"status": "cancelled"})
+        return self._send_request(
+            "PUT", f"/preapproval/{preapproval_id}", json_body={"status": "cancelled"}
+        )
 
     def pause_subscription(self, preapproval_id: str) -> dict[str, Any]:
-        return self._send_request("PUT", f"/preapproval/{preapproval_id}", json_body={"status": "paused"})
+        return self._send_request(
+            "PUT", f"/preapproval/{preapproval_id}", json_body={"status": "paused"}
+        )
+
+
+@instrument_gateway("mercadopago")
+class AsyncMercadopagoSubscriptionService(_MercadopagoSubscriptionBase):
+    """asyncio variant of MercadopagoSubscriptionService; every gateway call is awaitable."""
+
+    def __init__(
+        self, access_token: str, transport: AsyncGatewayTransport | None = None
+    ):
+        super().__init__(access_token)
+        self.transport = transport or get_async_transport()
+
+    async def _send_request(
+        self,
+        method: str,
+        path: str,
+        json_body: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        response = await self.transport.request(
+            method, url, **self._request_kwargs(json_body, params)
+        )
+        if not response.is_success:
+            raise MercadopagoAPIException(response)
+        if response.status_code == 204 or not response.content:
+            return {}
+        return response.json()
+
+    async def create_plan(
+        self,
+        reason: str,
+        amount: float,
+        currency: str = "ARS",
+        frequency: int = 1,
+        frequency_type: str = "months",
+    ) -> dict[str, Any]:
+        body = self._plan_body(reason, amount, currency, frequency, frequency_type)
+        return await self._send_request("POST", "/preapproval_plan", json_body=body)
+
+    async def create_subscription(
+        self,
+        preapproval_plan_id: str,
+        reason: str,
+        payer_email: str,
+        card_token_id: str,
+        external_reference: str | None = None,
+        notification_url: str | None = None,
+    ) -> dict[str, Any]:
+        body = self._subscription_body(
+            preapproval_plan_id,
+            reason,
+            payer_email,
+            card_token_id,
+            external_reference,
+            notification_url,
+        )
+        return await self._send_request("POST", "/preapproval", json_body=body)
+
+    async def get_subscription(self, preapproval_id: str) -> dict[str, Any]:
+        return await self._send_request("GET", f"/preapproval/{preapproval_id}")
+
+    async def cancel_subscription(self, preapproval_id: str) -> dict[str, Any]:
+        return await self._send_request(
+            "PUT", f"/preapproval/{preapproval_id}", json_body={"status": "cancelled"}
+        )
+
+    async def pause_subscription(self, preapproval_id: str) -> dict[str, Any]:
+        return await self._send_request(
+            "PUT", f"/preapproval/{preapproval_id}", json_body={"status": "paused"}
+        )
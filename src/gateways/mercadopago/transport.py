@@ -0,0 +1,365 @@
+import asyncio
+import threading
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config.settings import settings
+from observability.metrics import GATEWAY_REQUEST_DURATION, GATEWAY_REQUEST_ERRORS
+from observability.tracing import tracer
+
+from .circuit_breaker import gateway_breakers, is_failure
+from .retry import RetryPolicy, default_retry_policy, retry_stats
+
+
+def endpoint_template(url: str) -> str:
+    """URL path with id segments collapsed, e.g. /v1/payments/123 -> /v1/payments/:id."""
+    segments = [s for s in urlsplit(url).path.split("/") if s]
+    return "/" + "/".join(
+        ":id" if i > 0 and any(c.isdigit() for c in s) else s
+        for i, s in enumerate(segments)
+    )
+
+
+def _observe(
+    method: str,
+    url: str,
+    started: float,
+    status_code: int | None = None,
+    error: BaseException | None = None,
+):
+    """Record one HTTP request sent to MercadoPago, whatever client method or retry sent it."""
+    endpoint = endpoint_template(url)
+    failed = error is not None or status_code >= 400
+    GATEWAY_REQUEST_DURATION.labels(
+        "mercadopago", endpoint, method, "error" if failed else "ok"
+    ).observe(time.perf_counter() - started)
+    if failed:
+        status = str(status_code) if error is None else type(error).__name__
+        GATEWAY_REQUEST_ERRORS.labels("mercadopago", endpoint, method, status).inc()
+
+
+class PoolWaitStats:
+    """Thread-safe accumulator for the time spent waiting on a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            avg = self.total_seconds / self.count if self.count else 0.0
+            return {
+                "count": self.count,
+                "total_seconds": round(self.total_seconds, 6),
+                "avg_seconds": round(avg, 6),
+                "max_seconds": round(self.max_seconds, 6),
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class _TimedPoolMixin:
+    # urllib3 blocks forever on an exhausted pool when no timeout is given,
+    # so a blocking pool always falls back to the configured pool timeout.
+    def _get_conn(self, timeout=None):
+        if timeout is None:
+            timeout = settings.mp_http_pool_timeout
+        started = time.perf_counter()
+        try:
+            return super()._get_conn(timeout=timeout)
+        finally:
+            pool_wait_stats.record(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TimedHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class GatewayTransport:
+    """Keep-alive HTTP transport shared by every MercadoPago gateway client.
+
+    ``pool_connections`` is the number of hosts kept in the pool manager and
+    ``pool_maxsize`` the number of keep-alive connections kept per host. With
+    ``pool_block`` the per-host size becomes a hard limit and callers wait up
+    to ``mp_http_pool_timeout`` for a free connection. Transient failures are
+    retried according to ``retry_policy``.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int,
+        pool_maxsize: int,
+        pool_block: bool = False,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        retry_policy: RetryPolicy | None = None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_policy = retry_policy
+        self.adapter = _PooledAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        policy = self.retry_policy
+        if policy is None:
+            return self._send(method, url, **kwargs)
+        policy.start()
+        attempt = 1
+        while True:
+            try:
+                response = self._send(method, url, **kwargs)
+            except requests.RequestException as e:
+                delay = policy.delay(method, kwargs.get("headers"), attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = policy.delay(
+                    method, kwargs.get("headers"), attempt, response=response
+                )
+                if delay is None:
+                    if attempt > 1 and response.ok:
+                        retry_stats.incr("recovered")
+                    return response
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        breaker = gateway_breakers.for_url(url)
+        breaker.before_call()
+        span, token = tracer.start(f"HTTP {method}")
+        span.set_attribute("http.url", url.split("?", 1)[0])
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            breaker.after_call(time.perf_counter() - started, failed=True)
+            _observe(method, url, started, error=e)
+            tracer.finish(span, token, e)
+            raise
+        breaker.after_call(
+            time.perf_counter() - started, failed=is_failure(response.status_code)
+        )
+        _observe(method, url, started, response.status_code)
+        span.set_attribute("http.status_code", response.status_code)
+        tracer.finish(span, token)
+        return response
+
+    def stats(self) -> dict[str, Any]:
+        pool_manager = self.adapter.poolmanager
+        pools = []
+        total_requests = 0
+        total_connections = 0
+        for key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+            pools.append(
+                {
+                    "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                    "maxsize": pool.pool.maxsize if pool.pool else 0,
+                    "idle": pool.pool.qsize() if pool.pool else 0,
+                    "requests": pool.num_requests,
+                    "new_connections": pool.num_connections,
+                }
+            )
+        reuse_ratio = 1 - total_connections / total_requests if total_requests else 0.0
+        return {
+            "requests": total_requests,
+            "new_connections": total_connections,
+            "reuse_ratio": round(max(reuse_ratio, 0.0), 4),
+            "pool_wait": pool_wait_stats.snapshot(),
+            "pools": pools,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncGatewayTransport:
+    """asyncio counterpart of GatewayTransport built on a shared httpx.AsyncClient.
+
+    ``max_connections`` caps concurrent connections per process and
+    ``max_keepalive_connections`` the idle connections kept open between calls.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        pool_timeout: float = 10.0,
+        retry_policy: RetryPolicy | None = None,
+    ):
+        self.retry_policy = retry_policy
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=httpx.Timeout(
+                read_timeout, connect=connect_timeout, pool=pool_timeout
+            ),
+        )
+        self.requests = 0
+        self.in_flight = 0
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        policy = self.retry_policy
+        if policy is None:
+            return await self._send(method, url, **kwargs)
+        policy.start()
+        attempt = 1
+        while True:
+            try:
+                response = await self._send(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                delay = policy.delay(method, kwargs.get("headers"), attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = policy.delay(
+                    method, kwargs.get("headers"), attempt, response=response
+                )
+                if delay is None:
+                    if attempt > 1 and response.is_success:
+                        retry_stats.incr("recovered")
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        breaker = gateway_breakers.for_url(url)
+        breaker.before_call()
+        self.requests += 1
+        self.in_flight += 1
+        span, token = tracer.start(f"HTTP {method}")
+        span.set_attribute("http.url", url.split("?", 1)[0])
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as e:
+            breaker.after_call(time.perf_counter() - started, failed=True)
+            _observe(method, url, started, error=e)
+            tracer.finish(span, token, e)
+            raise
+        except BaseException:
+            # Cancelled by the caller: says nothing about MercadoPago's health
+            breaker.cancel()
+            tracer.finish(span, token)
+            raise
+        finally:
+            self.in_flight -= 1
+        breaker.after_call(
+            time.perf_counter() - started, failed=is_failure(response.status_code)
+        )
+        _observe(method, url, started, response.status_code)
+        span.set_attribute("http.status_code", response.status_code)
+        tracer.finish(span, token)
+        return response
+
+    def stats(self) -> dict[str, Any]:
+        return {"requests": self.requests, "in_flight": self.in_flight}
+
+    async def close(self):
+        await self.client.aclose()
+
+
+_transport: GatewayTransport | None = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> GatewayTransport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = GatewayTransport(
+                    pool_connections=settings.mp_http_pool_connections,
+                    pool_maxsize=settings.mp_http_pool_maxsize,
+                    pool_block=settings.mp_http_pool_block,
+                    connect_timeout=settings.mp_http_connect_timeout,
+                    read_timeout=settings.mp_http_read_timeout,
+                    retry_policy=default_retry_policy(),
+                )
+    return _transport
+
+
+def close_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+            _transport = None
+
+
+_async_transport: AsyncGatewayTransport | None = None
+
+
+def get_async_transport() -> AsyncGatewayTransport:
+    # Only touched from the event loop thread, so no lock is needed.
+    global _async_transport
+    if _async_transport is None:
+        _async_transport = AsyncGatewayTransport(
+            max_connections=settings.mp_http_async_max_connections,
+            max_keepalive_connections=settings.mp_http_pool_maxsize,
+            connect_timeout=settings.mp_http_connect_timeout,
+            read_timeout=settings.mp_http_read_timeout,
+            pool_timeout=settings.mp_http_pool_timeout,
+            retry_policy=default_retry_policy(),
+        )
+    return _async_transport
+
+
+def async_transport_stats() -> dict[str, Any]:
+    """Counters kept by the event loop, readable from any thread without creating the transport."""
+    transport = _async_transport
+    if transport is None:
+        return {"requests": 0, "in_flight": 0}
+    return transport.stats()
+
+
+async def close_async_transport():
+    global _async_transport
+    if _async_transport is not None:
+        await _async_transport.close()
+        _async_transport = None
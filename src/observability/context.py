@@ -0,0 +1,8 @@
+from contextvars import ContextVar
+
+# "<ServiceClass>.<method>" being executed, used to attribute SQL statements.
+_operation: ContextVar[str] = ContextVar("operation", default="")
+
+
+def current_operation() -> str:
+    return _operation.get()
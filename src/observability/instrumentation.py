@@ -0,0 +1,110 @@
+import functools
+import inspect
+import time
+from typing import Any, Callable
+
+from .context import _operation
+from .metrics import SERVICE_METHOD_DURATION
+from .tracing import tracer
+
+
+def _public_methods(cls) -> list[tuple[str, Callable]]:
+    return [
+        (name, fn)
+        for name, fn in vars(cls).items()
+        if inspect.isfunction(fn) and not name.startswith("_")
+    ]
+
+
+def _gateway_method(gateway: str, name: str, fn: Callable) -> Callable:
+    # Latency and errors are recorded per HTTP request by the gateway transport;
+    # a client method may be served from a cache or call other wrapped methods.
+    span_name = f"{gateway}.{name}"
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs) -> Any:
+            span, token = tracer.start(span_name)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                tracer.finish(span, token, e)
+                raise
+            tracer.finish(span, token)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs) -> Any:
+        span, token = tracer.start(span_name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            tracer.finish(span, token, e)
+            raise
+        tracer.finish(span, token)
+        return result
+
+    return wrapper
+
+
+def _service_method(operation: str, fn: Callable) -> Callable:
+    histogram = SERVICE_METHOD_DURATION.labels(operation)
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs) -> Any:
+            operation_token = _operation.set(operation)
+            span, token = tracer.start(operation)
+            started = time.perf_counter()
+            error = None
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+                tracer.finish(span, token, error)
+                _operation.reset(operation_token)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs) -> Any:
+        operation_token = _operation.set(operation)
+        span, token = tracer.start(operation)
+        started = time.perf_counter()
+        error = None
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started)
+            tracer.finish(span, token, error)
+            _operation.reset(operation_token)
+
+    return wrapper
+
+
+def instrument_gateway(gateway: str) -> Callable[[type], type]:
+    """Class decorator tracing every public method of a gateway client, sync or async."""
+
+    def decorate(cls: type) -> type:
+        for name, fn in _public_methods(cls):
+            setattr(cls, name, _gateway_method(gateway, name, fn))
+        return cls
+
+    return decorate
+
+
+def instrument_service(cls: type) -> type:
+    """Class decorator timing and tracing every public service method and attributing its SQL statements to it."""
+    for name, fn in _public_methods(cls):
+        setattr(cls, name, _service_method(f"{cls.__name__}.{name}", fn))
+    return cls
@@ -0,0 +1,179 @@
+import time
+from typing import Iterator
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.requests import Request
+from starlette.routing import Match
+
+from config.settings import settings
+from gateways.mercadopago.cache import TTLCache
+
+from .context import current_operation
+
+# Gateway calls can take up to the read timeout, so the buckets go past the defaults.
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+GATEWAY_REQUEST_DURATION = Histogram(
+    "gateway_request_duration_seconds",
+    "Payment gateway HTTP request latency by endpoint, one sample per request sent.",
+    ["gateway", "endpoint", "method", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+GATEWAY_REQUEST_ERRORS = Counter(
+    "gateway_request_errors",
+    "Failed payment gateway HTTP requests by endpoint and HTTP status (or exception type).",
+    ["gateway", "endpoint", "method", "status"],
+)
+SERVICE_METHOD_DURATION = Histogram(
+    "service_method_duration_seconds",
+    "Service method latency, including the gateway calls and queries it makes.",
+    ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency by the service method that issued it.",
+    ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    DB_QUERY_DURATION.labels(current_operation() or "other").observe(
+        time.perf_counter() - started
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def route_template(request: Request) -> str:
+    """Path template of the matched route, so path parameters don't explode label cardinality."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def _inbox_pending() -> int:
+    from db.session import SessionLocal
+    from services.webhook_service import WebhookInboxService
+
+    db = SessionLocal()
+    try:
+        return WebhookInboxService(db).pending_count()
+    finally:
+        db.close()
+
+
+class RuntimeCollector:
+    """Pool usage and webhook backlog, read at scrape time.
+
+    Scrapes run in the threadpool, so the async transport is read through
+    counters the event loop keeps, and the backlog COUNT is cached for
+    ``metrics_inbox_pending_ttl`` seconds then refreshed in the background.
+    """
+
+    def __init__(self):
+        self.inbox_pending = TTLCache(
+            name="metrics_inbox_pending",
+            maxsize=1,
+            ttl=settings.metrics_inbox_pending_ttl,
+            stale_ttl=86400,
+        )
+
+    def describe(self) -> list:
+        # Nothing to describe up front; otherwise registering would run collect().
+        return []
+
+    def collect(self) -> Iterator:
+        # Imported here: services import this package for their instrumentation.
+        from db.async_session import pool_stats as async_pool_stats
+        from db.session import pool_stats
+        from gateways.mercadopago.transport import async_transport_stats, get_transport
+
+        db_pool = pool_stats()
+        pools = {"sync": db_pool, "async": async_pool_stats()}
+        connections = GaugeMetricFamily(
+            "db_pool_connections",
+            "Database pool connections by pool and state.",
+            labels=["pool", "state"],
+        )
+        size = GaugeMetricFamily(
+            "db_pool_size", "Configured database pool size.", labels=["pool"]
+        )
+        for name, stats in pools.items():
+            connections.add_metric([name, "checked_out"], stats["checked_out"])
+            connections.add_metric([name, "checked_in"], stats["checked_in"])
+            connections.add_metric([name, "overflow"], max(stats["overflow"], 0))
+            size.add_metric([name], stats["size"])
+        yield connections
+        yield size
+        # Checkout timing is only recorded by the sync engine's pool
+        yield CounterMetricFamily(
+            "db_pool_checkout_wait_seconds",
+            "Time spent waiting for a database connection.",
+            value=db_pool["total_wait_seconds"],
+        )
+        yield CounterMetricFamily(
+            "db_pool_checkouts",
+            "Database connection checkouts.",
+            value=db_pool["checkouts"],
+        )
+        yield CounterMetricFamily(
+            "db_pool_checkout_timeouts",
+            "Database connection checkout timeouts.",
+            value=db_pool["timeouts"],
+        )
+
+        gateway_pool = get_transport().stats()
+        yield CounterMetricFamily(
+            "gateway_http_connections_opened",
+            "Connections opened to the payment gateway.",
+            value=gateway_pool["new_connections"],
+        )
+        yield CounterMetricFamily(
+            "gateway_http_pool_wait_seconds",
+            "Time spent waiting for a pooled gateway connection.",
+            value=gateway_pool["pool_wait"]["total_seconds"],
+        )
+        yield GaugeMetricFamily(
+            "gateway_http_async_in_flight",
+            "Gateway requests in flight on the async client.",
+            value=async_transport_stats()["in_flight"],
+        )
+
+        try:
+            pending = self.inbox_pending.get_or_load("pending", _inbox_pending)
+        except Exception:
+            pending = None
+        if pending is not None:
+            yield GaugeMetricFamily(
+                "webhook_inbox_pending",
+                "Webhook notifications not yet processed.",
+                value=pending,
+            )
+
+
+REGISTRY.register(RuntimeCollector())
@@ -0,0 +1,231 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config.settings import settings
+
+
+class Span:
+    """A timed operation within a trace, following the W3C trace-context ids."""
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "start",
+        "end_time",
+        "status",
+        "sampled",
+    )
+
+    def __init__(
+        self,
+        trace_id: str,
+        span_id: str,
+        parent_id: str | None,
+        name: str,
+        sampled: bool = True,
+    ):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes: dict[str, Any] = {}
+        self.start = time.time()
+        self.end_time: float | None = None
+        self.status = "ok"
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(
+                ((self.end_time or self.start) - self.start) * 1000, 3
+            ),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives every finished sampled span."""
+
+    def export(self, span: Span):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the last ``maxlen`` spans, for tests and the admin endpoint."""
+
+    def __init__(self, maxlen: int = 10_000):
+        self.spans: deque[Span] = deque(maxlen=maxlen)
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def clear(self):
+        self.spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """Appends spans as JSON lines to ``path``."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+def _parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_UNSAMPLED = Span("0" * 32, "0" * 16, None, "unsampled", sampled=False)
+
+
+class Tracer:
+    """Creates spans, propagates them through contextvars and hands them to an exporter.
+
+    Sampling is decided once per trace, at the root span (or taken from an
+    incoming ``traceparent``); spans of unsampled traces are still created so
+    ids propagate, but record nothing and are never exported.
+    """
+
+    def __init__(self, exporter: SpanExporter | None = None, sample_rate: float = 1.0):
+        # Without an exporter nothing is ever recorded, whatever the caller asked for.
+        self.enabled = exporter is not None
+        self.exporter = exporter or SpanExporter()
+        self.sample_rate = sample_rate
+
+    def start(
+        self, name: str, traceparent: str | None = None, activate: bool = True
+    ) -> tuple[Span, Token | None]:
+        """Start a span; with ``activate`` it becomes the parent of spans started in this context."""
+        parent = _current_span.get()
+        if parent is not None and not parent.sampled:
+            # Nothing below an unsampled span is recorded; reuse it instead of allocating.
+            span = parent
+            return span, _current_span.set(span) if activate else None
+        if parent is None and not self.enabled:
+            return _UNSAMPLED, _current_span.set(_UNSAMPLED) if activate else None
+        remote = _parse_traceparent(traceparent) if parent is None else None
+        span_id = os.urandom(8).hex()
+        if parent is not None:
+            span = Span(parent.trace_id, span_id, parent.span_id, name, parent.sampled)
+        elif remote is not None:
+            span = Span(remote[0], span_id, remote[1], name, remote[2] and self.enabled)
+        else:
+            sampled = self.enabled and (
+                self.sample_rate >= 1 or random.random() < self.sample_rate
+            )
+            span = Span(os.urandom(16).hex(), span_id, None, name, sampled)
+        return span, _current_span.set(span) if activate else None
+
+    def finish(
+        self, span: Span, token: Token | None, error: BaseException | None = None
+    ):
+        if token is not None:
+            _current_span.reset(token)
+        if not span.sampled:
+            return
+        span.end_time = time.time()
+        if error is not None:
+            span.status = "error"
+            span.attributes["error"] = f"{type(error).__name__}: {error}"[:500]
+        self.exporter.export(span)
+
+    @contextmanager
+    def span(
+        self, name: str, traceparent: str | None = None, **attributes: Any
+    ) -> Iterator[Span]:
+        span, token = self.start(name, traceparent)
+        if span.sampled:
+            span.attributes.update(attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish(span, token, e)
+            raise
+        self.finish(span, token)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def _exporter_from_settings() -> SpanExporter | None:
+    if settings.tracing_exporter == "memory":
+        return InMemoryExporter()
+    if settings.tracing_exporter == "file":
+        return FileExporter(settings.tracing_file)
+    return None
+
+
+tracer = Tracer(_exporter_from_settings(), sample_rate=settings.tracing_sample_rate)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Not activated: statements have no child spans, and the async engine may run
+    # the after-hook in a different context.
+    span, token = tracer.start("db.query", activate=False)
+    span.set_attribute("db.statement", statement[:500])
+    conn.info.setdefault("query_spans", []).append((span, token))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span, token = conn.info["query_spans"].pop()
+    tracer.finish(span, token)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("query_spans") if conn is not None else None
+    if spans:
+        span, token = spans.pop()
+        tracer.finish(span, token, exception_context.original_exception)
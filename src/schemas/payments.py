@@ -70,3 +70,8 @@ class PaymentResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class PaymentPage(BaseModel):
+    items: list[PaymentResponse]
+    next_cursor: str | None
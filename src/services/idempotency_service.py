@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from db.models import IdempotencyKey
+from gateways.mercadopago.cache import TTLCache
+from observability.instrumentation import instrument_service
+
+MAX_KEY_LENGTH = 255
+
+# Completed responses by (scope, key), so most retries never reach the database
+idempotent_responses = TTLCache(
+    name="idempotency",
+    maxsize=settings.idempotency_cache_maxsize,
+    ttl=settings.idempotency_ttl,
+)
+
+
+class IdempotencyConflict(Exception):
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+        super().__init__(message)
+
+
+class StoredResponse:
+    __slots__ = ("request_hash", "status_code", "body")
+
+    def __init__(self, request_hash: str, status_code: int, body: Any):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+
+
+def request_fingerprint(body: dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(body, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+# One lock per key being handled in this process; only used from the event loop thread.
+_key_locks: dict[tuple[str, str], tuple[asyncio.Lock, int]] = {}
+
+
+@asynccontextmanager
+async def idempotency_lock(
+    scope: str, key: str, timeout: float = settings.idempotency_wait_seconds
+) -> AsyncIterator[None]:
+    """Serialize requests sharing a key within this process; other processes wait on the row.
+
+    Raises a 409 conflict when the key is still held after ``timeout`` seconds.
+    """
+    lock, users = _key_locks.get((scope, key)) or (asyncio.Lock(), 0)
+    _key_locks[(scope, key)] = (lock, users + 1)
+    try:
+        try:
+            async with asyncio.timeout(timeout):
+                await lock.acquire()
+        except TimeoutError:
+            raise IdempotencyConflict(
+                409, "A request with this Idempotency-Key is still being processed"
+            )
+        try:
+            yield
+        finally:
+            lock.release()
+    finally:
+        lock, users = _key_locks[(scope, key)]
+        if users == 1:
+            del _key_locks[(scope, key)]
+        else:
+            _key_locks[(scope, key)] = (lock, users - 1)
+
+
+@instrument_service
+class AsyncIdempotencyService:
+    """Keyed store of client request outcomes, replayed for retried requests."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        ttl: float = settings.idempotency_ttl,
+        wait_seconds: float = settings.idempotency_wait_seconds,
+        lock_timeout: float = settings.idempotency_lock_timeout,
+    ):
+        self.db = db
+        self.ttl = ttl
+        self.wait_seconds = wait_seconds
+        self.lock_timeout = lock_timeout
+
+    async def begin(
+        self, scope: str, key: str, request_hash: str
+    ) -> StoredResponse | None:
+        """Claim ``key`` for this request, or return the response stored for it.
+
+        Returns None when the caller should handle the request and then call
+        ``complete`` or ``release``. A key reused with a different request
+        raises a 422 conflict, and one still in progress elsewhere after
+        ``wait_seconds`` a 409. A key held past ``lock_timeout`` belongs to a
+        request that crashed: its checkpointed response is replayed, or
+        without one the key is taken over and None returned.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyConflict(
+                400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+            )
+        stored = idempotent_responses.get((scope, key))
+        if stored is not None:
+            return self._check(stored, request_hash)
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.05
+        while True:
+            if await self._claim(scope, key, request_hash):
+                return None
+            row = await self.db.scalar(
+                select(IdempotencyKey)
+                .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+                .execution_options(populate_existing=True)
+            )
+            # A missing row was released between the claim and the read: wait as for one in progress
+            if row is not None:
+                if row.expires_at <= datetime.utcnow():
+                    await self.db.execute(
+                        delete(IdempotencyKey).where(IdempotencyKey.id == row.id)
+                    )
+                    await self.db.commit()
+                    continue
+                if row.status == "completed":
+                    stored = StoredResponse(
+                        row.request_hash,
+                        row.response_status,
+                        json.loads(row.response_body),
+                    )
+                    await self.db.commit()
+                    idempotent_responses.set((scope, key), stored)
+                    return self._check(stored, request_hash)
+                if row.request_hash != request_hash:
+                    raise IdempotencyConflict(
+                        422, "Idempotency-Key was already used with a different request"
+                    )
+                if row.locked_at <= datetime.utcnow() - timedelta(
+                    seconds=self.lock_timeout
+                ):
+                    taken, stored = await self._take_over(row)
+                    if not taken:
+                        continue
+                    if stored is not None:
+                        idempotent_responses.set((scope, key), stored)
+                    return stored
+            await self.db.commit()
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflict(
+                    409, "A request with this Idempotency-Key is still being processed"
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    async def complete(
+        self, scope: str, key: str, request_hash: str, status_code: int, body: Any
+    ):
+        await self.db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            .values(
+                status="completed",
+                response_status=status_code,
+                response_body=json.dumps(body),
+            )
+        )
+        await self.db.commit()
+        idempotent_responses.set(
+            (scope, key), StoredResponse(request_hash, status_code, body)
+        )
+
+    async def checkpoint(self, scope: str, key: str, status_code: int, body: Any):
+        """Stage the response a retry gets if this request dies before ``complete``.
+
+        Not committed: call it in the transaction that writes the request's
+        effect, so the two are recorded together.
+        """
+        await self.db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == "in_progress",
+            )
+            .values(response_status=status_code, response_body=json.dumps(body))
+        )
+
+    async def release(self, scope: str, key: str):
+        """Forget a claimed key whose request had no effect, so a retry runs it again."""
+        await self.db.rollback()
+        await self.db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == "in_progress",
+            )
+        )
+        await self.db.commit()
+
+    async def _take_over(
+        self, row: IdempotencyKey
+    ) -> tuple[bool, StoredResponse | None]:
+        """Take over a crashed request's key.
+
+        Returns whether this request won the key, and its checkpointed response.
+        """
+        locked_at, status_code = row.locked_at, row.response_status
+        stored = None
+        values: dict[str, Any] = {"locked_at": datetime.utcnow()}
+        if status_code is not None:
+            stored = StoredResponse(
+                row.request_hash, status_code, json.loads(row.response_body)
+            )
+            values["status"] = "completed"
+        # Compare-and-set on the lease, so only one retry takes the key over
+        result = await self.db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == row.id,
+                IdempotencyKey.status == "in_progress",
+                IdempotencyKey.locked_at == locked_at,
+            )
+            .values(**values)
+        )
+        await self.db.commit()
+        return result.rowcount == 1, stored
+
+    async def _claim(self, scope: str, key: str, request_hash: str) -> bool:
+        self.db.add(
+            IdempotencyKey(
+                scope=scope,
+                key=key,
+                request_hash=request_hash,
+                status="in_progress",
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl),
+            )
+        )
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            return False
+        return True
+
+    @staticmethod
+    def _check(stored: StoredResponse, request_hash: str) -> StoredResponse:
+        if stored.request_hash != request_hash:
+            raise IdempotencyConflict(
+                422, "Idempotency-Key was already used with a different request"
+            )
+        return stored
+
+
+def purge_expired_keys(db: Session, limit: int = 1000) -> int:
+    """Delete up to ``limit`` expired keys; returns how many were removed."""
+    ids = (
+        db.query(IdempotencyKey.id)
+        .filter(IdempotencyKey.expires_at < datetime.utcnow())
+        .order_by(IdempotencyKey.expires_at)
+        .limit(limit)
+        .all()
+    )
+    if not ids:
+        return 0
+    db.query(IdempotencyKey).filter(IdempotencyKey.id.in_([i for (i,) in ids])).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    return len(ids)
@@ -1,18 +1,30 @@
 import logging
 
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from db.models import PaymentMethod
+from gateways.mercadopago.cache import customer_emails
 from gateways.mercadopago.models import TokenDataInput
+from observability.instrumentation import instrument_service
 
 logger = logging.getLogger(__name__)
 
 
+class DefaultPaymentMethodConflict(Exception):
+    """Another request made a different card the user's default at the same time."""
+
+
+@instrument_service
 class PaymentMethodService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_payment_method(self, user_id: str, data, mp_payment_service=None) -> PaymentMethod:
+    def create_payment_method(
+        self, user_id: str, data, mp_payment_service=None
+    ) -> PaymentMethod:
         if data.is_default:
             self._unset_default_for_user(user_id)
 
@@ -23,43 +35,41 @@ class PaymentMethodService:
             try:
                 token_for_customer = data.card_token_id
                 if data.card_number:
-                    token_data = TokenDataInput(
-                        card_number=data.card_number,
-                        security_code=data.security_code,
-                        card_expiration_month=data.expiration_month,
-                        card_expiration_year=data.expiration_year,
-                        cardholder_name=data.cardholder_name,
-                        doc_type=data.doc_type,
-                        doc_number=data.doc_number,
+                    token_for_customer = mp_payment_service.create_card_token(
+                        _token_data(data)
+                    )
+                    logger.info(
+                        "Created server-side card token for customer card saving"
                     )
-                    token_for_customer = mp_payment_service.create_card_token(token_data)
-                    logger.info("Created server-side card token for customer card saving")
-                mp_customer_id = mp_payment_service.get_or_create_customer(data.payer_email)
-                logger.info("MP customer_id: %s, saving token: %s", mp_customer_id, token_for_customer)
-                mp_card_id = mp_payment_service.save_card_to_customer(mp_customer_id, token_for_customer)
+                mp_customer_id = mp_payment_service.get_or_create_customer(
+                    data.payer_email
+                )
+                logger.info("MP customer_id: %s", mp_customer_id)
+                mp_card_id = mp_payment_service.save_card_to_customer(
+                    mp_customer_id, token_for_customer
+                )
                 logger.info("MP card saved: %s", mp_card_id)
             except Exception as e:
                 # Log but don't fail - fall back to token-based approach
                 import traceback
-                logger.warning("Failed to create MP customer card: %s\n%s", e, traceback.format_exc())
+
+                logger.warning(
+                    "Failed to create MP customer card: %s\n%s",
+                    e,
+                    traceback.format_exc(),
+                )
                 mp_customer_id = None
                 mp_card_id = None
 
-        payment_method = PaymentMethod(
-            user_id=user_id,
-            gateway="mercadopago",
-            card_token_id=data.card_token_id,
-            last_four_digits=data.last_four_digits,
-            payment_method_id=data.payment_method_id,
-            cardholder_name=data.cardholder_name,
-            expiration_month=data.expiration_month,
-            expiration_year=data.expiration_year,
-            is_default=1 if data.is_default else 0,
-            mp_customer_id=mp_customer_id,
-            mp_card_id=mp_card_id,
-        )
+        payment_method = _payment_method_row(user_id, data, mp_customer_id, mp_card_id)
         self.db.add(payment_method)
-        self.db.commit()
+        try:
+            self._commit()
+        except Exception:
+            # The card was saved on MercadoPago but not here, so nothing would reference it
+            if mp_card_id:
+                self._delete_saved_card(mp_payment_service, mp_customer_id, mp_card_id)
+            raise
         self.db.refresh(payment_method)
         return payment_method
 
@@ -78,14 +88,20 @@ class PaymentMethodService:
             .first()
         )
 
-    def get_payment_method(self, payment_method_id: int, user_id: str) -> PaymentMethod | None:
+    def get_payment_method(
+        self, payment_method_id: int, user_id: str
+    ) -> PaymentMethod | None:
         return (
             self.db.query(PaymentMethod)
-            .filter(PaymentMethod.id == payment_method_id, PaymentMethod.user_id == user_id)
+            .filter(
+                PaymentMethod.id == payment_method_id, PaymentMethod.user_id == user_id
+            )
             .first()
         )
 
-    def update_payment_method(self, payment_method_id: int, user_id: str, data) -> PaymentMethod | None:
+    def update_payment_method(
+        self, payment_method_id: int, user_id: str, data
+    ) -> PaymentMethod | None:
         payment_method = self.get_payment_method(payment_method_id, user_id)
         if not payment_method:
             return None
@@ -95,7 +111,9 @@ class PaymentMethodService:
                 self._unset_default_for_user(user_id)
             payment_method.is_default = 1 if data.is_default else 0
 
-        self.db.commit()
+        if payment_method.mp_customer_id:
+            self._forget_customer_email(payment_method.mp_customer_id)
+        self._commit()
         self.db.refresh(payment_method)
         return payment_method
 
@@ -104,13 +122,167 @@ class PaymentMethodService:
         if not payment_method:
             return False
 
+        if payment_method.mp_customer_id:
+            self._forget_customer_email(payment_method.mp_customer_id)
         self.db.delete(payment_method)
         self.db.commit()
         return True
 
+    def _commit(self):
+        # uq_payment_methods_user_default rejects a second default card written concurrently
+        try:
+            self.db.commit()
+        except IntegrityError as e:
+            self.db.rollback()
+            if not _is_default_conflict(e):
+                raise
+            raise DefaultPaymentMethodConflict(
+                "Another default payment method was set concurrently"
+            ) from e
+
+    @staticmethod
+    def _delete_saved_card(mp_payment_service, mp_customer_id: str, mp_card_id: str):
+        try:
+            mp_payment_service.delete_customer_card(mp_customer_id, mp_card_id)
+        except Exception as e:
+            logger.warning("Failed to delete MP card %s: %s", mp_card_id, e)
+
+    def _forget_customer_email(self, mp_customer_id: str):
+        # Payments read the persisted copy before the cache, so both are cleared;
+        # the next payment re-reads the email from MercadoPago.
+        customer_emails.invalidate(mp_customer_id)
+        self.db.query(PaymentMethod).filter(
+            PaymentMethod.mp_customer_id == mp_customer_id
+        ).update({"mp_customer_email": None})
+
     def _unset_default_for_user(self, user_id: str):
         self.db.query(PaymentMethod).filter(
-            PaymentMethod.user_id == user_id,
-            PaymentMethod.is_default == 1
+            PaymentMethod.user_id == user_id, PaymentMethod.is_default == 1
         ).update({"is_default": 0})
         self.db.flush()
+
+
+@instrument_service
+class AsyncPaymentMethodService:
+    """asyncio variant of PaymentMethodService's card saving.
+
+    Saving a card makes up to three MercadoPago calls in a row, so it runs
+    on the event loop instead of holding a threadpool thread.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_payment_method(
+        self, user_id: str, data, mp_payment_service=None
+    ) -> PaymentMethod:
+        if data.is_default:
+            await self._unset_default_for_user(user_id)
+
+        mp_customer_id = None
+        mp_card_id = None
+
+        if mp_payment_service and data.payer_email:
+            try:
+                token_for_customer = data.card_token_id
+                if data.card_number:
+                    token_for_customer = await mp_payment_service.create_card_token(
+                        _token_data(data)
+                    )
+                    logger.info(
+                        "Created server-side card token for customer card saving"
+                    )
+                mp_customer_id = await mp_payment_service.get_or_create_customer(
+                    data.payer_email
+                )
+                logger.info("MP customer_id: %s", mp_customer_id)
+                mp_card_id = await mp_payment_service.save_card_to_customer(
+                    mp_customer_id, token_for_customer
+                )
+                logger.info("MP card saved: %s", mp_card_id)
+            except Exception as e:
+                # Log but don't fail - fall back to token-based approach
+                import traceback
+
+                logger.warning(
+                    "Failed to create MP customer card: %s\n%s",
+                    e,
+                    traceback.format_exc(),
+                )
+                mp_customer_id = None
+                mp_card_id = None
+
+        payment_method = _payment_method_row(user_id, data, mp_customer_id, mp_card_id)
+        self.db.add(payment_method)
+        try:
+            await self._commit()
+        except Exception:
+            # The card was saved on MercadoPago but not here, so nothing would reference it
+            if mp_card_id:
+                try:
+                    await mp_payment_service.delete_customer_card(
+                        mp_customer_id, mp_card_id
+                    )
+                except Exception as e:
+                    logger.warning("Failed to delete MP card %s: %s", mp_card_id, e)
+            raise
+        await self.db.refresh(payment_method)
+        return payment_method
+
+    async def _commit(self):
+        try:
+            await self.db.commit()
+        except IntegrityError as e:
+            await self.db.rollback()
+            if not _is_default_conflict(e):
+                raise
+            raise DefaultPaymentMethodConflict(
+                "Another default payment method was set concurrently"
+            ) from e
+
+    async def _unset_default_for_user(self, user_id: str):
+        await self.db.execute(
+            update(PaymentMethod)
+            .where(PaymentMethod.user_id == user_id, PaymentMethod.is_default == 1)
+            .values(is_default=0)
+        )
+
+
+def _token_data(data) -> TokenDataInput:
+    return TokenDataInput(
+        card_number=data.card_number,
+        security_code=data.security_code,
+        card_expiration_month=data.expiration_month,
+        card_expiration_year=data.expiration_year,
+        cardholder_name=data.cardholder_name,
+        doc_type=data.doc_type,
+        doc_number=data.doc_number,
+    )
+
+
+def _payment_method_row(
+    user_id: str, data, mp_customer_id: str | None, mp_card_id: str | None
+) -> PaymentMethod:
+    return PaymentMethod(
+        user_id=user_id,
+        gateway="mercadopago",
+        card_token_id=data.card_token_id,
+        last_four_digits=data.last_four_digits,
+        payment_method_id=data.payment_method_id,
+        cardholder_name=data.cardholder_name,
+        expiration_month=data.expiration_month,
+        expiration_year=data.expiration_year,
+        is_default=1 if data.is_default else 0,
+        mp_customer_id=mp_customer_id,
+        mp_card_id=mp_card_id,
+        # The customer was looked up (or created) by this email
+        mp_customer_email=data.payer_email if mp_customer_id else None,
+    )
+
+
+def _is_default_conflict(error: IntegrityError) -> bool:
+    # PostgreSQL names the violated index; SQLite only names its column
+    message = str(error.orig)
+    return "uq_payment_methods_user_default" in message or message.endswith(
+        "payment_methods.user_id"
+    )
@@ -1,163 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import json
 import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db.models import Payment, PaymentMethod
-from gateways.mercadopago.exceptions import MercadopagoAPIException
+from config.settings import settings
+from db.bulk import bulk_update_status
+from db.models import Payment, PaymentMethod, PaymentOutbox
+from db.pagination import decode_cursor, encode_cursor
+from gateways.mercadopago.exceptions import (
+    MercadopagoAPIException,
+    MercadopagoCircuitOpenError,
+)
 from gateways.mercadopago.payment_models import PaymentCreate as GatewayPaymentCreate
-from gateways.mercadopago.payment_service import MercadopagoPaymentService
+from gateways.mercadopago.payment_models import PaymentPayer
+from gateways.mercadopago.payment_service import (
+    AsyncMercadopagoPaymentService,
+    MercadopagoPaymentService,
+)
+from observability.instrumentation import instrument_service
 from schemas.payments import PaymentCreate, PaymentWithSavedMethodCreate
 
 logger = logging.getLogger(__name__)
 
+# Called with the pending payment inside the transaction that writes it
+PendingHook = Callable[[Payment], Awaitable[None]]
+
+
+class PaymentOutcomeUnknown(Exception):
+    """The payment was handed to MercadoPago but its answer was not recorded.
+
+    It stays pending and outbox recovery completes it with the same
+    MercadoPago idempotency key, so it must not be created again.
+    """
+
+    def __init__(self, payment_id: int):
+        self.payment_id = payment_id
+        super().__init__(f"outcome of payment {payment_id} is not known yet")
 
+
+@instrument_service
 class PaymentService:
     def __init__(self, db: Session, mp_payment: MercadopagoPaymentService):
         self.db = db
         self.mp = mp_payment
 
-    def create_payment(self, data: PaymentCreate) -> Payment:
-        payment = Payment(
-            gateway="mercadopago",
-            amount=data.transaction_amount,
-            currency="ARS",
-            status="pending",
-            user_id=data.user_id,
-            external_reference=data.external_reference,
-            description=data.description,
-        )
+    def _start_payment(
+        self,
+        data: PaymentCreate | PaymentWithSavedMethodCreate,
+        gateway_data_for: Callable[[int], GatewayPaymentCreate],
+    ) -> tuple[Payment, PaymentOutbox, GatewayPaymentCreate, str]:
+        """Insert the pending payment and its outbox entry in one short transaction."""
+        payment = _pending_payment(data)
         self.db.add(payment)
         self.db.flush()
+        gateway_data = gateway_data_for(payment.id)
+        outbox = _outbox_entry(payment.id, gateway_data)
+        idempotency_key = outbox.idempotency_key
+        self.db.add(outbox)
+        self.db.commit()
+        return payment, outbox, gateway_data, idempotency_key
+
+    def _send_payment(
+        self,
+        payment: Payment,
+        outbox: PaymentOutbox,
+        gateway_data: GatewayPaymentCreate,
+        idempotency_key: str,
+    ) -> Payment:
+        # No transaction is open here: the connection is back in the pool while
+        # MercadoPago answers. Network errors and 5xx leave the outbox entry for
+        # recover_payments; a 4xx or an open circuit means no payment was
+        # created, so the row goes.
         try:
-            gateway_data = GatewayPaymentCreate(
+            result = self.mp.create_payment(
+                gateway_data, idempotency_key=idempotency_key
+            )
+        except MercadopagoAPIException as e:
+            if e.status_code < 500 or isinstance(e, MercadopagoCircuitOpenError):
+                self.db.delete(outbox)
+                self.db.delete(payment)
+                self.db.commit()
+            raise
+        _apply_gateway_result(payment, outbox, result)
+        self.db.commit()
+        self.db.refresh(payment)
+        return payment
+
+    def create_payment(self, data: PaymentCreate) -> Payment:
+        def gateway_data_for(payment_id: int) -> GatewayPaymentCreate:
+            return GatewayPaymentCreate(
                 transaction_amount=data.transaction_amount,
                 token=data.token,
                 payment_method_id=data.payment_method_id,
                 payer=data.payer,
                 installments=data.installments,
                 description=data.description,
-                external_reference=data.external_reference or str(payment.id),
+                external_reference=data.external_reference or str(payment_id),
             )
-            result = self.mp.create_payment(gateway_data)
-            payment.gateway_payment_id = str(result.get("id", ""))
-            payment.status = result.get("status", "pending")
-        except MercadopagoAPIException:
-            self.db.rollback()
-            raise
-        self.db.commit()
-        self.db.refresh(payment)
-        return payment
 
-    def create_payment_with_saved_method(self, data: PaymentWithSavedMethodCreate) -> Payment:
-        print(f"[DEBUG] Creating payment with saved method for user {data.user_id}, payment_method_id {data.payment_method_id}", flush=True)
+        return self._send_payment(*self._start_payment(data, gateway_data_for))
+
+    def create_payment_with_saved_method(
+        self, data: PaymentWithSavedMethodCreate
+    ) -> Payment:
+        logger.debug(
+            "Creating payment with saved method",
+            extra={
+                "user_id": data.user_id,
+                "payment_method_id": data.payment_method_id,
+            },
+        )
         payment_method = (
             self.db.query(PaymentMethod)
             .filter(
                 PaymentMethod.id == data.payment_method_id,
                 PaymentMethod.user_id == data.user_id,
-                PaymentMethod.is_default == 1
+                PaymentMethod.is_default == 1,
             )
             .first()
         )
 
         if not payment_method:
-            print(f"[ERROR] Payment method not found for user {data.user_id}, payment_method_id {data.payment_method_id}", flush=True)
+            logger.warning(
+                "Payment method %s not found or not default for user %s",
+                data.payment_method_id,
+                data.user_id,
+            )
             raise ValueError("Payment method not found or not default")
 
-        print(f"[DEBUG] Found payment method: mp_customer_id={payment_method.mp_customer_id}, mp_card_id={payment_method.mp_card_id}", flush=True)
+        mp_customer_id = payment_method.mp_customer_id
+        mp_card_id = payment_method.mp_card_id
+        card_token_id = payment_method.card_token_id
+        gateway_payment_method_id = payment_method.payment_method_id
+        mp_customer_email = payment_method.mp_customer_email
+        # End the read transaction so no connection is held across the gateway calls
+        self.db.commit()
+
+        logger.debug(
+            "Found payment method",
+            extra={"mp_customer_id": mp_customer_id, "mp_card_id": mp_card_id},
+        )
 
         # Get the correct payer email from MP customer (not from request which might be admin's email)
         payer_email = data.payer.email
-        if payment_method.mp_customer_id:
-            customer_email = self.mp.get_customer_email(payment_method.mp_customer_id)
+        if mp_customer_email:
+            payer_email = mp_customer_email
+        elif mp_customer_id:
+            customer_email = self.mp.get_customer_email(mp_customer_id)
             if customer_email:
-                print(f"[DEBUG] Using MP customer email: {customer_email} (instead of request email: {payer_email})", flush=True)
                 payer_email = customer_email
+                # Persisted with the pending payment, in the same transaction
+                payment_method.mp_customer_email = customer_email
 
         # Use Customer Cards API for a fresh token when available; fall back to the stored token
-        if payment_method.mp_customer_id and payment_method.mp_card_id:
-            print(f"[DEBUG] Creating fresh token from customer card", flush=True)
+        if mp_customer_id and mp_card_id:
             fresh_token = self.mp.create_card_token_from_saved(
-                payment_method.mp_customer_id,
-                payment_method.mp_card_id,
+                mp_customer_id,
+                mp_card_id,
                 data.security_code,
             )
-            print(f"[DEBUG] Fresh token created: {fresh_token}", flush=True)
         else:
-            print(f"[DEBUG] Using stored token: {payment_method.card_token_id}", flush=True)
-            fresh_token = payment_method.card_token_id
-
-        payment = Payment(
-            gateway="mercadopago",
-            amount=data.transaction_amount,
-            currency="ARS",
-            status="pending",
-            user_id=data.user_id,
-            external_reference=data.external_reference,
-            description=data.description,
-        )
-        self.db.add(payment)
-        self.db.flush()
-        try:
-            # When using a saved customer card token, MP requires payer.type/id
-            # but must NOT receive payment_method_id (it's inferred from the token).
-            from gateways.mercadopago.payment_models import PaymentPayer
-            payer_info = PaymentPayer(
-                email=payer_email,
-                type="customer",
-                id=payment_method.mp_customer_id,
+            logger.debug(
+                "Using stored card token", extra={"mp_customer_id": mp_customer_id}
             )
+            fresh_token = card_token_id
 
-            gateway_data = GatewayPaymentCreate(
+        # When using a saved customer card token, MP requires payer.type/id
+        # but must NOT receive payment_method_id (it's inferred from the token).
+        payer_info = PaymentPayer(
+            email=payer_email,
+            type="customer",
+            id=mp_customer_id,
+        )
+
+        def gateway_data_for(payment_id: int) -> GatewayPaymentCreate:
+            return GatewayPaymentCreate(
                 transaction_amount=data.transaction_amount,
                 token=fresh_token,
-                payment_method_id=payment_method.payment_method_id,
+                payment_method_id=gateway_payment_method_id,
                 payer=payer_info,
                 installments=data.installments,
                 description=data.description,
-                external_reference=data.external_reference or str(payment.id),
+                external_reference=data.external_reference or str(payment_id),
                 collector_id=data.collector_id,
             )
-            print(f"[DEBUG] Creating MP payment with: amount={data.transaction_amount}, token={fresh_token[:20]}..., payment_method_id={payment_method.payment_method_id}, payer_email={payer_email}, collector_id={data.collector_id}", flush=True)
-            result = self.mp.create_payment(gateway_data)
-            print(f"[DEBUG] MP payment created successfully: {result.get('id')}", flush=True)
-            payment.gateway_payment_id = str(result.get("id", ""))
-            payment.status = result.get("status", "pending")
+
+        try:
+            payment = self._send_payment(*self._start_payment(data, gateway_data_for))
         except MercadopagoAPIException as e:
-            print(f"[ERROR] MP payment creation failed: {e}", flush=True)
-            self.db.rollback()
+            logger.warning("MP payment creation failed: %s", e)
             raise
-        self.db.commit()
-        self.db.refresh(payment)
+        logger.debug(
+            "MP payment created",
+            extra={
+                "payment_id": payment.id,
+                "gateway_payment_id": payment.gateway_payment_id,
+            },
+        )
         return payment
 
     def create_preference(self, data) -> dict:
-        from schemas.payments import PreferenceResponse
-        items = [
-            {
-                "title": item.title,
-                "quantity": item.quantity,
-                "unit_price": round(item.unit_price, 2),
-                "currency_id": item.currency_id,
-            }
-            for item in data.items
-        ]
-        back_urls = {
-            "success": data.back_urls.success,
-            "failure": data.back_urls.failure,
-            "pending": data.back_urls.pending,
-        }
-        result = self.mp.create_preference(
-            items=items,
-            payer_email=data.payer_email,
-            external_reference=data.external_reference,
-            back_urls=back_urls,
-            notification_url=data.notification_url,
-        )
-        return {
-            "preference_id": result.get("id", ""),
-            "init_point": result.get("init_point", ""),
-            "sandbox_init_point": result.get("sandbox_init_point", ""),
-        }
+        result = self.mp.create_preference(**_preference_kwargs(data))
+        return _preference_response(result)
 
     def get_payment(self, payment_id: int) -> Payment | None:
         return self.db.query(Payment).filter(Payment.id == payment_id).first()
@@ -169,7 +220,9 @@ class PaymentService:
             .first()
         )
 
-    def update_payment_status(self, gateway_payment_id: str, status: str) -> Payment | None:
+    def update_payment_status(
+        self, gateway_payment_id: str, status: str
+    ) -> Payment | None:
         payment = self.get_payment_by_gateway_id(gateway_payment_id)
         if not payment:
             return None
@@ -177,3 +230,392 @@ class PaymentService:
         self.db.commit()
         self.db.refresh(payment)
         return payment
+
+    def update_payment_statuses(self, statuses: dict[str, str]) -> dict:
+        """Apply many gateway statuses, keyed by gateway payment id, in one UPDATE."""
+        result = bulk_update_status(self.db, Payment, "gateway_payment_id", statuses)
+        self.db.commit()
+        return result
+
+    def get_stale_payments(
+        self,
+        statuses: tuple[str, ...],
+        created_before: datetime,
+        after: tuple[datetime, int] | None = None,
+        limit: int = 200,
+    ) -> list[Payment]:
+        """Payments known to MercadoPago still in one of ``statuses``, oldest first.
+
+        Pages are keyed on ``(created_at, id)``; pass the last row's
+        ``(created_at, id)`` as ``after`` for the next. Each status is read in
+        order from the status listing index and the runs are merged here, since
+        one ``status IN (...)`` query would walk every status by date instead.
+        """
+        runs = []
+        for status in statuses:
+            query = self.db.query(Payment).filter(
+                Payment.status == status,
+                Payment.gateway_payment_id.isnot(None),
+                Payment.created_at < created_before,
+            )
+            if after is not None:
+                query = query.filter(
+                    tuple_(Payment.created_at, Payment.id) > tuple_(*after)
+                )
+            runs.append(
+                query.order_by(Payment.created_at, Payment.id).limit(limit).all()
+            )
+        merged = heapq.merge(*runs, key=lambda p: (p.created_at, p.id))
+        return list(itertools.islice(merged, limit))
+
+    def recover_payments(
+        self,
+        limit: int = 50,
+        max_attempts: int = settings.payment_outbox_max_attempts,
+        retry_backoff: float = settings.payment_outbox_retry_backoff,
+        now: datetime | None = None,
+    ) -> dict[str, int]:
+        """Re-send outbox entries whose gateway answer was never recorded.
+
+        Entries become due ``payment_outbox_recovery_after`` seconds after
+        creation, once the request that wrote them has crashed or timed out
+        between the gateway call and the final commit. They are re-sent with
+        their original idempotency key, so MercadoPago returns the payment it
+        already created instead of charging again. A failed re-send is retried
+        after ``retry_backoff`` seconds, doubled on every failure; after
+        ``max_attempts`` the payment is marked ``error`` and left alone.
+        """
+        now = now or datetime.utcnow()
+        entries = (
+            self.db.query(PaymentOutbox)
+            .filter(
+                PaymentOutbox.status == "pending",
+                PaymentOutbox.next_attempt_at <= now,
+            )
+            .order_by(PaymentOutbox.next_attempt_at)
+            .limit(limit)
+            .all()
+        )
+        self.db.commit()
+        counts = {"recovered": 0, "rejected": 0, "retrying": 0, "failed": 0}
+        for outbox in entries:
+            payment = self.db.get(Payment, outbox.payment_id)
+            # The card token is never stored: MercadoPago answers a key it has seen
+            # from its own record, and refuses one it never received rather than
+            # charging the card long after the request
+            gateway_data = GatewayPaymentCreate(
+                **{**json.loads(outbox.request_body), "token": ""}
+            )
+            idempotency_key = outbox.idempotency_key
+            self.db.commit()
+            try:
+                result = self.mp.create_payment(
+                    gateway_data, idempotency_key=idempotency_key
+                )
+            except MercadopagoCircuitOpenError:
+                # Nothing was sent, so no attempt is used up; the rest wait for the next run
+                break
+            except Exception as e:
+                outbox.attempts += 1
+                outbox.last_error = str(e)[:500]
+                if isinstance(e, MercadopagoAPIException) and e.status_code < 500:
+                    outbox.status = "failed"
+                    payment.status = "rejected"
+                    counts["rejected"] += 1
+                elif outbox.attempts >= max_attempts:
+                    outbox.status = "failed"
+                    payment.status = "error"
+                    counts["failed"] += 1
+                    logger.error(
+                        "Payment %s given up after %d recovery attempts: %s",
+                        payment.id,
+                        outbox.attempts,
+                        outbox.last_error,
+                    )
+                else:
+                    outbox.next_attempt_at = datetime.utcnow() + timedelta(
+                        seconds=retry_backoff * 2 ** (outbox.attempts - 1)
+                    )
+                    counts["retrying"] += 1
+                self.db.commit()
+                continue
+            _apply_gateway_result(payment, outbox, result)
+            self.db.commit()
+            counts["recovered"] += 1
+        return counts
+
+
+@instrument_service
+class AsyncPaymentService:
+    """Async counterpart of PaymentService used by the payment routes.
+
+    Both gateway calls and queries are awaited on the event loop, through the
+    async MercadoPago client and an asyncpg ``AsyncSession``.
+    """
+
+    def __init__(self, db: AsyncSession, mp_payment: AsyncMercadopagoPaymentService):
+        self.db = db
+        self.mp = mp_payment
+
+    async def _start_payment(
+        self,
+        data: PaymentCreate | PaymentWithSavedMethodCreate,
+        gateway_data_for: Callable[[int], GatewayPaymentCreate],
+        on_pending: PendingHook | None = None,
+    ) -> tuple[Payment, PaymentOutbox, GatewayPaymentCreate, str]:
+        """Insert the pending payment and its outbox entry in one short transaction.
+
+        ``on_pending`` runs inside that transaction, e.g. to checkpoint the
+        request's Idempotency-Key along with the payment.
+        """
+        payment = _pending_payment(data)
+        self.db.add(payment)
+        await self.db.flush()
+        gateway_data = gateway_data_for(payment.id)
+        outbox = _outbox_entry(payment.id, gateway_data)
+        self.db.add(outbox)
+        if on_pending is not None:
+            await on_pending(payment)
+        await self.db.commit()
+        return payment, outbox, gateway_data, outbox.idempotency_key
+
+    async def _send_payment(
+        self,
+        payment: Payment,
+        outbox: PaymentOutbox,
+        gateway_data: GatewayPaymentCreate,
+        idempotency_key: str,
+    ) -> Payment:
+        # See PaymentService._send_payment: no transaction is open during the call.
+        try:
+            result = await self.mp.create_payment(
+                gateway_data, idempotency_key=idempotency_key
+            )
+        except MercadopagoAPIException as e:
+            if e.status_code < 500 or isinstance(e, MercadopagoCircuitOpenError):
+                await self.db.delete(outbox)
+                await self.db.delete(payment)
+                await self.db.commit()
+            raise
+        except Exception as e:
+            # Transport errors may come after MercadoPago received the request
+            raise PaymentOutcomeUnknown(payment.id) from e
+        try:
+            _apply_gateway_result(payment, outbox, result)
+            await self.db.commit()
+            await self.db.refresh(payment)
+        except Exception as e:
+            raise PaymentOutcomeUnknown(payment.id) from e
+        return payment
+
+    async def _get_default_payment_method(
+        self, payment_method_id: int, user_id: str | None
+    ) -> PaymentMethod | None:
+        return await self.db.scalar(
+            select(PaymentMethod).where(
+                PaymentMethod.id == payment_method_id,
+                PaymentMethod.user_id == user_id,
+                PaymentMethod.is_default == 1,
+            )
+        )
+
+    async def get_payment(self, payment_id: int) -> Payment | None:
+        return await self.db.get(Payment, payment_id)
+
+    async def list_payments(
+        self,
+        user_id: str | None = None,
+        status: str | None = None,
+        external_reference: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> tuple[list[Payment], str | None]:
+        """Newest payments first, one page at a time.
+
+        Pages are keyed on ``(created_at, id)`` rather than offsets, so each
+        page is a range scan of the matching composite index however deep the
+        client pages. Returns the page and the cursor of the next one, or None
+        on the last page. A malformed ``cursor`` raises ValueError.
+        """
+        query = select(Payment)
+        if user_id is not None:
+            query = query.where(Payment.user_id == user_id)
+        if status is not None:
+            query = query.where(Payment.status == status)
+        if external_reference is not None:
+            query = query.where(Payment.external_reference == external_reference)
+        if created_from is not None:
+            query = query.where(Payment.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Payment.created_at < created_to)
+        if cursor is not None:
+            query = query.where(
+                tuple_(Payment.created_at, Payment.id) < tuple_(*decode_cursor(cursor))
+            )
+        query = query.order_by(Payment.created_at.desc(), Payment.id.desc()).limit(
+            limit + 1
+        )
+        payments = list(await self.db.scalars(query))
+        if len(payments) <= limit:
+            return payments, None
+        payments = payments[:limit]
+        return payments, encode_cursor(payments[-1].created_at, payments[-1].id)
+
+    async def create_payment(
+        self, data: PaymentCreate, on_pending: PendingHook | None = None
+    ) -> Payment:
+        def gateway_data_for(payment_id: int) -> GatewayPaymentCreate:
+            return GatewayPaymentCreate(
+                transaction_amount=data.transaction_amount,
+                token=data.token,
+                payment_method_id=data.payment_method_id,
+                payer=data.payer,
+                installments=data.installments,
+                description=data.description,
+                external_reference=data.external_reference or str(payment_id),
+            )
+
+        return await self._send_payment(
+            *await self._start_payment(data, gateway_data_for, on_pending)
+        )
+
+    async def create_payment_with_saved_method(
+        self, data: PaymentWithSavedMethodCreate, on_pending: PendingHook | None = None
+    ) -> Payment:
+        payment_method = await self._get_default_payment_method(
+            data.payment_method_id, data.user_id
+        )
+        # End the read transaction so no connection is held across the gateway calls
+        await self.db.commit()
+        if not payment_method:
+            logger.warning(
+                "Payment method %s not found or not default for user %s",
+                data.payment_method_id,
+                data.user_id,
+            )
+            raise ValueError("Payment method not found or not default")
+
+        async def get_payer_email() -> str:
+            # Use the MP customer's email, not the request's (which might be an admin's)
+            if payment_method.mp_customer_email:
+                return payment_method.mp_customer_email
+            if payment_method.mp_customer_id:
+                customer_email = await self.mp.get_customer_email(
+                    payment_method.mp_customer_id
+                )
+                if customer_email:
+                    # Persisted with the pending payment, in the same transaction
+                    payment_method.mp_customer_email = customer_email
+                    return customer_email
+            return data.payer.email
+
+        async def get_token() -> str:
+            # Use Customer Cards API for a fresh token when available; fall back to the stored token
+            if payment_method.mp_customer_id and payment_method.mp_card_id:
+                return await self.mp.create_card_token_from_saved(
+                    payment_method.mp_customer_id,
+                    payment_method.mp_card_id,
+                    data.security_code,
+                )
+            return payment_method.card_token_id
+
+        payer_email, fresh_token = await asyncio.gather(get_payer_email(), get_token())
+
+        def gateway_data_for(payment_id: int) -> GatewayPaymentCreate:
+            return GatewayPaymentCreate(
+                transaction_amount=data.transaction_amount,
+                token=fresh_token,
+                payment_method_id=payment_method.payment_method_id,
+                payer=PaymentPayer(
+                    email=payer_email, type="customer", id=payment_method.mp_customer_id
+                ),
+                installments=data.installments,
+                description=data.description,
+                external_reference=data.external_reference or str(payment_id),
+                collector_id=data.collector_id,
+            )
+
+        try:
+            return await self._send_payment(
+                *await self._start_payment(data, gateway_data_for, on_pending)
+            )
+        except MercadopagoAPIException as e:
+            logger.warning("MP payment creation failed: %s", e)
+            raise
+
+    async def create_preference(self, data) -> dict:
+        result = await self.mp.create_preference(**_preference_kwargs(data))
+        return _preference_response(result)
+
+
+def _pending_payment(data: PaymentCreate | PaymentWithSavedMethodCreate) -> Payment:
+    return Payment(
+        gateway="mercadopago",
+        amount=data.transaction_amount,
+        currency="ARS",
+        status="pending",
+        user_id=data.user_id,
+        external_reference=data.external_reference,
+        description=data.description,
+    )
+
+
+def payment_idempotency_key(payment_id: int) -> str:
+    """MercadoPago idempotency key of our payment: every send of it, retried or recovered, reuses it.
+
+    Payment ids restart in every installation, so the installation's prefix keeps
+    them from colliding on a MercadoPago account shared with another one.
+    """
+    return f"{settings.payment_idempotency_key_prefix}:{payment_id}"
+
+
+def _outbox_entry(payment_id: int, gateway_data: GatewayPaymentCreate) -> PaymentOutbox:
+    return PaymentOutbox(
+        payment_id=payment_id,
+        idempotency_key=payment_idempotency_key(payment_id),
+        request_body=gateway_data.json(exclude={"token"}),
+        status="pending",
+        # Longer than any in-flight gateway call, so recovery never races the request
+        next_attempt_at=datetime.utcnow()
+        + timedelta(seconds=settings.payment_outbox_recovery_after),
+    )
+
+
+def _apply_gateway_result(payment: Payment, outbox: PaymentOutbox, result: dict):
+    payment.gateway_payment_id = str(result.get("id", ""))
+    payment.status = result.get("status", "pending")
+    outbox.status = "sent"
+
+
+def _preference_kwargs(data) -> dict:
+    items = [
+        {
+            "title": item.title,
+            "quantity": item.quantity,
+            "unit_price": round(item.unit_price, 2),
+            "currency_id": item.currency_id,
+        }
+        for item in data.items
+    ]
+    back_urls = {
+        "success": data.back_urls.success,
+        "failure": data.back_urls.failure,
+        "pending": data.back_urls.pending,
+    }
+    return {
+        "items": items,
+        "payer_email": data.payer_email,
+        "external_reference": data.external_reference,
+        "back_urls": back_urls,
+        "notification_url": data.notification_url,
+    }
+
+
+def _preference_response(result: dict) -> dict:
+    return {
+        "preference_id": result.get("id", ""),
+        "init_point": result.get("init_point", ""),
+        "sandbox_init_point": result.get("sandbox_init_point", ""),
+    }
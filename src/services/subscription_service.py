@@ -1,14 +1,23 @@
+import calendar
 from datetime import datetime, timedelta
 from typing import Any
 
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from db.bulk import bulk_update_status
 from db.models import Plan, Subscription
 from gateways.mercadopago.exceptions import MercadopagoAPIException
-from gateways.mercadopago.subscriptions_service import MercadopagoSubscriptionService
+from gateways.mercadopago.subscriptions_service import (
+    AsyncMercadopagoSubscriptionService,
+    MercadopagoSubscriptionService,
+)
+from observability.instrumentation import instrument_service
 from schemas.subscriptions import PlanCreate, SubscriptionCreate
 
 
+@instrument_service
 class SubscriptionService:
     def __init__(
         self,
@@ -18,15 +27,6 @@ class SubscriptionService:
         self.db = db
         self.mp = mp_subscription
 
-    def _interval_to_frequency(self, interval: str, interval_count: int) -> tuple[int, str]:
-        if interval == "month":
-            return interval_count, "months"
-        if interval == "year":
-            return interval_count, "years"
-        if interval == "day":
-            return interval_count, "days"
-        return 1, "months"
-
     def create_plan(self, data: PlanCreate) -> Plan:
         plan = Plan(
             name=data.name,
@@ -40,7 +40,7 @@ class SubscriptionService:
         self.db.add(plan)
         self.db.flush()
         try:
-            freq, freq_type = self._interval_to_frequency(data.interval, data.interval_count)
+            freq, freq_type = _interval_to_frequency(data.interval, data.interval_count)
             result = self.mp.create_plan(
                 reason=data.name,
                 amount=data.amount,
@@ -88,16 +88,7 @@ class SubscriptionService:
                 external_reference=str(sub.id),
                 notification_url=data.notification_url,
             )
-            sub.gateway_subscription_id = result.get("id")
-            sub.status = result.get("status", "pending")
-            if result.get("date_approved"):
-                sub.current_period_start = datetime.utcnow()
-                if plan.interval == "month":
-                    sub.current_period_end = sub.current_period_start + timedelta(days=30 * plan.interval_count)
-                elif plan.interval == "year":
-                    sub.current_period_end = sub.current_period_start + timedelta(days=365 * plan.interval_count)
-                else:
-                    sub.current_period_end = sub.current_period_start + timedelta(days=plan.interval_count)
+            _apply_gateway_subscription(sub, plan, result)
         except MercadopagoAPIException:
             self.db.rollback()
             raise
@@ -106,7 +97,11 @@ class SubscriptionService:
         return sub
 
     def get_subscription(self, subscription_id: int) -> Subscription | None:
-        return self.db.query(Subscription).filter(Subscription.id == subscription_id).first()
+        return (
+            self.db.query(Subscription)
+            .filter(Subscription.id == subscription_id)
+            .first()
+        )
 
     def get_subscription_by_user(self, user_id: str) -> list[Subscription]:
         return (
@@ -116,7 +111,9 @@ class SubscriptionService:
             .all()
         )
 
-    def cancel_subscription(self, subscription_id: int, at_period_end: bool = False) -> Subscription | None:
+    def cancel_subscription(
+        self, subscription_id: int, at_period_end: bool = False
+    ) -> Subscription | None:
         sub = self.get_subscription(subscription_id)
         if not sub or not sub.gateway_subscription_id:
             return None
@@ -136,7 +133,9 @@ class SubscriptionService:
         self.db.refresh(sub)
         return sub
 
-    def update_subscription_status(self, gateway_subscription_id: str, status: str) -> Subscription | None:
+    def update_subscription_status(
+        self, gateway_subscription_id: str, status: str
+    ) -> Subscription | None:
         sub = (
             self.db.query(Subscription)
             .filter(Subscription.gateway_subscription_id == gateway_subscription_id)
@@ -148,3 +147,219 @@ class SubscriptionService:
         self.db.commit()
         self.db.refresh(sub)
         return sub
+
+    def get_due_subscriptions(
+        self,
+        now: datetime,
+        after: tuple[datetime, int] | None = None,
+        limit: int = 500,
+    ) -> list[Subscription]:
+        """Authorized subscriptions whose current period ended by ``now``, oldest period end first.
+
+        Pages are keyed on ``(current_period_end, id)``; pass the last row's
+        values as ``after`` for the next one.
+        """
+        query = self.db.query(Subscription).filter(
+            Subscription.status == "authorized",
+            Subscription.current_period_end <= now,
+        )
+        if after is not None:
+            query = query.filter(
+                tuple_(Subscription.current_period_end, Subscription.id)
+                > tuple_(*after)
+            )
+        return (
+            query.order_by(Subscription.current_period_end, Subscription.id)
+            .limit(limit)
+            .all()
+        )
+
+    def update_subscription_statuses(self, statuses: dict[str, str]) -> dict:
+        """Apply many gateway statuses, keyed by gateway subscription id, in one UPDATE."""
+        result = bulk_update_status(
+            self.db, Subscription, "gateway_subscription_id", statuses
+        )
+        self.db.commit()
+        return result
+
+
+@instrument_service
+class AsyncSubscriptionService:
+    """Async counterpart of SubscriptionService used by the subscription routes.
+
+    Both gateway calls and queries are awaited on the event loop, through the
+    async MercadoPago client and an asyncpg ``AsyncSession``.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        mp_subscription: AsyncMercadopagoSubscriptionService,
+    ):
+        self.db = db
+        self.mp = mp_subscription
+
+    async def _add(self, instance):
+        self.db.add(instance)
+        await self.db.flush()
+        return instance
+
+    async def _commit(self, instance):
+        await self.db.commit()
+        await self.db.refresh(instance)
+        return instance
+
+    async def list_plans(self, active_only: bool = True) -> list[Plan]:
+        query = select(Plan)
+        if active_only:
+            query = query.where(Plan.active == 1)
+        return list(await self.db.scalars(query.order_by(Plan.id)))
+
+    async def get_plan(self, plan_id: int) -> Plan | None:
+        return await self.db.get(Plan, plan_id)
+
+    async def get_subscription(self, subscription_id: int) -> Subscription | None:
+        return await self.db.get(Subscription, subscription_id)
+
+    async def get_subscription_by_user(self, user_id: str) -> list[Subscription]:
+        return list(
+            await self.db.scalars(
+                select(Subscription)
+                .where(Subscription.user_id == user_id)
+                .order_by(Subscription.created_at.desc())
+            )
+        )
+
+    async def create_plan(self, data: PlanCreate) -> Plan:
+        plan = Plan(
+            name=data.name,
+            description=data.description,
+            amount=data.amount,
+            currency=data.currency,
+            interval=data.interval,
+            interval_count=data.interval_count,
+            gateway="mercadopago",
+        )
+        await self._add(plan)
+        try:
+            freq, freq_type = _interval_to_frequency(data.interval, data.interval_count)
+            result = await self.mp.create_plan(
+                reason=data.name,
+                amount=data.amount,
+                currency=data.currency,
+                frequency=freq,
+                frequency_type=freq_type,
+            )
+            plan.gateway_plan_id = result.get("id")
+        except MercadopagoAPIException:
+            await self.db.rollback()
+            raise
+        return await self._commit(plan)
+
+    async def create_subscription(self, data: SubscriptionCreate) -> Subscription:
+        plan = await self.get_plan(data.plan_id)
+        if not plan:
+            raise ValueError("plan_not_found")
+        if not plan.gateway_plan_id:
+            raise ValueError("plan_not_linked_to_gateway")
+        sub = Subscription(
+            plan_id=plan.id,
+            user_id=data.user_id,
+            gateway="mercadopago",
+            status="pending",
+        )
+        await self._add(sub)
+        try:
+            result = await self.mp.create_subscription(
+                preapproval_plan_id=plan.gateway_plan_id,
+                reason=plan.name,
+                payer_email=data.payer_email,
+                card_token_id=data.card_token_id,
+                external_reference=str(sub.id),
+                notification_url=data.notification_url,
+            )
+            _apply_gateway_subscription(sub, plan, result)
+        except MercadopagoAPIException:
+            await self.db.rollback()
+            raise
+        return await self._commit(sub)
+
+    async def cancel_subscription(
+        self, subscription_id: int, at_period_end: bool = False
+    ) -> Subscription | None:
+        sub = await self.get_subscription(subscription_id)
+        if not sub or not sub.gateway_subscription_id:
+            return None
+        if at_period_end:
+            sub.cancel_at_period_end = 1
+            return await self._commit(sub)
+        try:
+            await self.mp.cancel_subscription(sub.gateway_subscription_id)
+        except MercadopagoAPIException:
+            await self.db.rollback()
+            raise
+        sub.status = "cancelled"
+        sub.cancelled_at = datetime.utcnow()
+        return await self._commit(sub)
+
+
+def _interval_to_frequency(interval: str, interval_count: int) -> tuple[int, str]:
+    if interval == "month":
+        return interval_count, "months"
+    if interval == "year":
+        return interval_count, "years"
+    if interval == "day":
+        return interval_count, "days"
+    return 1, "months"
+
+
+def add_months(start: datetime, months: int) -> datetime:
+    """``start`` moved by whole calendar months, clamped to the last day of shorter months."""
+    month = start.month - 1 + months
+    year, month = start.year + month // 12, month % 12 + 1
+    return start.replace(
+        year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1])
+    )
+
+
+def add_intervals(start: datetime, interval: str, count: int) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=count)
+    if interval == "year":
+        return add_months(start, 12 * count)
+    # "month", and the monthly fallback of _interval_to_frequency
+    return add_months(start, count)
+
+
+# Longest possible period per interval unit, to bound the number of periods elapsed from below
+_MAX_DAYS = {"day": 1, "month": 31, "year": 366}
+
+
+def current_period(
+    anchor: datetime, interval: str, interval_count: int, now: datetime
+) -> tuple[datetime, datetime]:
+    """Bounds of the billing period containing ``now`` for a subscription started at ``anchor``.
+
+    Every period end is computed from ``anchor``, not from the previous end,
+    so a subscription started on the 31st renews on the last day of shorter
+    months and returns to the 31st afterwards.
+    """
+    step = interval_count or 1
+    # Skip straight to the last periods, so catching up stays cheap for old subscriptions
+    periods = max((now - anchor).days // (_MAX_DAYS.get(interval, 31) * step) - 1, 0)
+    start = add_intervals(anchor, interval, step * periods)
+    end = add_intervals(anchor, interval, step * (periods + 1))
+    while end <= now:
+        periods += 1
+        start, end = end, add_intervals(anchor, interval, step * (periods + 1))
+    return start, end
+
+
+def _apply_gateway_subscription(sub: Subscription, plan: Plan, result: dict[str, Any]):
+    sub.gateway_subscription_id = result.get("id")
+    sub.status = result.get("status", "pending")
+    if result.get("date_approved"):
+        sub.billing_anchor = sub.current_period_start = datetime.utcnow()
+        sub.current_period_end = add_intervals(
+            sub.current_period_start, plan.interval, plan.interval_count or 1
+        )
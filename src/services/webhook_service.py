@@ -0,0 +1,225 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Hashable
+
+from sqlalchemy import func, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from db.models import WebhookEvent
+from observability.instrumentation import instrument_service
+
+# Topics the webhook workers apply; notifications for any other topic are ignored
+PAYMENT_TOPICS = ("payment",)
+SUBSCRIPTION_TOPICS = ("preapproval", "authorized_payment")
+
+
+class WebhookDedupStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.received = 0
+        self.enqueued = 0
+        self.coalesced_memory = 0
+        self.coalesced_db = 0
+
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "received": self.received,
+                "enqueued": self.enqueued,
+                "coalesced_memory": self.coalesced_memory,
+                "coalesced_db": self.coalesced_db,
+            }
+
+
+webhook_dedup_stats = WebhookDedupStats()
+
+
+class CoalescingWindow:
+    """Remembers recently enqueued (topic, resource id) keys for ``window`` seconds.
+
+    Enqueued events only become due ``window`` seconds after the first
+    notification, so a key seen inside the window still has an unclaimed
+    pending row and repeated deliveries can be dropped without a database
+    round trip.
+    """
+
+    def __init__(self, window: float, maxsize: int = 10_000):
+        self.window = window
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._seen: dict[Hashable, float] = {}
+
+    def seen(self, key: Hashable) -> bool:
+        with self._lock:
+            seen_at = self._seen.get(key)
+            return seen_at is not None and time.monotonic() - seen_at < self.window
+
+    def remember(self, key: Hashable, seen_at: float):
+        with self._lock:
+            if len(self._seen) >= self.maxsize:
+                now = time.monotonic()
+                self._seen = {
+                    k: t for k, t in self._seen.items() if now - t < self.window
+                }
+            self._seen[key] = seen_at
+
+
+recent_webhooks = CoalescingWindow(settings.webhook_coalesce_window)
+
+
+@instrument_service
+class WebhookInboxService:
+    """Persisted inbox of gateway notifications, drained by the webhook workers."""
+
+    def __init__(self, db: Session, window: CoalescingWindow | None = None):
+        self.db = db
+        self.window = window or recent_webhooks
+
+    def enqueue(
+        self, topic: str, resource_id: str, payload: dict[str, Any] | None = None
+    ) -> WebhookEvent | None:
+        """Persist a notification, coalescing it into an already pending one.
+
+        At most one pending event exists per (gateway, topic, resource id),
+        enforced by a partial unique index; it becomes due ``window`` seconds
+        after the first notification so a burst of redeliveries results in a
+        single gateway fetch. Returns None when the notification was coalesced.
+        """
+        webhook_dedup_stats.incr("received")
+        key = (topic, resource_id)
+        if self.window.seen(key):
+            webhook_dedup_stats.incr("coalesced_memory")
+            return None
+        seen_at = time.monotonic()
+        event = WebhookEvent(
+            gateway="mercadopago",
+            topic=topic,
+            resource_id=resource_id,
+            payload=json.dumps(payload) if payload is not None else None,
+            status="pending",
+            available_at=datetime.utcnow() + timedelta(seconds=self.window.window),
+        )
+        self.db.add(event)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            # The pending row may have been created long ago by another process,
+            # so its due time is unknown and the key is not remembered.
+            webhook_dedup_stats.incr("coalesced_db")
+            return None
+        webhook_dedup_stats.incr("enqueued")
+        self.window.remember(key, seen_at)
+        return event
+
+    def claim(self, limit: int, visibility_timeout: float) -> list[WebhookEvent]:
+        """Lock up to ``limit`` due events for this worker.
+
+        Events left in ``processing`` longer than ``visibility_timeout`` seconds
+        belong to a worker that died mid-batch and are claimed again.
+        """
+        now = datetime.utcnow()
+        # One index range scan per state instead of an OR the planner may answer
+        # by walking the primary key across every processed event
+        due = union_all(
+            select(WebhookEvent.id).where(
+                WebhookEvent.status == "pending", WebhookEvent.available_at <= now
+            ),
+            select(WebhookEvent.id).where(
+                WebhookEvent.status == "processing",
+                WebhookEvent.locked_at < now - timedelta(seconds=visibility_timeout),
+            ),
+        )
+        events = (
+            self.db.query(WebhookEvent)
+            .filter(WebhookEvent.id.in_(due))
+            .order_by(WebhookEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for event in events:
+            event.status = "processing"
+            event.locked_at = now
+            event.attempts += 1
+        self.db.commit()
+        return events
+
+    def mark_done_many(self, events: list[WebhookEvent]):
+        if not events:
+            return
+        self.db.query(WebhookEvent).filter(
+            WebhookEvent.id.in_([e.id for e in events])
+        ).update(
+            {
+                WebhookEvent.status: "done",
+                WebhookEvent.processed_at: datetime.utcnow(),
+                WebhookEvent.locked_at: None,
+                WebhookEvent.last_error: None,
+            },
+            synchronize_session="fetch",
+        )
+        self.db.commit()
+
+    def mark_failed(
+        self, event: WebhookEvent, error: str, max_attempts: int, retry_backoff: float
+    ):
+        event.last_error = error[:500]
+        event.locked_at = None
+        if event.attempts >= max_attempts:
+            event.status = "failed"
+            self.db.commit()
+            return
+        event.status = "pending"
+        event.available_at = datetime.utcnow() + timedelta(
+            seconds=retry_backoff * 2 ** (event.attempts - 1)
+        )
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # A newer notification for the resource is already pending and will
+            # fetch its current state, so this retry is redundant.
+            self.db.rollback()
+            event.status = "superseded"
+            event.last_error = error[:500]
+            event.locked_at = None
+            self.db.commit()
+
+    def pending_count(self) -> int:
+        return (
+            self.db.query(func.count(WebhookEvent.id))
+            .filter(WebhookEvent.status.in_(("pending", "processing")))
+            .scalar()
+        )
+
+
+def purge_processed_events(db: Session, older_than: float, limit: int = 1000) -> int:
+    """Delete up to ``limit`` events processed and due over ``older_than`` seconds ago.
+
+    Failed events are kept for inspection. Returns how many were removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    ids: list[int] = []
+    # One index range scan per state, as in claim
+    for status in ("done", "superseded"):
+        ids += [
+            i
+            for (i,) in db.query(WebhookEvent.id)
+            .filter(WebhookEvent.status == status, WebhookEvent.available_at < cutoff)
+            .limit(limit - len(ids))
+        ]
+    if not ids:
+        return 0
+    db.query(WebhookEvent).filter(WebhookEvent.id.in_(ids)).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    return len(ids)
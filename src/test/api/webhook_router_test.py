@@ -0,0 +1,21 @@
+from api.v1.routers import webhooks
+from test.conftest import client
+
+
+class TestWebhooksApi:
+    def test_topics_no_worker_handles_are_acknowledged_but_not_stored(
+        self, monkeypatch
+    ):
+        enqueued = []
+        monkeypatch.setattr(webhooks, "_enqueue", lambda *args: enqueued.append(args))
+
+        for topic in ("merchant_order", "payment"):
+            response = client.post(
+                "/api/v1/webhooks/mercadopago",
+                json={"type": topic, "data": {"id": "7"}},
+            )
+            assert response.json() == {"ok": True}
+
+        assert [(topic, resource_id) for topic, resource_id, _ in enqueued] == [
+            ("payment", "7")
+        ]
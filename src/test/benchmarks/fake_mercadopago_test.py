@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fake_mercadopago import FakeMercadopagoServer, FaultProfile
+from benchmarks.runner import percentile, run_scenario
+from benchmarks.scenarios import Scenario
+from gateways.mercadopago.exceptions import MercadopagoAPIException
+from gateways.mercadopago.payment_models import PaymentCreate, PaymentPayer
+from gateways.mercadopago.payment_service import MercadopagoPaymentService
+from gateways.mercadopago.services import MercadopagoService
+
+
+@pytest.fixture
+def fake_mp():
+    server = FakeMercadopagoServer().start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def _payment_client(server: FakeMercadopagoServer) -> MercadopagoPaymentService:
+    client = MercadopagoPaymentService(access_token="at")
+    client.base_url = f"{server.base_url}/v1"
+    return client
+
+
+class _CatalogScenario(Scenario):
+    name = "catalog"
+
+    def build(self, i):
+        return "GET", "/v1/identification_types", {}
+
+
+class TestFakeMercadopago:
+    def test_serves_gateway_clients(self, fake_mp):
+        checkout = MercadopagoService(public_key="pk")
+        checkout.base_url = f"{fake_mp.base_url}/v1"
+        assert checkout.get_identification_types()[0]["id"] == "DNI"
+
+        client = _payment_client(fake_mp)
+        data = PaymentCreate(
+            transaction_amount=100.0,
+            token="tok",
+            payment_method_id="visa",
+            payer=PaymentPayer(email="payer@example.com"),
+        )
+        first = client.create_payment(data, idempotency_key="payments:1")
+        again = client.create_payment(data, idempotency_key="payments:1")
+        assert first["status"] == "approved"
+        assert again["id"] == first["id"]
+        assert client.get_payment(first["id"])["id"] == first["id"]
+
+    def test_injects_errors(self):
+        server = FakeMercadopagoServer(
+            faults=FaultProfile(error_rate=1.0, error_status=503)
+        ).start()
+        try:
+            with pytest.raises(MercadopagoAPIException) as exc_info:
+                _payment_client(server).get_payment(1)
+        finally:
+            server.stop()
+        assert exc_info.value.status_code == 503
+        stats = server.stats()
+        assert stats["requests"] >= 1
+        assert stats["errors"] == stats["requests"]
+
+
+class TestRunner:
+    def test_percentile_is_nearest_rank(self):
+        ordered = [float(i) for i in range(1, 101)]
+        assert percentile(ordered, 50) == 50.0
+        assert percentile(ordered, 99) == 99.0
+        assert percentile([], 99) == 0.0
+
+    def test_run_scenario_records_every_request(self, fake_mp):
+        async def drive():
+            async with httpx.AsyncClient(base_url=fake_mp.base_url) as client:
+                return await run_scenario(
+                    client, _CatalogScenario(), rps=50, duration=0.2, max_in_flight=10
+                )
+
+        summary = asyncio.run(drive()).summary()
+        assert summary["requests"] == 10
+        assert summary["errors"] == 0
+        assert summary["statuses"] == {"200": 10}
@@ -1,8 +1,53 @@
+import asyncio
+
+import pytest
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
 
 from api.main import app
+from db.session import Base
 
 load_dotenv()
 
 client = TestClient(app)
+
+
+@pytest.fixture
+def sqlite_db():
+    """Session on an in-memory SQLite database with every table created."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def async_sqlite_db(tmp_path):
+    """Runs ``await fn(db, sessions)`` on a file SQLite database with every table created.
+
+    ``db`` is an open AsyncSession and ``sessions`` the factory for opening
+    more, e.g. to stand in for concurrent requests. Returns what ``fn`` returns.
+    """
+
+    def run(fn):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+            try:
+                async with sessions() as db:
+                    return await fn(db, sessions)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,253 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.models import (
+    IdempotencyKey,
+    Payment,
+    PaymentMethod,
+    PaymentOutbox,
+    Plan,
+    Subscription,
+    WebhookEvent,
+)
+from db.session import Base
+from services.idempotency_service import purge_expired_keys
+from services.payment_method_service import PaymentMethodService
+from services.payment_service import AsyncPaymentService, PaymentService
+from services.subscription_service import SubscriptionService
+from services.webhook_service import (
+    CoalescingWindow,
+    WebhookInboxService,
+    purge_processed_events,
+)
+
+ROWS = 20_000
+USERS = 2_000
+# A plan step reading the whole table: "SCAN payments", not "SCAN payments USING INDEX ..."
+_FULL_SCAN = re.compile(r"SCAN \w+")
+
+
+def _seed(engine):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Plan),
+            [{"id": 1, "name": "monthly", "amount": 10, "interval": "month"}],
+        )
+        conn.execute(
+            insert(Payment),
+            [
+                {
+                    "amount": 100,
+                    "status": ("approved", "pending", "rejected")[i % 3],
+                    "user_id": f"u{i % USERS}",
+                    "gateway_payment_id": str(10**9 + i),
+                    "external_reference": f"ref-{i}",
+                    "created_at": now - timedelta(minutes=i),
+                }
+                for i in range(ROWS)
+            ],
+        )
+        conn.execute(
+            insert(PaymentOutbox),
+            [
+                {
+                    "payment_id": i + 1,
+                    "idempotency_key": f"payments:{i + 1}",
+                    "request_body": "{}",
+                    "status": "pending" if i % 500 == 0 else "sent",
+                    "next_attempt_at": now - timedelta(minutes=i),
+                    "created_at": now - timedelta(minutes=i),
+                }
+                for i in range(ROWS)
+            ],
+        )
+        conn.execute(
+            insert(PaymentMethod),
+            [
+                {
+                    "user_id": f"u{i % USERS}",
+                    "card_token_id": f"tok-{i}",
+                    "mp_customer_id": f"c{i % USERS}",
+                    "last_four_digits": "4242",
+                    "payment_method_id": "visa",
+                    "cardholder_name": "APRO",
+                    "expiration_month": "11",
+                    "expiration_year": "2030",
+                    "is_default": 1 if i < USERS else 0,
+                    "created_at": now - timedelta(minutes=i),
+                }
+                for i in range(ROWS)
+            ],
+        )
+        conn.execute(
+            insert(Subscription),
+            [
+                {
+                    "plan_id": 1,
+                    "user_id": f"u{i % USERS}",
+                    "gateway_subscription_id": f"sub-{i}",
+                    "status": "authorized",
+                    "created_at": now - timedelta(minutes=i),
+                }
+                for i in range(ROWS)
+            ],
+        )
+        conn.execute(
+            insert(WebhookEvent),
+            [
+                {
+                    "topic": "payment",
+                    "resource_id": str(i),
+                    "status": "pending" if i % 500 == 0 else "done",
+                    "available_at": now - timedelta(minutes=i),
+                }
+                for i in range(ROWS)
+            ],
+        )
+        conn.execute(
+            insert(IdempotencyKey),
+            [
+                {
+                    "scope": "payments",
+                    "key": f"k{i}",
+                    "request_hash": "hash",
+                    "status": "completed",
+                    "expires_at": now + timedelta(minutes=i - 50),
+                }
+                for i in range(ROWS)
+            ],
+        )
+        conn.execute(text("ANALYZE"))
+
+
+@pytest.fixture(scope="module")
+def seeded_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("query_plan") / "plan.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    _seed(engine)
+    engine.dispose()
+    return path
+
+
+def _record_statements(engine) -> list[tuple[str, tuple]]:
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(
+            ("SELECT", "UPDATE", "DELETE")
+        ):
+            statements.append((statement, tuple(parameters)))
+
+    return statements
+
+
+def _scans(engine, statements: list[tuple[str, tuple]]) -> list[str]:
+    """Plan steps that read a whole table or sort outside an index, with their statement."""
+    problems = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ):
+                detail = row[-1]
+                if _FULL_SCAN.fullmatch(detail) or "TEMP B-TREE" in detail:
+                    problems.append(f"{detail}: {' '.join(statement.split())}")
+    return problems
+
+
+class TestQueryPlans:
+    def test_sync_service_queries_use_indexes(self, seeded_db):
+        engine = create_engine(f"sqlite:///{seeded_db}")
+        statements = _record_statements(engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            methods = PaymentMethodService(db)
+            methods.get_payment_methods_by_user("u7")
+            methods.get_default_payment_method("u7")
+            methods.get_payment_method(7, "u7")
+            payments = PaymentService(db, mp_payment=None)
+            payments.get_payment_by_gateway_id(str(10**9 + 7))
+            payments.recover_payments(limit=0)
+            subscriptions = SubscriptionService(db, mp_subscription=None)
+            subscriptions.get_subscription_by_user("u7")
+            subscriptions.get_due_subscriptions(datetime.utcnow(), limit=10)
+            subscriptions.update_subscription_status("sub-missing", "cancelled")
+            inbox = WebhookInboxService(db, window=CoalescingWindow(0))
+            inbox.claim(limit=10, visibility_timeout=300)
+            inbox.pending_count()
+            purge_processed_events(db, older_than=86400, limit=0)
+            purge_expired_keys(db, limit=0)
+            db.rollback()
+        finally:
+            db.close()
+
+        assert len(statements) >= 10
+        assert _scans(engine, statements) == []
+        engine.dispose()
+
+    def test_stale_payments_are_read_through_the_status_index(self, seeded_db):
+        engine = create_engine(f"sqlite:///{seeded_db}")
+        statements = _record_statements(engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            payments = PaymentService(db, mp_payment=None)
+            first = payments.get_stale_payments(
+                ("pending", "rejected"), datetime.utcnow(), limit=50
+            )
+            payments.get_stale_payments(
+                ("pending", "rejected"),
+                datetime.utcnow(),
+                after=(first[-1].created_at, first[-1].id),
+                limit=50,
+            )
+        finally:
+            db.close()
+
+        keys = [(p.created_at, p.id) for p in first]
+        assert keys == sorted(keys) and len(keys) == 50
+        assert {p.status for p in first} == {"pending", "rejected"}
+        assert _scans(engine, statements) == []
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = " ".join(
+                    row[-1]
+                    for row in conn.exec_driver_sql(
+                        f"EXPLAIN QUERY PLAN {statement}", parameters
+                    )
+                )
+                assert "ix_payments_status_created_at_id" in plan
+        engine.dispose()
+
+    def test_payment_listing_uses_indexes(self, seeded_db):
+        async def list_pages():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{seeded_db}")
+            statements = _record_statements(engine.sync_engine)
+            try:
+                async with async_sessionmaker(bind=engine)() as db:
+                    service = AsyncPaymentService(db=db, mp_payment=None)
+                    _, cursor = await service.list_payments(limit=20)
+                    await service.list_payments(cursor=cursor, limit=20)
+                    await service.list_payments(user_id="u7", limit=20)
+                    await service.list_payments(
+                        status="pending", cursor=cursor, limit=20
+                    )
+                    await service.list_payments(external_reference="ref-7")
+            finally:
+                await engine.dispose()
+            return statements
+
+        statements = asyncio.run(list_pages())
+
+        engine = create_engine(f"sqlite:///{seeded_db}")
+        assert len(statements) == 5
+        assert _scans(engine, statements) == []
+        engine.dispose()
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from db.session import (
+    BatchSessionLocal,
+    SessionLocal,
+    _TimedQueuePool,
+    pool_checkout_stats,
+)
+
+
+class TestTimedQueuePool:
+    def test_checkouts_overflow_and_timeouts_are_recorded(self, tmp_path):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=_TimedQueuePool,
+            pool_size=1,
+            max_overflow=1,
+            pool_timeout=0.05,
+        )
+        before = pool_checkout_stats.snapshot()
+        first = engine.connect()
+        second = engine.connect()
+        second.execute(text("select 1"))
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        first.close()
+        second.close()
+        engine.dispose()
+
+        after = pool_checkout_stats.snapshot()
+        assert after["checkouts"] - before["checkouts"] == 2
+        assert after["overflow_checkouts"] - before["overflow_checkouts"] == 1
+        assert after["timeouts"] - before["timeouts"] == 1
+        assert after["max_wait_seconds"] >= 0
+
+
+class TestSessionFactories:
+    def test_only_worker_sessions_keep_objects_loaded_across_commits(self):
+        # Request handlers refresh after commit and rely on SQLAlchemy's default
+        assert SessionLocal.kw["expire_on_commit"] is True
+        assert BatchSessionLocal.kw["expire_on_commit"] is False
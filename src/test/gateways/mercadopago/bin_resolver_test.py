@@ -0,0 +1,42 @@
+import copy
+
+from gateways.mercadopago.bin_resolver import BinResolver, get_bin_resolver
+from gateways.mercadopago.models import PaymentMethod
+
+
+def _catalog():
+    visa = copy.deepcopy(PaymentMethod.Config.schema_extra)
+    master = copy.deepcopy(visa)
+    master["id"] = "master"
+    master["settings"][0]["bin"] = {
+        "pattern": "^(5|(2[2-7]))",
+        "exclusion_pattern": "^(589562)",
+        "installments_pattern": "^(5|(2[2-7]))",
+    }
+    inactive = copy.deepcopy(visa)
+    inactive["id"] = "inactive"
+    inactive["status"] = "deactive"
+    return [inactive, visa, master]
+
+
+class TestBinResolver:
+    def test_resolves_bins_from_catalog_patterns(self):
+        resolver = BinResolver(_catalog())
+
+        assert resolver.resolve("450995")["id"] == "visa"
+        assert resolver.resolve("50900000")["id"] == "master"
+        assert resolver.resolve("22300000")["id"] == "master"
+
+    def test_exclusion_patterns_and_unknown_bins_miss(self):
+        resolver = BinResolver(_catalog())
+
+        assert resolver.resolve("400163") is None
+        assert resolver.resolve("589562") is None
+        assert resolver.resolve("999999") is None
+
+    def test_resolver_is_rebuilt_only_when_catalog_changes(self):
+        catalog = _catalog()
+        resolver = get_bin_resolver("pk-test", catalog)
+
+        assert get_bin_resolver("pk-test", catalog) is resolver
+        assert get_bin_resolver("pk-test", _catalog()) is not resolver
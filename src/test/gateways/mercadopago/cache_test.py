@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from gateways.mercadopago.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_fresh_entries_are_served_from_memory(self):
+        cache = TTLCache(name="test", maxsize=4, ttl=60)
+        calls = []
+        loader = lambda: calls.append(1) or ["visa"]
+
+        assert cache.get_or_load("k", loader) == ["visa"]
+        assert cache.get_or_load("k", loader) == ["visa"]
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        cache = TTLCache(name="test", maxsize=4, ttl=0, stale_ttl=60)
+        cache.set("k", "old")
+
+        assert cache.get_or_load("k", lambda: "new") == "old"
+        for _ in range(100):
+            if cache.get_or_load("k", lambda: "new") == "new":
+                break
+            time.sleep(0.01)
+        assert cache.get_or_load("k", lambda: "newer") == "new"
+
+    def test_last_known_value_survives_loader_errors(self):
+        cache = TTLCache(name="test", maxsize=4, ttl=0, stale_ttl=0)
+        cache.set("k", "cached")
+
+        def failing_loader():
+            raise ConnectionError("mp down")
+
+        assert cache.get_or_load("k", failing_loader) == "cached"
+        with pytest.raises(ConnectionError):
+            cache.get_or_load("other", failing_loader)
+
+    def test_size_bound_and_invalidation(self):
+        cache = TTLCache(name="test", maxsize=2, ttl=60)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+
+        assert cache.stats()["size"] == 2
+        assert cache.invalidate("a") == 0
+        assert cache.invalidate("c") == 1
+        assert cache.invalidate() == 1
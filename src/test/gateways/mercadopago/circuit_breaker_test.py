@@ -0,0 +1,149 @@
+import pytest
+import responses
+
+from gateways.mercadopago.cache import TTLCache
+from gateways.mercadopago.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    endpoint_family,
+)
+from gateways.mercadopago.exceptions import MercadopagoCircuitOpenError
+from gateways.mercadopago.transport import GatewayTransport
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(clock: _Clock) -> CircuitBreaker:
+    return CircuitBreaker(
+        "payments",
+        window=10,
+        min_requests=4,
+        failure_rate=0.5,
+        slow_call_seconds=1.0,
+        slow_call_rate=0.8,
+        open_seconds=5,
+        half_open_probes=2,
+        clock=clock,
+    )
+
+
+def _call(breaker: CircuitBreaker, seconds: float = 0.01, failed: bool = False):
+    breaker.before_call()
+    breaker.after_call(seconds, failed)
+
+
+class TestCircuitBreaker:
+    def test_endpoint_families(self):
+        assert (
+            endpoint_family("https://api.mercadopago.com/v1/payments/123") == "payments"
+        )
+        assert (
+            endpoint_family("https://api.mercadopago.com/checkout/preferences")
+            == "payments"
+        )
+        assert (
+            endpoint_family("https://api.mercadopago.com/v1/customers/search?email=a")
+            == "customers"
+        )
+        assert (
+            endpoint_family("https://api.mercadopago.com/v1/card_tokens")
+            == "card_tokens"
+        )
+        assert (
+            endpoint_family("https://api.mercadopago.com/preapproval_plan")
+            == "preapproval"
+        )
+        assert (
+            endpoint_family("http://127.0.0.1:8090/v1/payment_methods/installments")
+            == "catalog"
+        )
+        assert (
+            endpoint_family("https://api.mercadopago.com/v1/identification_types")
+            == "catalog"
+        )
+
+    def test_opens_on_failure_rate_and_fails_fast(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        _call(breaker)
+        _call(breaker)
+        _call(breaker, failed=True)
+        assert breaker.state == CLOSED
+        _call(breaker, failed=True)
+        assert breaker.state == OPEN
+        with pytest.raises(MercadopagoCircuitOpenError) as exc_info:
+            breaker.before_call()
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.retry_after == pytest.approx(5)
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_opens_on_slow_calls(self):
+        breaker = _breaker(_Clock())
+        for _ in range(4):
+            _call(breaker, seconds=2.0)
+        assert breaker.state == OPEN
+
+    def test_old_outcomes_leave_the_window(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(3):
+            _call(breaker, failed=True)
+        clock.now += 11
+        _call(breaker, failed=True)
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["calls"] == 1
+
+    def test_half_open_probes_close_or_reopen(self):
+        clock = _Clock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            _call(breaker, failed=True)
+        clock.now += 5
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        breaker.before_call()
+        with pytest.raises(MercadopagoCircuitOpenError):
+            breaker.before_call()
+        breaker.after_call(0.01, failed=False)
+        breaker.after_call(0.01, failed=True)
+        assert breaker.state == OPEN
+
+        clock.now += 5
+        _call(breaker)
+        _call(breaker)
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["opened"] == 2
+
+    @responses.activate
+    def test_transport_fails_fast_and_catalog_falls_back_to_cache(self, monkeypatch):
+        registry = CircuitBreakerRegistry(
+            min_requests=3, failure_rate=0.5, open_seconds=60
+        )
+        monkeypatch.setattr("gateways.mercadopago.transport.gateway_breakers", registry)
+        url = "https://api.mercadopago.com/v1/payment_methods"
+        responses.get(url, json=[{"id": "visa"}])
+        transport = GatewayTransport(pool_connections=1, pool_maxsize=1)
+        cache = TTLCache(name="catalog", maxsize=4, ttl=0)
+        load = lambda: transport.request("GET", url).json()
+        assert cache.get_or_load("payment_methods", load) == [{"id": "visa"}]
+
+        responses.replace(responses.GET, url, status=500)
+        for _ in range(2):
+            transport.request("GET", url)
+        assert registry.get("catalog").state == OPEN
+        calls = len(responses.calls)
+
+        with pytest.raises(MercadopagoCircuitOpenError):
+            transport.request("GET", url)
+        assert cache.get_or_load("payment_methods", load) == [{"id": "visa"}]
+        assert len(responses.calls) == calls
+        assert registry.get("payments").state == CLOSED
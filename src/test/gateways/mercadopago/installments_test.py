@@ -0,0 +1,53 @@
+import copy
+
+from gateways.mercadopago.installments import (
+    InstallmentsQuoteCache,
+    derive_installments,
+)
+from gateways.mercadopago.models import InstallmentsInfo
+
+
+def _quote():
+    quote = copy.deepcopy(InstallmentsInfo.Config.schema_extra)
+    three = copy.deepcopy(quote["payer_costs"][0])
+    three.update(
+        installments=3,
+        installment_rate=10,
+        installment_amount=2163.33,
+        total_amount=6490,
+        recommended_message="3 cuotas de $ 2.163,33 ($ 6.490,00)",
+    )
+    quote["payer_costs"].append(three)
+    return [quote]
+
+
+class TestInstallmentsQuotes:
+    def test_derive_scales_payer_costs_by_rate(self):
+        derived = derive_installments(_quote(), 1000)
+        single, three = derived[0]["payer_costs"]
+
+        assert single["total_amount"] == 1000
+        assert single["recommended_message"] == "1 cuota de $ 1.000,00 ($ 1.000,00)"
+        assert three["total_amount"] == 1100
+        assert three["installment_amount"] == 366.67
+        assert three["recommended_message"] == "3 cuotas de $ 366,67 ($ 1.100,00)"
+
+    def test_derive_refuses_unknown_shapes_and_out_of_bounds_amounts(self):
+        discounted = _quote()
+        discounted[0]["payer_costs"][0]["discount_rate"] = 5
+
+        assert derive_installments(discounted, 1000) is None
+        assert derive_installments(_quote(), 1) is None
+
+    def test_quotes_are_cached_and_derived_per_issuer(self):
+        quotes = InstallmentsQuoteCache(maxsize=10, ttl=60, derive=True)
+        calls = []
+        loader = lambda: calls.append(1) or _quote()
+
+        quotes.get_or_load("pk", "45099535", "visa", 5900, loader)
+        quotes.get_or_load("pk", "45099535", "visa", 5900, loader)
+        derived = quotes.get_or_load("pk", "45099535", "visa", 1000, loader)
+
+        assert len(calls) == 1
+        assert derived[0]["payer_costs"][1]["total_amount"] == 1100
+        assert quotes.stats()["derived"] == 1
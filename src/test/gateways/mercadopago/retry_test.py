@@ -0,0 +1,95 @@
+import asyncio
+
+import httpx
+import responses
+
+from gateways.mercadopago.retry import RetryBudget, RetryPolicy
+from gateways.mercadopago.transport import AsyncGatewayTransport, GatewayTransport
+
+URL = "https://api.mercadopago.com/v1/payments"
+
+
+def _policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=3,
+        base_delay=0,
+        max_delay=0,
+        budget=RetryBudget(ratio=10, min_per_second=0),
+        **kwargs
+    )
+
+
+def _transport(policy: RetryPolicy) -> GatewayTransport:
+    return GatewayTransport(pool_connections=1, pool_maxsize=1, retry_policy=policy)
+
+
+class TestRetryPolicy:
+    @responses.activate
+    def test_idempotent_posts_are_retried_with_the_same_key(self):
+        responses.post(URL, status=503)
+        responses.post(URL, json={"id": 1, "status": "approved"})
+        response = _transport(_policy()).request(
+            "POST", URL, headers={"X-Idempotency-Key": "payments:1"}, json={}
+        )
+        assert response.status_code == 200
+        assert [c.request.headers["X-Idempotency-Key"] for c in responses.calls] == [
+            "payments:1",
+            "payments:1",
+        ]
+
+    @responses.activate
+    def test_posts_without_key_are_not_retried_after_a_server_error(self):
+        responses.post("https://api.mercadopago.com/preapproval", status=500)
+        response = _transport(_policy()).request(
+            "POST", "https://api.mercadopago.com/preapproval", json={}
+        )
+        assert response.status_code == 500
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_rate_limits_are_retried_until_attempts_run_out(self):
+        responses.get(URL + "/1", status=429)
+        response = _transport(_policy()).request("GET", URL + "/1")
+        assert response.status_code == 429
+        assert len(responses.calls) == 3
+
+    def test_budget_caps_retries(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0)
+        budget.deposit()
+        assert not budget.withdraw()
+        budget.deposit()
+        assert budget.withdraw()
+        assert not budget.withdraw()
+
+    def test_backoff_honours_retry_after(self):
+        policy = RetryPolicy(
+            max_attempts=3, base_delay=0.01, max_delay=5, budget=RetryBudget(ratio=10)
+        )
+        policy.start()
+        response = httpx.Response(503, headers={"Retry-After": "2"})
+        assert policy.delay("GET", None, 1, response=response) == 2
+        assert policy.delay("GET", None, 3, response=response) is None
+
+    def test_async_transport_retries_connection_errors(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.headers.get("X-Idempotency-Key"))
+            if len(calls) == 1:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={"id": 1})
+
+        async def send():
+            transport = AsyncGatewayTransport(
+                max_connections=1, max_keepalive_connections=1, retry_policy=_policy()
+            )
+            transport.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                return await transport.request(
+                    "POST", "https://api.mercadopago.com/v1/customers", json={}
+                )
+            finally:
+                await transport.close()
+
+        assert asyncio.run(send()).status_code == 200
+        assert calls == [None, None]
@@ -1,7 +1,11 @@
+import copy
+
 import responses
 
 from api.v1.dependencies.mercadopago import get_mp_service
+from gateways.mercadopago.bin_resolver import bin_resolver_stats
 from gateways.mercadopago.exceptions import MercadopagoAPIException
+from gateways.mercadopago.models import InstallmentsInfo, PaymentMethod
 from gateways.mercadopago.services import MercadopagoService
 
 
@@ -45,3 +49,31 @@ class TestMercadopagoService:
             assert e.error_msg == "Invalid amount"
         else:
             assert False, "Expected MercadopagoAPIException not raised"
+
+    @responses.activate
+    def test_bin_resolver_stats_count_payment_method_lookups_only(self):
+        mp = MercadopagoService(public_key="pk-bin-stats")
+        responses.add(
+            responses.GET,
+            f"{self.base_url}/payment_methods",
+            json=[copy.deepcopy(PaymentMethod.Config.schema_extra)],
+        )
+        responses.add(
+            responses.GET,
+            f"{self.base_url}/payment_methods/installments",
+            json=[InstallmentsInfo.Config.schema_extra],
+        )
+
+        def counts():
+            return [
+                bin_resolver_stats.snapshot()[k]
+                for k in ("hits", "misses", "unavailable")
+            ]
+
+        before = counts()
+
+        mp.get_installments(bin="450995", amount=100)
+        assert counts() == before
+
+        assert mp.get_payment_method(bin="450995")["id"] == "visa"
+        assert [after - b for after, b in zip(counts(), before)] == [1, 0, 0]
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from gateways.mercadopago.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_identical_calls_share_one_execution(self):
+        group = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(1)
+            return {"status": "approved"}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(group.do("k", fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while group.stats()["collapsed"] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{"status": "approved"}] * 5
+        assert group.stats() == {"executed": 1, "collapsed": 4, "in_flight": 0}
+
+    def test_errors_are_shared_and_not_remembered(self):
+        group = SingleFlight()
+
+        def failing():
+            raise ConnectionError("mp down")
+
+        with pytest.raises(ConnectionError):
+            group.do("k", failing)
+        assert group.do("k", lambda: "ok") == "ok"
+
+    def test_async_calls_are_collapsed(self):
+        group = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "visa"
+
+        async def run():
+            return await asyncio.gather(
+                *[group.do_async("k", fetch) for _ in range(10)]
+            )
+
+        assert asyncio.run(run()) == ["visa"] * 10
+        assert len(calls) == 1
+        assert group.stats()["collapsed"] == 9
+
+    def test_cancelling_the_first_caller_does_not_fail_the_others(self):
+        group = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "visa"
+
+        async def run():
+            first = asyncio.create_task(group.do_async("k", fetch))
+            await asyncio.sleep(0)
+            followers = [
+                asyncio.create_task(group.do_async("k", fetch)) for _ in range(3)
+            ]
+            await asyncio.sleep(0)
+            first.cancel()
+            results = await asyncio.gather(*followers)
+            return first.cancelled(), results
+
+        assert asyncio.run(run()) == (True, ["visa"] * 3)
+        assert len(calls) == 1
+        assert group.stats()["in_flight"] == 0
@@ -0,0 +1,109 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prometheus_client import REGISTRY
+
+from gateways.mercadopago.payment_service import (
+    AsyncMercadopagoPaymentService,
+    MercadopagoPaymentService,
+)
+from gateways.mercadopago.services import MercadopagoService
+from gateways.mercadopago.subscriptions_service import (
+    AsyncMercadopagoSubscriptionService,
+    MercadopagoSubscriptionService,
+)
+from gateways.mercadopago.transport import (
+    GatewayTransport,
+    endpoint_template,
+    get_async_transport,
+    get_transport,
+)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGatewayTransport:
+    def test_gateway_clients_share_process_transport(self):
+        transport = get_transport()
+        assert MercadopagoService(public_key="pk").transport is transport
+        assert MercadopagoPaymentService(access_token="at").transport is transport
+        assert MercadopagoSubscriptionService(access_token="at").transport is transport
+
+    def test_async_gateway_clients_share_process_transport(self):
+        transport = get_async_transport()
+        assert AsyncMercadopagoPaymentService(access_token="at").transport is transport
+        assert (
+            AsyncMercadopagoSubscriptionService(access_token="at").transport
+            is transport
+        )
+
+    def test_connections_are_reused(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        transport = GatewayTransport(pool_connections=1, pool_maxsize=2)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/"
+            for _ in range(5):
+                assert transport.request("GET", url).ok
+            stats = transport.stats()
+        finally:
+            transport.close()
+            server.shutdown()
+            server.server_close()
+
+        assert stats["requests"] == 5
+        assert stats["new_connections"] == 1
+        assert stats["reuse_ratio"] == 0.8
+        assert stats["pool_wait"]["count"] >= 5
+
+    def test_each_request_sent_is_timed_once_by_endpoint(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        transport = GatewayTransport(pool_connections=1, pool_maxsize=1)
+        labels = {
+            "gateway": "mercadopago",
+            "endpoint": "/v1/payments/:id",
+            "method": "GET",
+            "outcome": "ok",
+        }
+        before = (
+            REGISTRY.get_sample_value("gateway_request_duration_seconds_count", labels)
+            or 0.0
+        )
+        try:
+            for payment_id in (101, 102, 103):
+                assert transport.request(
+                    "GET",
+                    f"http://127.0.0.1:{server.server_port}/v1/payments/{payment_id}",
+                ).ok
+        finally:
+            transport.close()
+            server.shutdown()
+            server.server_close()
+
+        assert (
+            REGISTRY.get_sample_value("gateway_request_duration_seconds_count", labels)
+            - before
+            == 3
+        )
+        assert (
+            endpoint_template(
+                "https://api.mercadopago.com/v1/customers/12-ab/cards?x=1"
+            )
+            == "/v1/customers/:id/cards"
+        )
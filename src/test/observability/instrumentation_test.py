@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+
+from observability.instrumentation import instrument_gateway, instrument_service
+
+
+def _sample(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class _Error(Exception):
+    status_code = 503
+
+
+@instrument_gateway("test")
+class _Gateway:
+    def fetch(self, fail: bool = False):
+        if fail:
+            raise _Error()
+        return "ok"
+
+    async def fetch_async(self):
+        return "ok"
+
+
+@instrument_service
+class _Service:
+    def __init__(self, db):
+        self.db = db
+
+    def lookup(self):
+        return self.db.execute(text("select 1")).scalar()
+
+
+class TestInstrumentation:
+    def test_gateway_methods_leave_latency_to_the_transport(self):
+        gateway = _Gateway()
+        assert gateway.fetch() == "ok"
+        assert asyncio.run(gateway.fetch_async()) == "ok"
+        with pytest.raises(_Error):
+            gateway.fetch(fail=True)
+
+        # No HTTP request was sent, so nothing is recorded as gateway latency
+        samples = [
+            s
+            for m in REGISTRY.collect()
+            if m.name.startswith("gateway_request")
+            for s in m.samples
+        ]
+        assert [s for s in samples if s.labels.get("gateway") == "test"] == []
+
+    def test_queries_are_attributed_to_the_service_method(self, sqlite_db):
+        labels = {"operation": "_Service.lookup"}
+        before = _sample("db_query_duration_seconds_count", labels)
+
+        assert _Service(sqlite_db).lookup() == 1
+
+        assert _sample("db_query_duration_seconds_count", labels) - before == 1
+        assert _sample("service_method_duration_seconds_count", labels) >= 1
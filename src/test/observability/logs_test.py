@@ -0,0 +1,58 @@
+import json
+import logging
+import queue
+
+from observability.logs import (
+    DroppingQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    parse_levels,
+)
+
+
+def _record(
+    level: int = logging.INFO, msg: str = "charged %s", args=("123",), **extra
+) -> logging.LogRecord:
+    record = logging.LogRecord(
+        "services.payment_service", level, __file__, 1, msg, args, None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJsonFormatter:
+    def test_extra_fields_become_top_level_keys(self):
+        entry = json.loads(JsonFormatter().format(_record(payment_id=7)))
+
+        assert entry["message"] == "charged 123"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "services.payment_service"
+        assert entry["payment_id"] == 7
+
+
+class TestSamplingFilter:
+    def test_only_low_levels_are_sampled(self):
+        never = SamplingFilter(0)
+
+        assert not never.filter(_record(logging.DEBUG))
+        assert not never.filter(_record(logging.INFO))
+        assert never.filter(_record(logging.WARNING))
+        assert SamplingFilter(1).filter(_record(logging.DEBUG))
+
+
+class TestDroppingQueueHandler:
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+
+        handler.handle(_record())
+        handler.handle(_record())
+
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 1
+
+
+def test_parse_levels():
+    assert parse_levels("services.payment_service=debug, gateways=WARNING,,bad") == {
+        "services.payment_service": logging.DEBUG,
+        "gateways": logging.WARNING,
+    }
@@ -0,0 +1,46 @@
+from gateways.mercadopago import transport
+from observability import metrics
+from observability.metrics import RuntimeCollector
+
+
+class TestRuntimeCollector:
+    def test_scrapes_create_no_async_client_and_reuse_the_backlog_count(
+        self, monkeypatch
+    ):
+        counts = []
+
+        def pending() -> int:
+            counts.append(1)
+            return 7
+
+        monkeypatch.setattr(transport, "_async_transport", None)
+        monkeypatch.setattr(metrics, "_inbox_pending", pending)
+        collector = RuntimeCollector()
+
+        for _ in range(3):
+            samples = {
+                s.name: s.value
+                for family in collector.collect()
+                for s in family.samples
+            }
+
+        assert transport._async_transport is None
+        assert samples["gateway_http_async_in_flight"] == 0
+        assert samples["webhook_inbox_pending"] == 7
+        assert len(counts) == 1
+
+    def test_both_database_pools_are_exported_by_label(self, monkeypatch):
+        monkeypatch.setattr(metrics, "_inbox_pending", lambda: 0)
+
+        pools = {
+            (s.labels["pool"], s.labels["state"]): s.value
+            for family in RuntimeCollector().collect()
+            if family.name == "db_pool_connections"
+            for s in family.samples
+        }
+
+        assert set(pools) == {
+            (pool, state)
+            for pool in ("sync", "async")
+            for state in ("checked_out", "checked_in", "overflow")
+        }
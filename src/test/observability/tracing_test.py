@@ -0,0 +1,76 @@
+from sqlalchemy import text
+
+from observability.instrumentation import instrument_service
+from observability.tracing import InMemoryExporter, Tracer, current_span, tracer
+
+
+@instrument_service
+class _Service:
+    def __init__(self, db):
+        self.db = db
+
+    def lookup(self):
+        return self.db.execute(text("select 1")).scalar()
+
+
+class TestTracer:
+    def test_child_spans_share_the_trace_and_point_at_their_parent(self):
+        exporter = InMemoryExporter()
+        t = Tracer(exporter, sample_rate=1.0)
+        with t.span("root") as root:
+            with t.span("child") as child:
+                assert current_span() is child
+            assert current_span() is root
+        assert current_span() is None
+        assert [s.name for s in exporter.spans] == ["child", "root"]
+        assert child.trace_id == root.trace_id
+        assert child.parent_id == root.span_id
+        assert root.parent_id is None
+
+    def test_incoming_traceparent_is_continued(self):
+        exporter = InMemoryExporter()
+        t = Tracer(exporter, sample_rate=0.0)
+        header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+        with t.span("request", traceparent=header) as span:
+            pass
+        assert span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+        assert span.parent_id == "b7ad6b7169203331"
+        assert span.traceparent.startswith("00-0af7651916cd43dd8448eb211c80319c-")
+        assert span.traceparent.endswith("-01")
+        assert list(exporter.spans) == [span]
+
+    def test_unsampled_traces_record_nothing(self):
+        exporter = InMemoryExporter()
+        t = Tracer(exporter, sample_rate=0.0)
+        with t.span("root") as root:
+            with t.span("child") as child:
+                child.set_attribute("key", "value")
+        assert not root.sampled
+        assert child is root
+        assert child.attributes == {}
+        assert len(exporter.spans) == 0
+
+    def test_errors_mark_the_span(self):
+        exporter = InMemoryExporter()
+        t = Tracer(exporter, sample_rate=1.0)
+        try:
+            with t.span("root"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+        assert exporter.spans[0].status == "error"
+        assert exporter.spans[0].attributes["error"] == "ValueError: boom"
+
+    def test_service_and_query_spans(self, sqlite_db, monkeypatch):
+        exporter = InMemoryExporter()
+        monkeypatch.setattr(tracer, "exporter", exporter)
+        monkeypatch.setattr(tracer, "enabled", True)
+        monkeypatch.setattr(tracer, "sample_rate", 1.0)
+        with tracer.span("request") as root:
+            assert _Service(sqlite_db).lookup() == 1
+        query, service, request = exporter.spans
+        assert query.name == "db.query"
+        assert query.attributes["db.statement"] == "select 1"
+        assert service.name == "_Service.lookup"
+        assert query.parent_id == service.span_id
+        assert service.parent_id == request.span_id == root.span_id
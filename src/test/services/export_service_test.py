@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from db.models import Payment
+from services.export_service import payments_query, stream_export
+
+
+def _export(async_sqlite_db, query, fmt: str) -> list[str]:
+    async def scenario(db, sessions):
+        for i in range(5):
+            db.add(
+                Payment(
+                    amount=10 * i,
+                    status="approved" if i != 2 else "rejected",
+                    user_id="u1",
+                    description='say "hi", twice' if i == 0 else None,
+                    created_at=datetime(2026, 9, 1 + i),
+                )
+            )
+        await db.commit()
+        return [
+            chunk async for chunk in stream_export(sessions, query, fmt, batch_size=2)
+        ]
+
+    return async_sqlite_db(scenario)
+
+
+class TestStreamExport:
+    def test_csv_is_streamed_one_chunk_per_batch(self, async_sqlite_db):
+        chunks = _export(async_sqlite_db, payments_query(status="approved"), "csv")
+
+        # Header, then 4 approved rows in batches of 2
+        assert len(chunks) == 3
+        rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+        assert [r["id"] for r in rows] == ["1", "2", "4", "5"]
+        assert rows[0]["description"] == 'say "hi", twice'
+        assert rows[0]["created_at"] == "2026-09-01T00:00:00"
+
+    def test_ndjson_has_one_object_per_line(self, async_sqlite_db):
+        query = payments_query(
+            created_from=datetime(2026, 9, 2), created_to=datetime(2026, 9, 5)
+        )
+        chunks = _export(async_sqlite_db, query, "ndjson")
+
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        assert len(chunks) == 2
+        assert [(r["id"], r["amount"], r["status"]) for r in rows] == [
+            (2, 10.0, "approved"),
+            (3, 20.0, "rejected"),
+            (4, 30.0, "approved"),
+        ]
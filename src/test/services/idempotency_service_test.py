@@ -0,0 +1,202 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from api.v1.routers.payments import _create_once
+from db.models import IdempotencyKey, Payment
+from schemas.payments import PaymentCreate
+from services.idempotency_service import (
+    AsyncIdempotencyService,
+    IdempotencyConflict,
+    idempotency_lock,
+    idempotent_responses,
+    purge_expired_keys,
+)
+from services.payment_service import PaymentOutcomeUnknown
+
+PAYMENT = PaymentCreate(
+    transaction_amount=100,
+    token="tok",
+    payment_method_id="visa",
+    payer={"email": "payer@example.com"},
+)
+
+
+class TestIdempotencyService:
+    def setup_method(self):
+        idempotent_responses.invalidate()
+
+    def test_completed_responses_are_replayed_from_cache_and_database(
+        self, async_sqlite_db
+    ):
+        async def scenario(db, sessions):
+            service = AsyncIdempotencyService(db)
+            assert await service.begin("payments", "k1", "hash") is None
+            await service.complete("payments", "k1", "hash", 200, {"id": 1})
+            cached = await service.begin("payments", "k1", "hash")
+            idempotent_responses.invalidate()
+            async with sessions() as other:
+                stored = await AsyncIdempotencyService(other).begin(
+                    "payments", "k1", "hash"
+                )
+            return cached, stored
+
+        cached, stored = async_sqlite_db(scenario)
+        assert (cached.status_code, cached.body) == (200, {"id": 1})
+        assert (stored.status_code, stored.body) == (200, {"id": 1})
+
+    def test_key_reused_with_another_request_is_rejected(self, async_sqlite_db):
+        async def scenario(db, sessions):
+            service = AsyncIdempotencyService(db)
+            await service.begin("payments", "k1", "hash")
+            await service.complete("payments", "k1", "hash", 200, {"id": 1})
+            with pytest.raises(IdempotencyConflict) as exc_info:
+                await service.begin("payments", "k1", "other")
+            return exc_info.value
+
+        assert async_sqlite_db(scenario).status_code == 422
+
+    def test_request_in_progress_elsewhere_conflicts_after_waiting(
+        self, async_sqlite_db
+    ):
+        async def scenario(db, sessions):
+            await AsyncIdempotencyService(db).begin("payments", "k1", "hash")
+            async with sessions() as other:
+                with pytest.raises(IdempotencyConflict) as exc_info:
+                    await AsyncIdempotencyService(other, wait_seconds=0.1).begin(
+                        "payments", "k1", "hash"
+                    )
+            return exc_info.value
+
+        assert async_sqlite_db(scenario).status_code == 409
+
+    def test_released_and_expired_keys_can_be_claimed_again(self, async_sqlite_db):
+        async def scenario(db, sessions):
+            service = AsyncIdempotencyService(db)
+            await service.begin("payments", "k1", "hash")
+            await service.release("payments", "k1")
+            released = await service.begin("payments", "k1", "hash")
+            expired = AsyncIdempotencyService(db, ttl=-1)
+            await expired.begin("payments", "k2", "hash")
+            await expired.complete("payments", "k2", "hash", 200, {"id": 2})
+            idempotent_responses.invalidate()
+            return released, await service.begin("payments", "k2", "hash")
+
+        assert async_sqlite_db(scenario) == (None, None)
+
+    def test_concurrent_duplicates_run_once(self, async_sqlite_db):
+        calls = []
+
+        async def scenario(db, sessions):
+            async def create(on_pending=None):
+                calls.append(1)
+                await asyncio.sleep(0.05)
+                payment = Payment(
+                    id=7,
+                    amount=100,
+                    currency="ARS",
+                    status="approved",
+                    created_at=datetime.utcnow(),
+                )
+                return payment
+
+            async def request():
+                async with sessions() as own:
+                    return await _create_once(
+                        "payments", "k1", PAYMENT, AsyncIdempotencyService(own), create
+                    )
+
+            return await asyncio.gather(request(), request())
+
+        first, second = async_sqlite_db(scenario)
+        assert len(calls) == 1
+        assert first["id"] == 7
+        assert second.headers["Idempotent-Replayed"] == "true"
+
+    def test_payment_with_a_lost_answer_is_replayed_not_created_again(
+        self, async_sqlite_db
+    ):
+        calls = []
+
+        async def scenario(db, sessions):
+            async def create(on_pending=None):
+                calls.append(1)
+                raise PaymentOutcomeUnknown(7)
+
+            with pytest.raises(HTTPException) as exc_info:
+                await _create_once(
+                    "payments", "k1", PAYMENT, AsyncIdempotencyService(db), create
+                )
+            idempotent_responses.invalidate()
+            replayed = await _create_once(
+                "payments", "k1", PAYMENT, AsyncIdempotencyService(db), create
+            )
+            return exc_info.value, replayed
+
+        error, replayed = async_sqlite_db(scenario)
+        assert len(calls) == 1
+        assert (error.status_code, error.detail["payment_id"]) == (504, 7)
+        assert (replayed.status_code, replayed.headers["Idempotent-Replayed"]) == (
+            504,
+            "true",
+        )
+
+    def test_key_of_a_crashed_request_is_taken_over_after_its_lease(
+        self, async_sqlite_db
+    ):
+        async def scenario(db, sessions):
+            # Both owners crash after claiming; only the second wrote a payment
+            await AsyncIdempotencyService(db).begin("payments", "k1", "hash")
+            owner = AsyncIdempotencyService(db)
+            await owner.begin("payments", "k2", "hash")
+            await owner.checkpoint("payments", "k2", 504, {"detail": "unknown"})
+            await db.commit()
+            async with sessions() as other:
+                fresh = AsyncIdempotencyService(other, wait_seconds=0.05)
+                with pytest.raises(IdempotencyConflict):
+                    await fresh.begin("payments", "k1", "hash")
+                expired = AsyncIdempotencyService(other, lock_timeout=0)
+                return (
+                    await expired.begin("payments", "k1", "hash"),
+                    await expired.begin("payments", "k2", "hash"),
+                )
+
+        taken, replayed = async_sqlite_db(scenario)
+        assert taken is None
+        assert (replayed.status_code, replayed.body) == (504, {"detail": "unknown"})
+
+    def test_in_process_lock_wait_is_bounded(self):
+        async def scenario():
+            async with idempotency_lock("payments", "k1"):
+                with pytest.raises(IdempotencyConflict) as exc_info:
+                    async with idempotency_lock("payments", "k1", timeout=0.05):
+                        pass
+            async with idempotency_lock("payments", "k1", timeout=0.05):
+                pass
+            return exc_info.value
+
+        assert asyncio.run(scenario()).status_code == 409
+
+    def test_purge_expired_keys(self, sqlite_db):
+        now = datetime.utcnow()
+        sqlite_db.add_all(
+            [
+                IdempotencyKey(
+                    scope="payments",
+                    key="old",
+                    request_hash="h",
+                    expires_at=now - timedelta(seconds=1),
+                ),
+                IdempotencyKey(
+                    scope="payments",
+                    key="new",
+                    request_hash="h",
+                    expires_at=now + timedelta(hours=1),
+                ),
+            ]
+        )
+        sqlite_db.commit()
+        assert purge_expired_keys(sqlite_db) == 1
+        assert [k.key for k in sqlite_db.query(IdempotencyKey).all()] == ["new"]
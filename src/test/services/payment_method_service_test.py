@@ -0,0 +1,179 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from db.models import PaymentMethod
+from gateways.mercadopago.cache import customer_emails
+from schemas.payment_methods import PaymentMethodCreate, PaymentMethodUpdate
+from services.payment_method_service import (
+    AsyncPaymentMethodService,
+    DefaultPaymentMethodConflict,
+    PaymentMethodService,
+)
+
+
+def _card(token: str, is_default: bool = False) -> PaymentMethodCreate:
+    return PaymentMethodCreate(
+        card_token_id=token,
+        last_four_digits="4242",
+        payment_method_id="visa",
+        cardholder_name="APRO",
+        expiration_month="11",
+        expiration_year="2030",
+        is_default=is_default,
+    )
+
+
+class _FakeGateway:
+    def __init__(self):
+        self.deleted = []
+
+    def get_or_create_customer(self, email: str) -> str:
+        return "c1"
+
+    def save_card_to_customer(self, customer_id: str, token: str) -> str:
+        return f"card-{token}"
+
+    def delete_customer_card(self, customer_id: str, card_id: str):
+        self.deleted.append((customer_id, card_id))
+
+
+class _AsyncFakeGateway(_FakeGateway):
+    async def get_or_create_customer(self, email: str) -> str:
+        return super().get_or_create_customer(email)
+
+    async def save_card_to_customer(self, customer_id: str, token: str) -> str:
+        return super().save_card_to_customer(customer_id, token)
+
+    async def delete_customer_card(self, customer_id: str, card_id: str):
+        super().delete_customer_card(customer_id, card_id)
+
+
+class TestPaymentMethodService:
+    def test_concurrent_default_is_a_conflict_not_an_error(
+        self, sqlite_db, monkeypatch
+    ):
+        service = PaymentMethodService(sqlite_db)
+        first = service.create_payment_method("u1", _card("tok-1", is_default=True))
+        second = service.create_payment_method("u1", _card("tok-2"))
+        # As if another request set its default after this one cleared the previous default
+        monkeypatch.setattr(service, "_unset_default_for_user", lambda user_id: None)
+
+        with pytest.raises(DefaultPaymentMethodConflict):
+            service.create_payment_method("u1", _card("tok-3", is_default=True))
+        with pytest.raises(DefaultPaymentMethodConflict):
+            service.update_payment_method(
+                second.id, "u1", PaymentMethodUpdate(is_default=True)
+            )
+
+        assert [
+            (p.card_token_id, p.is_default)
+            for p in service.get_payment_methods_by_user("u1")
+        ] == [
+            ("tok-1", 1),
+            ("tok-2", 0),
+        ]
+        assert service.get_default_payment_method("u1").id == first.id
+
+    def test_customer_email_is_forgotten_on_update_and_delete(self, sqlite_db):
+        service = PaymentMethodService(sqlite_db)
+        cards = [
+            service.create_payment_method("u1", _card(f"tok-{i}")) for i in range(3)
+        ]
+        for card in cards:
+            card.mp_customer_id = "c1" if card is not cards[2] else "c2"
+            card.mp_customer_email = "old@example.com"
+        sqlite_db.commit()
+        customer_emails.set("c1", "old@example.com")
+
+        service.update_payment_method(
+            cards[0].id, "u1", PaymentMethodUpdate(is_default=True)
+        )
+
+        assert customer_emails.get("c1") is None
+        emails = dict(
+            sqlite_db.query(
+                PaymentMethod.card_token_id, PaymentMethod.mp_customer_email
+            )
+        )
+        assert emails == {"tok-0": None, "tok-1": None, "tok-2": "old@example.com"}
+
+        sqlite_db.query(PaymentMethod).update({"mp_customer_email": "old@example.com"})
+        sqlite_db.commit()
+        assert service.delete_payment_method(cards[1].id, "u1")
+        emails = dict(
+            sqlite_db.query(
+                PaymentMethod.card_token_id, PaymentMethod.mp_customer_email
+            )
+        )
+        assert emails == {"tok-0": None, "tok-2": "old@example.com"}
+
+    def test_card_saved_on_mercadopago_is_deleted_when_the_row_is_not_written(
+        self, sqlite_db, monkeypatch
+    ):
+        service = PaymentMethodService(sqlite_db)
+        gateway = _FakeGateway()
+        service.create_payment_method("u1", _card("tok-1", is_default=True))
+        monkeypatch.setattr(service, "_unset_default_for_user", lambda user_id: None)
+        card = _card("tok-2", is_default=True)
+        card.payer_email = "payer@example.com"
+
+        with pytest.raises(DefaultPaymentMethodConflict):
+            service.create_payment_method("u1", card, mp_payment_service=gateway)
+
+        assert gateway.deleted == [("c1", "card-tok-2")]
+
+    def test_other_integrity_errors_are_not_reported_as_conflicts(
+        self, sqlite_db, monkeypatch
+    ):
+        service = PaymentMethodService(sqlite_db)
+        error = IntegrityError(
+            "INSERT", {}, Exception("NOT NULL constraint failed: payment_methods.x")
+        )
+
+        def commit():
+            raise error
+
+        monkeypatch.setattr(sqlite_db, "commit", commit)
+        with pytest.raises(IntegrityError):
+            service.create_payment_method("u1", _card("tok-1"))
+
+    def test_async_card_saving_keeps_one_default_and_drops_orphaned_cards(
+        self, async_sqlite_db
+    ):
+        gateway = _AsyncFakeGateway()
+
+        async def scenario(db, sessions):
+            service = AsyncPaymentMethodService(db)
+            card = _card("tok-1", is_default=True)
+            card.payer_email = "payer@example.com"
+            first = await service.create_payment_method(
+                "u1", card, mp_payment_service=gateway
+            )
+            saved_card = first.mp_card_id
+            second = await service.create_payment_method(
+                "u1", _card("tok-2", is_default=True)
+            )
+            second_id = second.id
+
+            async def keep_default(user_id):
+                pass
+
+            service._unset_default_for_user = keep_default
+            card = _card("tok-3", is_default=True)
+            card.payer_email = "payer@example.com"
+            with pytest.raises(DefaultPaymentMethodConflict):
+                await service.create_payment_method(
+                    "u1", card, mp_payment_service=gateway
+                )
+            rows = await db.execute(
+                select(PaymentMethod.id, PaymentMethod.mp_card_id).where(
+                    PaymentMethod.is_default == 1
+                )
+            )
+            return saved_card, second_id, rows.all()
+
+        saved_card, second_id, defaults = async_sqlite_db(scenario)
+        assert saved_card == "card-tok-1"
+        assert defaults == [(second_id, None)]
+        assert gateway.deleted == [("c1", "card-tok-3")]
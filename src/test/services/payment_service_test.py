@@ -0,0 +1,325 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from config.settings import settings
+from db.models import Payment, PaymentMethod, PaymentOutbox
+from gateways.mercadopago.exceptions import MercadopagoAPIException
+from schemas.payments import PaymentCreate, PaymentWithSavedMethodCreate
+from services.payment_service import (
+    AsyncPaymentService,
+    PaymentOutcomeUnknown,
+    PaymentService,
+    payment_idempotency_key,
+)
+
+
+class _Response:
+    text = ""
+
+    def __init__(self, status_code: int = 400):
+        self.status_code = status_code
+
+    def json(self):
+        return {"error": "bad_request", "message": "invalid token"}
+
+
+class _Gateway:
+    def __init__(self, fail_status: int | None = None):
+        self.fail_status = fail_status
+        self.calls = []
+
+    def _create(self, data, idempotency_key):
+        self.calls.append((data, idempotency_key))
+        if self.fail_status:
+            raise MercadopagoAPIException(_Response(self.fail_status))
+        return {"id": 987, "status": "approved"}
+
+
+class _AsyncGateway(_Gateway):
+    async def create_payment(self, data, idempotency_key=None):
+        return self._create(data, idempotency_key)
+
+
+class _SavedCardGateway(_AsyncGateway):
+    def __init__(self):
+        super().__init__()
+        self.email_lookups = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _track(self, value):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return value
+
+    async def get_customer_email(self, customer_id):
+        self.email_lookups += 1
+        return await self._track("customer@example.com")
+
+    async def create_card_token_from_saved(
+        self, customer_id, card_id, security_code=None
+    ):
+        return await self._track("fresh-token")
+
+
+class _SyncGateway(_Gateway):
+    def create_payment(self, data, idempotency_key=None):
+        return self._create(data, idempotency_key)
+
+
+class _FailingKeysGateway(_SyncGateway):
+    def __init__(self, failing_keys: set[str]):
+        super().__init__()
+        self.failing_keys = failing_keys
+
+    def create_payment(self, data, idempotency_key=None):
+        self.calls.append((data, idempotency_key))
+        if idempotency_key in self.failing_keys:
+            raise httpx.ConnectError("connection reset")
+        return {"id": 987, "status": "approved"}
+
+
+# Past the recovery delay of every outbox entry written by a test
+LATER = datetime.utcnow() + timedelta(days=1)
+
+PAYMENT = PaymentCreate(
+    transaction_amount=100,
+    token="tok",
+    payment_method_id="visa",
+    payer={"email": "payer@example.com"},
+)
+
+
+class TestAsyncPaymentService:
+    def test_create_payment_persists_the_gateway_result(self, async_sqlite_db):
+        async def scenario(db, sessions):
+            gateway = _AsyncGateway()
+            payment = await AsyncPaymentService(
+                db=db, mp_payment=gateway
+            ).create_payment(PAYMENT)
+            async with sessions() as other:
+                stored = await other.get(Payment, payment.id)
+                outbox = await other.scalar(select(PaymentOutbox))
+            return gateway, stored, outbox
+
+        gateway, stored, outbox = async_sqlite_db(scenario)
+
+        assert (stored.gateway_payment_id, stored.status) == ("987", "approved")
+        assert gateway.calls[0][0].external_reference == str(stored.id)
+        assert (outbox.status, outbox.idempotency_key) == ("sent", gateway.calls[0][1])
+        assert outbox.idempotency_key == f"payments:{stored.id}"
+
+    def test_gateway_errors_roll_back_the_pending_payment(self, async_sqlite_db):
+        async def scenario(db, sessions):
+            with pytest.raises(MercadopagoAPIException):
+                await AsyncPaymentService(
+                    db=db, mp_payment=_AsyncGateway(fail_status=400)
+                ).create_payment(PAYMENT)
+            async with sessions() as other:
+                return list(await other.scalars(select(Payment))), list(
+                    await other.scalars(select(PaymentOutbox))
+                )
+
+        assert async_sqlite_db(scenario) == ([], [])
+
+    def test_lost_gateway_answers_leave_the_payment_for_recovery(self, async_sqlite_db):
+        class _TimeoutGateway(_AsyncGateway):
+            async def create_payment(self, data, idempotency_key=None):
+                raise httpx.ReadTimeout("read timed out")
+
+        async def scenario(db, sessions):
+            with pytest.raises(PaymentOutcomeUnknown) as exc_info:
+                await AsyncPaymentService(
+                    db=db, mp_payment=_TimeoutGateway()
+                ).create_payment(PAYMENT)
+            async with sessions() as other:
+                payment = await other.get(Payment, exc_info.value.payment_id)
+                outbox = await other.scalar(select(PaymentOutbox))
+            return payment.status, outbox.status
+
+        assert async_sqlite_db(scenario) == ("pending", "pending")
+
+    def test_saved_card_payment_persists_the_customer_email(self, async_sqlite_db):
+        data = PaymentWithSavedMethodCreate(
+            transaction_amount=100,
+            payment_method_id=1,
+            payer={"email": "admin@example.com"},
+            user_id="u1",
+        )
+
+        async def scenario(db, sessions):
+            db.add(
+                PaymentMethod(
+                    id=1,
+                    user_id="u1",
+                    card_token_id="stored",
+                    mp_customer_id="c1",
+                    mp_card_id="card1",
+                    last_four_digits="4242",
+                    payment_method_id="visa",
+                    cardholder_name="APRO",
+                    expiration_month="11",
+                    expiration_year="2030",
+                    is_default=1,
+                )
+            )
+            await db.commit()
+            gateway = _SavedCardGateway()
+            service = AsyncPaymentService(db=db, mp_payment=gateway)
+            await service.create_payment_with_saved_method(data)
+            await service.create_payment_with_saved_method(data)
+            async with sessions() as other:
+                stored_email = (await other.get(PaymentMethod, 1)).mp_customer_email
+            return gateway, stored_email
+
+        gateway, stored_email = async_sqlite_db(scenario)
+
+        assert stored_email == "customer@example.com"
+        assert gateway.email_lookups == 1
+        assert gateway.max_in_flight == 2
+        assert [call[0].payer.email for call in gateway.calls] == [
+            "customer@example.com"
+        ] * 2
+        assert gateway.calls[0][0].token == "fresh-token"
+
+    def test_list_payments_pages_newest_first_with_filters(self, async_sqlite_db):
+        start = datetime(2026, 1, 1)
+
+        async def scenario(db, sessions):
+            # Two payments per timestamp, so pages must break ties on id
+            for i in range(10):
+                db.add(
+                    Payment(
+                        amount=100,
+                        status="approved" if i % 2 else "pending",
+                        user_id="u1" if i < 8 else "u2",
+                        created_at=start + timedelta(minutes=i // 2),
+                    )
+                )
+            await db.commit()
+            service = AsyncPaymentService(db=db, mp_payment=_AsyncGateway())
+            pages, cursor = [], None
+            while True:
+                items, cursor = await service.list_payments(
+                    user_id="u1", cursor=cursor, limit=3
+                )
+                pages.append([p.id for p in items])
+                if cursor is None:
+                    break
+            approved, _ = await service.list_payments(
+                status="approved", created_from=start + timedelta(minutes=1)
+            )
+            with pytest.raises(ValueError):
+                await service.list_payments(cursor="not-a-cursor")
+            return pages, [p.id for p in approved]
+
+        pages, approved = async_sqlite_db(scenario)
+
+        assert pages == [[8, 7, 6], [5, 4, 3], [2, 1]]
+        assert approved == [10, 8, 6, 4]
+
+    def test_payments_always_have_the_created_at_cursors_page_on(self, sqlite_db):
+        with pytest.raises(IntegrityError):
+            sqlite_db.execute(
+                insert(Payment).values(amount=100, status="pending", created_at=None)
+            )
+
+
+class TestPaymentRecovery:
+    def test_unanswered_payments_are_resent_with_the_same_idempotency_key(
+        self, sqlite_db
+    ):
+        with pytest.raises(MercadopagoAPIException):
+            PaymentService(
+                db=sqlite_db, mp_payment=_SyncGateway(fail_status=502)
+            ).create_payment(PAYMENT)
+        outbox = sqlite_db.query(PaymentOutbox).one()
+        assert (outbox.status, outbox.payment_id) == (
+            "pending",
+            sqlite_db.query(Payment).one().id,
+        )
+        assert '"token"' not in outbox.request_body
+
+        gateway = _SyncGateway()
+        counts = PaymentService(db=sqlite_db, mp_payment=gateway).recover_payments(
+            now=LATER
+        )
+
+        payment = sqlite_db.query(Payment).one()
+        assert counts == {"recovered": 1, "rejected": 0, "retrying": 0, "failed": 0}
+        assert (payment.gateway_payment_id, payment.status, outbox.status) == (
+            "987",
+            "approved",
+            "sent",
+        )
+        assert gateway.calls[0][1] == outbox.idempotency_key
+        assert gateway.calls[0][0].token == ""
+
+    def test_recovery_rejects_payments_the_gateway_refuses(self, sqlite_db):
+        with pytest.raises(MercadopagoAPIException):
+            PaymentService(
+                db=sqlite_db, mp_payment=_SyncGateway(fail_status=504)
+            ).create_payment(PAYMENT)
+
+        counts = PaymentService(
+            db=sqlite_db, mp_payment=_SyncGateway(fail_status=400)
+        ).recover_payments(now=LATER)
+
+        assert counts == {"recovered": 0, "rejected": 1, "retrying": 0, "failed": 0}
+        assert sqlite_db.query(Payment).one().status == "rejected"
+        assert sqlite_db.query(PaymentOutbox).one().status == "failed"
+
+    def test_failing_entries_back_off_and_do_not_block_newer_ones(self, sqlite_db):
+        due = datetime.utcnow() - timedelta(hours=1)
+        for i in range(52):
+            payment = Payment(amount=100, status="pending")
+            sqlite_db.add(payment)
+            sqlite_db.flush()
+            sqlite_db.add(
+                PaymentOutbox(
+                    payment_id=payment.id,
+                    idempotency_key=f"payments:{payment.id}",
+                    request_body=PAYMENT.json(),
+                    next_attempt_at=due + timedelta(seconds=i),
+                )
+            )
+        sqlite_db.commit()
+        failing = {f"payments:{i}" for i in range(1, 52)}
+        service = PaymentService(db=sqlite_db, mp_payment=_FailingKeysGateway(failing))
+
+        first = service.recover_payments(limit=50, retry_backoff=60)
+        second = service.recover_payments(limit=50, retry_backoff=60)
+
+        assert first == {"recovered": 0, "rejected": 0, "retrying": 50, "failed": 0}
+        assert second == {"recovered": 1, "rejected": 0, "retrying": 1, "failed": 0}
+        assert sqlite_db.get(Payment, 52).status == "approved"
+        retried = sqlite_db.query(PaymentOutbox).filter_by(payment_id=1).one()
+        assert retried.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+
+    def test_entries_are_given_up_after_max_attempts(self, sqlite_db):
+        with pytest.raises(MercadopagoAPIException):
+            PaymentService(
+                db=sqlite_db, mp_payment=_SyncGateway(fail_status=502)
+            ).create_payment(PAYMENT)
+        service = PaymentService(db=sqlite_db, mp_payment=_SyncGateway(fail_status=502))
+
+        runs = [
+            service.recover_payments(max_attempts=2, retry_backoff=0, now=LATER)
+            for _ in range(3)
+        ]
+
+        assert [(r["retrying"], r["failed"]) for r in runs] == [(1, 0), (0, 1), (0, 0)]
+        assert sqlite_db.query(Payment).one().status == "error"
+        assert sqlite_db.query(PaymentOutbox).one().status == "failed"
+
+    def test_idempotency_keys_carry_the_installation_prefix(self, monkeypatch):
+        assert payment_idempotency_key(7) == "payments:7"
+        monkeypatch.setattr(settings, "payment_idempotency_key_prefix", "staging")
+        assert payment_idempotency_key(7) == "staging:7"
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from services.subscription_service import add_months, current_period
+
+
+class TestBillingPeriods:
+    def test_add_months_clamps_to_the_end_of_shorter_months(self):
+        assert add_months(datetime(2026, 1, 31, 9), 1) == datetime(2026, 2, 28, 9)
+        assert add_months(datetime(2028, 1, 31), 1) == datetime(2028, 2, 29)
+        assert add_months(datetime(2026, 11, 30), 3) == datetime(2027, 2, 28)
+        assert add_months(datetime(2028, 2, 29), 12) == datetime(2029, 2, 28)
+
+    def test_periods_are_computed_from_the_anchor_without_drift(self):
+        anchor = datetime(2026, 1, 31)
+
+        assert current_period(anchor, "month", 1, datetime(2026, 3, 1)) == (
+            datetime(2026, 2, 28),
+            datetime(2026, 3, 31),
+        )
+        assert current_period(anchor, "month", 1, datetime(2026, 3, 31)) == (
+            datetime(2026, 3, 31),
+            datetime(2026, 4, 30),
+        )
+        assert current_period(anchor, "month", 3, datetime(2031, 6, 15)) == (
+            datetime(2031, 4, 30),
+            datetime(2031, 7, 31),
+        )
+        assert current_period(anchor, "year", 1, datetime(2030, 2, 1)) == (
+            datetime(2030, 1, 31),
+            datetime(2031, 1, 31),
+        )
+        assert current_period(anchor, "day", 7, datetime(2026, 2, 14)) == (
+            datetime(2026, 2, 14),
+            datetime(2026, 2, 21),
+        )
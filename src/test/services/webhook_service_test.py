@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+from db.models import WebhookEvent
+from services.webhook_service import (
+    CoalescingWindow,
+    WebhookInboxService,
+    purge_processed_events,
+    webhook_dedup_stats,
+)
+
+
+class TestWebhookInboxService:
+    def test_claimed_events_are_not_claimed_twice(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        inbox.enqueue("payment", "123", {"type": "payment", "data": {"id": "123"}})
+        inbox.enqueue("preapproval", "abc")
+
+        claimed = inbox.claim(limit=10, visibility_timeout=300)
+
+        assert [(e.topic, e.resource_id, e.attempts) for e in claimed] == [
+            ("payment", "123", 1),
+            ("preapproval", "abc", 1),
+        ]
+        assert inbox.claim(limit=10, visibility_timeout=300) == []
+        assert inbox.pending_count() == 2
+
+    def test_failed_events_are_retried_with_backoff_then_given_up(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        event = inbox.enqueue("payment", "123")
+
+        inbox.claim(limit=1, visibility_timeout=300)
+        inbox.mark_failed(event, "mp down", max_attempts=2, retry_backoff=60)
+        assert event.status == "pending"
+        assert event.available_at > datetime.utcnow() + timedelta(seconds=50)
+        assert inbox.claim(limit=1, visibility_timeout=300) == []
+
+        event.available_at = datetime.utcnow()
+        sqlite_db.commit()
+        inbox.claim(limit=1, visibility_timeout=300)
+        inbox.mark_failed(event, "mp down", max_attempts=2, retry_backoff=60)
+        assert event.status == "failed"
+        assert inbox.pending_count() == 0
+
+    def test_events_of_a_dead_worker_are_reclaimed(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        event = inbox.enqueue("payment", "123")
+        inbox.claim(limit=1, visibility_timeout=300)
+
+        event.locked_at = datetime.utcnow() - timedelta(seconds=301)
+        sqlite_db.commit()
+
+        assert inbox.claim(limit=1, visibility_timeout=300) == [event]
+        assert event.attempts == 2
+
+    def test_redeliveries_coalesce_into_the_pending_event(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(60))
+        before = webhook_dedup_stats.snapshot()
+
+        first = inbox.enqueue("payment", "123")
+        assert inbox.enqueue("payment", "123") is None
+        assert inbox.enqueue("payment", "456") is not None
+
+        # Another process, without the in-memory window, hits the unique index
+        assert (
+            WebhookInboxService(sqlite_db, window=CoalescingWindow(60)).enqueue(
+                "payment", "123"
+            )
+            is None
+        )
+
+        after = webhook_dedup_stats.snapshot()
+        assert after["coalesced_memory"] - before["coalesced_memory"] == 1
+        assert after["coalesced_db"] - before["coalesced_db"] == 1
+        assert inbox.pending_count() == 2
+        # Nothing is due before the window closes
+        assert inbox.claim(limit=10, visibility_timeout=300) == []
+        assert first.available_at > datetime.utcnow() + timedelta(seconds=50)
+
+    def test_a_new_event_is_accepted_while_the_previous_one_is_processing(
+        self, sqlite_db
+    ):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        inbox.enqueue("payment", "123")
+        inbox.claim(limit=1, visibility_timeout=300)
+
+        assert inbox.enqueue("payment", "123") is not None
+
+    def test_failed_retry_is_superseded_by_a_newer_pending_event(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        event = inbox.enqueue("payment", "123")
+        inbox.claim(limit=1, visibility_timeout=300)
+        inbox.enqueue("payment", "123")
+
+        inbox.mark_failed(event, "mp down", max_attempts=3, retry_backoff=60)
+
+        assert event.status == "superseded"
+        assert inbox.pending_count() == 1
+
+    def test_purge_keeps_recent_and_failed_events(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        events = [inbox.enqueue("payment", str(i)) for i in range(4)]
+        inbox.claim(limit=4, visibility_timeout=300)
+        inbox.mark_done_many(events[:2])
+        events[2].status = "superseded"
+        events[3].status = "failed"
+        events[0].available_at = datetime.utcnow()
+        for event in events[1:]:
+            event.available_at = datetime.utcnow() - timedelta(days=8)
+        sqlite_db.commit()
+
+        assert purge_processed_events(sqlite_db, older_than=7 * 86400) == 2
+        remaining = dict(sqlite_db.query(WebhookEvent.resource_id, WebhookEvent.status))
+        assert remaining == {"0": "done", "3": "failed"}
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+from db.models import Payment
+from gateways.mercadopago.exceptions import (
+    MercadopagoAPIException,
+    MercadopagoCircuitOpenError,
+)
+from workers.payment_status_refresh import PaymentStatusRefresh, RateLimiter
+
+
+class _Response:
+    text = ""
+    status_code = 404
+
+    def json(self):
+        return {"error": "not_found", "message": "payment not found"}
+
+
+class _Gateway:
+    def __init__(self, statuses: dict[str, str]):
+        self.statuses = statuses
+        self.calls: list[str] = []
+
+    def get_payment(self, payment_id: str) -> dict:
+        self.calls.append(payment_id)
+        status = self.statuses.get(payment_id)
+        if status == "open":
+            raise MercadopagoCircuitOpenError("payments", 10)
+        if status is None:
+            raise MercadopagoAPIException(_Response())
+        return {"status": status}
+
+
+def _add_payments(db, statuses: dict[str, str], age: timedelta = timedelta(hours=1)):
+    created = datetime.utcnow() - age
+    for i, (gateway_id, status) in enumerate(statuses.items()):
+        db.add(
+            Payment(
+                gateway_payment_id=gateway_id,
+                amount=10,
+                status=status,
+                created_at=created + timedelta(seconds=i),
+            )
+        )
+    db.commit()
+
+
+class TestPaymentStatusRefresh:
+    def test_stale_pending_payments_are_refreshed_in_chunks(self, sqlite_db):
+        _add_payments(
+            sqlite_db,
+            {
+                "1": "pending",
+                "2": "in_process",
+                "3": "pending",
+                "4": "approved",
+                "5": "pending",
+            },
+        )
+        _add_payments(sqlite_db, {"6": "pending"}, age=timedelta(seconds=10))
+        gateway = _Gateway(
+            {"1": "approved", "2": "rejected", "3": "pending", "6": "approved"}
+        )
+        refresh = PaymentStatusRefresh(
+            older_than=600,
+            chunk_size=2,
+            concurrency=2,
+            rate=0,
+            session_factory=lambda: sqlite_db,
+            mp_payment=gateway,
+        )
+
+        report = refresh.run_once()
+
+        assert sorted(gateway.calls) == ["1", "2", "3", "5"]
+        assert {
+            k: report[k]
+            for k in (
+                "checked",
+                "updated",
+                "unchanged",
+                "not_found",
+                "errors",
+                "chunks",
+            )
+        } == {
+            "checked": 4,
+            "updated": 2,
+            "unchanged": 1,
+            "not_found": 1,
+            "errors": 0,
+            "chunks": 2,
+        }
+        statuses = dict(sqlite_db.query(Payment.gateway_payment_id, Payment.status))
+        assert statuses == {
+            "1": "approved",
+            "2": "rejected",
+            "3": "pending",
+            "4": "approved",
+            "5": "pending",
+            "6": "pending",
+        }
+
+    def test_dry_run_writes_nothing_and_open_circuit_stops_the_run(self, sqlite_db):
+        _add_payments(sqlite_db, {"1": "pending", "2": "pending", "3": "pending"})
+        gateway = _Gateway({"1": "approved", "2": "open", "3": "approved"})
+        refresh = PaymentStatusRefresh(
+            older_than=600,
+            chunk_size=2,
+            concurrency=1,
+            rate=0,
+            session_factory=lambda: sqlite_db,
+            mp_payment=gateway,
+        )
+
+        assert refresh.run_once(dry_run=True)["updated"] == 1
+        assert set(
+            dict(sqlite_db.query(Payment.gateway_payment_id, Payment.status)).values()
+        ) == {"pending"}
+        report = refresh.run_once()
+        assert (report["checked"], report["updated"], report["aborted"]) == (
+            2,
+            1,
+            "circuit_open",
+        )
+        assert "3" not in gateway.calls
+
+
+class TestRateLimiter:
+    def test_calls_are_spaced_by_the_rate(self):
+        now = [0.0]
+        sleeps: list[float] = []
+
+        def sleep(seconds: float):
+            sleeps.append(seconds)
+
+        limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limiter.acquire()
+
+        assert sleeps == [0.25, 0.5]
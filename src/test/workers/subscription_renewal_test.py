@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from db.models import Plan, Subscription
+from gateways.mercadopago.exceptions import MercadopagoAPIException
+from workers.subscription_renewal import SubscriptionRenewal
+
+
+class _Response:
+    text = ""
+    status_code = 500
+
+    def json(self):
+        return {"error": "internal_error", "message": "mp down"}
+
+
+class _Gateway:
+    def __init__(self, failing: set[str] = frozenset()):
+        self.failing = failing
+        self.cancelled: list[str] = []
+
+    def cancel_subscription(self, preapproval_id: str) -> dict:
+        if preapproval_id in self.failing:
+            raise MercadopagoAPIException(_Response())
+        self.cancelled.append(preapproval_id)
+        return {"id": preapproval_id, "status": "cancelled"}
+
+
+def _subscription(
+    gateway_id: str,
+    end: datetime,
+    anchor: datetime,
+    status: str = "authorized",
+    cancel: int = 0,
+):
+    return Subscription(
+        plan_id=1,
+        user_id="u1",
+        gateway_subscription_id=gateway_id,
+        status=status,
+        billing_anchor=anchor,
+        current_period_start=anchor,
+        current_period_end=end,
+        cancel_at_period_end=cancel,
+    )
+
+
+class TestSubscriptionRenewal:
+    def test_ended_periods_roll_forward_and_flagged_subscriptions_are_cancelled(
+        self, sqlite_db
+    ):
+        anchor = datetime(2026, 1, 31)
+        sqlite_db.add(
+            Plan(id=1, name="monthly", amount=10, interval="month", interval_count=1)
+        )
+        sqlite_db.add_all(
+            [
+                _subscription("renew", datetime(2026, 2, 28), anchor),
+                _subscription("behind", datetime(2026, 1, 31), datetime(2025, 12, 31)),
+                _subscription("cancel", datetime(2026, 2, 28), anchor, cancel=1),
+                _subscription("cancel-fails", datetime(2026, 2, 28), anchor, cancel=1),
+                _subscription("current", datetime(2026, 4, 30), anchor),
+                _subscription("paused", datetime(2026, 2, 28), anchor, status="paused"),
+            ]
+        )
+        sqlite_db.commit()
+        gateway = _Gateway(failing={"cancel-fails"})
+        renewal = SubscriptionRenewal(
+            chunk_size=2,
+            concurrency=2,
+            session_factory=lambda: sqlite_db,
+            mp_subscription=gateway,
+        )
+
+        report = renewal.run_once(now=datetime(2026, 3, 15))
+
+        assert {
+            k: report[k] for k in ("due", "renewed", "cancelled", "errors", "chunks")
+        } == {
+            "due": 4,
+            "renewed": 2,
+            "cancelled": 1,
+            "errors": 1,
+            "chunks": 2,
+        }
+        assert gateway.cancelled == ["cancel"]
+        rows = {
+            s.gateway_subscription_id: (
+                s.status,
+                s.current_period_start,
+                s.current_period_end,
+            )
+            for s in sqlite_db.query(Subscription)
+        }
+        assert rows["renew"] == (
+            "authorized",
+            datetime(2026, 2, 28),
+            datetime(2026, 3, 31),
+        )
+        assert rows["behind"] == (
+            "authorized",
+            datetime(2026, 2, 28),
+            datetime(2026, 3, 31),
+        )
+        assert rows["cancel"][0] == "cancelled"
+        assert rows["cancel-fails"] == ("authorized", anchor, datetime(2026, 2, 28))
+        assert rows["current"][2] == datetime(2026, 4, 30)
+        assert rows["paused"][2] == datetime(2026, 2, 28)
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from db.models import Payment, WebhookEvent
+from services.webhook_service import CoalescingWindow, WebhookInboxService
+from workers.webhooks import WebhookWorkerPool
+
+
+class _Gateway:
+    def __init__(self, statuses: dict[str, str]):
+        self.statuses = statuses
+
+    def get_payment(self, payment_id: str) -> dict:
+        if payment_id not in self.statuses:
+            raise RuntimeError("mp down")
+        return {"status": self.statuses[payment_id]}
+
+
+class TestWebhookWorkerPool:
+    def test_batch_statuses_are_written_in_bulk(self, sqlite_db):
+        sqlite_db.add_all(
+            [
+                Payment(gateway_payment_id="1", amount=10, status="pending"),
+                Payment(gateway_payment_id="2", amount=20, status="pending"),
+            ]
+        )
+        sqlite_db.commit()
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        for resource_id in ("1", "2", "404", "down"):
+            inbox.enqueue("payment", resource_id)
+
+        pool = WebhookWorkerPool(concurrency=0, session_factory=lambda: sqlite_db)
+        pool.mp_payment = _Gateway(
+            {"1": "approved", "2": "rejected", "404": "approved"}
+        )
+
+        assert pool.run_once() == 4
+
+        statuses = dict(sqlite_db.query(Payment.gateway_payment_id, Payment.status))
+        assert statuses == {"1": "approved", "2": "rejected"}
+        events = dict(sqlite_db.query(WebhookEvent.resource_id, WebhookEvent.status))
+        assert events == {"1": "done", "2": "done", "404": "done", "down": "pending"}
+
+    def test_idle_workers_purge_processed_events_once_per_interval(self, sqlite_db):
+        inbox = WebhookInboxService(sqlite_db, window=CoalescingWindow(0))
+        events = [inbox.enqueue("payment", str(i)) for i in range(3)]
+        inbox.claim(limit=3, visibility_timeout=300)
+        inbox.mark_done_many(events[:1])
+        sqlite_db.query(WebhookEvent).update(
+            {"available_at": datetime.utcnow() - timedelta(days=8)}
+        )
+        sqlite_db.commit()
+        pool = WebhookWorkerPool(
+            concurrency=0, retention=7 * 86400, session_factory=lambda: sqlite_db
+        )
+
+        assert pool.purge_if_due() == 1
+        sqlite_db.query(WebhookEvent).update({"status": "done"})
+        sqlite_db.commit()
+        # Within purge_interval of the previous purge
+        assert pool.purge_if_due() == 0
+        assert sqlite_db.query(WebhookEvent).count() == 2
@@ -0,0 +1,66 @@
+import logging
+import threading
+
+from config.settings import settings
+from db.session import BatchSessionLocal
+from gateways.mercadopago.payment_service import MercadopagoPaymentService
+from services.idempotency_service import purge_expired_keys
+from services.payment_service import PaymentService
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentOutboxRecovery:
+    """Background thread re-sending payments whose gateway answer was never recorded.
+
+    Every ``interval`` seconds, due outbox entries (see
+    PaymentService.recover_payments) are re-sent with their original
+    idempotency key. Expired client
+    Idempotency-Key records are purged on the same schedule.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.payment_outbox_recovery_interval,
+        session_factory=BatchSessionLocal,
+    ):
+        self.interval = interval
+        self.session_factory = session_factory
+        self.mp_payment = MercadopagoPaymentService(
+            access_token=settings.mercadopago_access_token
+        )
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="payment-outbox-recovery", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Payment outbox recovery failed")
+
+    def run_once(self) -> dict[str, int]:
+        db = self.session_factory()
+        try:
+            counts = PaymentService(
+                db=db, mp_payment=self.mp_payment
+            ).recover_payments()
+            counts["expired_idempotency_keys"] = purge_expired_keys(db)
+        finally:
+            db.close()
+        if any(counts.values()):
+            logger.info("Payment outbox recovery: %s", counts)
+        return counts
@@ -0,0 +1,299 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from config.settings import settings
+from db.session import BatchSessionLocal
+from gateways.mercadopago.exceptions import (
+    MercadopagoAPIException,
+    MercadopagoCircuitOpenError,
+)
+from gateways.mercadopago.payment_service import MercadopagoPaymentService
+from observability.logs import configure_logging
+from services.payment_service import PaymentService
+
+logger = logging.getLogger(__name__)
+
+# Local statuses that MercadoPago may since have resolved
+STALE_STATUSES = ("pending", "in_process")
+
+
+class RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads; a rate of 0 disables it."""
+
+    def __init__(
+        self,
+        rate: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = self._clock()
+            at = max(now, self._next_at)
+            self._next_at = at + self.interval
+        if at > now:
+            self._sleep(at - now)
+
+
+class StatusRefreshStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.checked = 0
+        self.updated = 0
+        self.errors = 0
+        self.last_run: dict[str, Any] = {}
+
+    def record(self, report: dict[str, Any]):
+        with self._lock:
+            self.runs += 1
+            self.checked += report["checked"]
+            self.updated += report["updated"]
+            self.errors += report["errors"]
+            self.last_run = dict(report)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "checked": self.checked,
+                "updated": self.updated,
+                "errors": self.errors,
+                "last_run": dict(self.last_run),
+            }
+
+
+status_refresh_stats = StatusRefreshStats()
+
+
+class PaymentStatusRefresh:
+    """Re-polls MercadoPago for payments left pending, e.g. because their webhook was missed.
+
+    Payments still pending ``older_than`` seconds after creation are read in
+    chunks of ``chunk_size``, oldest first. Each chunk's statuses are fetched
+    with ``concurrency`` parallel calls, at most ``rate`` per second, and the
+    changed ones are written with one bulk UPDATE. A run stops early when the
+    payments circuit breaker opens. Runs every ``interval`` seconds once
+    started, or once from the command line.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.payment_status_refresh_interval,
+        older_than: float = settings.payment_status_refresh_after,
+        chunk_size: int = settings.payment_status_refresh_chunk_size,
+        concurrency: int = settings.payment_status_refresh_concurrency,
+        rate: float = settings.payment_status_refresh_rate,
+        session_factory=BatchSessionLocal,
+        mp_payment: MercadopagoPaymentService | None = None,
+    ):
+        self.interval = interval
+        self.older_than = older_than
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate)
+        self.session_factory = session_factory
+        self.mp_payment = mp_payment or MercadopagoPaymentService(
+            access_token=settings.mercadopago_access_token
+        )
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="payment-status-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Payment status refresh failed")
+
+    def run_once(
+        self, limit: int | None = None, dry_run: bool = False
+    ) -> dict[str, Any]:
+        """Refresh every stale payment (at most ``limit``); returns what was checked and changed.
+
+        With ``dry_run`` statuses are fetched but nothing is written.
+        """
+        report = {
+            "checked": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "not_found": 0,
+            "errors": 0,
+            "chunks": 0,
+            "aborted": None,
+        }
+        created_before = datetime.utcnow() - timedelta(seconds=self.older_than)
+        started = time.perf_counter()
+        after = None
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="payment-status-refresh"
+        ) as pool:
+            while not self._stop.is_set() and (
+                limit is None or report["checked"] < limit
+            ):
+                size = (
+                    self.chunk_size
+                    if limit is None
+                    else min(self.chunk_size, limit - report["checked"])
+                )
+                chunk = self._next_chunk(created_before, after, size)
+                if not chunk:
+                    break
+                after = chunk[-1][:2]
+                results = list(
+                    pool.map(
+                        self._fetch_status,
+                        [gateway_id for _, _, gateway_id, _ in chunk],
+                    )
+                )
+                changes: dict[str, str] = {}
+                for (_, payment_id, gateway_id, current), result in zip(chunk, results):
+                    if isinstance(result, MercadopagoCircuitOpenError):
+                        report["aborted"] = "circuit_open"
+                    elif (
+                        isinstance(result, MercadopagoAPIException)
+                        and result.status_code == 404
+                    ):
+                        report["not_found"] += 1
+                    elif isinstance(result, Exception):
+                        report["errors"] += 1
+                        logger.warning(
+                            "Payment %s status refresh failed: %s", payment_id, result
+                        )
+                    elif result and result != current:
+                        changes[gateway_id] = result
+                    else:
+                        report["unchanged"] += 1
+                report["checked"] += len(chunk)
+                report["chunks"] += 1
+                if changes:
+                    report["updated"] += (
+                        len(changes) if dry_run else self._apply(changes)
+                    )
+                self._report_progress(report, started)
+                if report["aborted"]:
+                    break
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        report["per_second"] = (
+            round(report["checked"] / report["seconds"], 2)
+            if report["seconds"]
+            else 0.0
+        )
+        if not dry_run:
+            status_refresh_stats.record(report)
+        if report["checked"]:
+            logger.info("Payment status refresh: %s", report)
+        return report
+
+    def _next_chunk(
+        self, created_before: datetime, after: tuple[datetime, int] | None, size: int
+    ) -> list[tuple[datetime, int, str, str]]:
+        # The session is released before the MercadoPago calls, so no connection is held while waiting on them
+        db = self.session_factory()
+        try:
+            payments = PaymentService(
+                db=db, mp_payment=self.mp_payment
+            ).get_stale_payments(STALE_STATUSES, created_before, after, size)
+            return [
+                (p.created_at, p.id, p.gateway_payment_id, p.status) for p in payments
+            ]
+        finally:
+            db.close()
+
+    def _fetch_status(self, gateway_payment_id: str) -> str | Exception:
+        self.rate_limiter.acquire()
+        try:
+            return self.mp_payment.get_payment(gateway_payment_id).get("status", "")
+        except Exception as e:
+            return e
+
+    def _apply(self, changes: dict[str, str]) -> int:
+        db = self.session_factory()
+        try:
+            return PaymentService(
+                db=db, mp_payment=self.mp_payment
+            ).update_payment_statuses(changes)["updated"]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _report_progress(report: dict[str, Any], started: float):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Payment status refresh progress: %d checked, %d updated, %d errors, %.1f/s",
+            report["checked"],
+            report["updated"],
+            report["errors"],
+            report["checked"] / elapsed if elapsed else 0.0,
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Refresh the status of payments still pending from MercadoPago."
+    )
+    parser.add_argument(
+        "--older-than",
+        type=float,
+        default=settings.payment_status_refresh_after,
+        help="seconds",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=settings.payment_status_refresh_chunk_size
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.payment_status_refresh_concurrency
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=settings.payment_status_refresh_rate,
+        help="calls per second",
+    )
+    parser.add_argument("--limit", type=int, help="stop after this many payments")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="fetch statuses without writing them"
+    )
+    args = parser.parse_args(argv)
+    configure_logging()
+    refresh = PaymentStatusRefresh(
+        older_than=args.older_than,
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+        rate=args.rate,
+    )
+    report = refresh.run_once(limit=args.limit, dry_run=args.dry_run)
+    print(json.dumps(report))
+    return 1 if report["errors"] or report["aborted"] else 0
+
+
+if __name__ == "__main__":
+    # One pass from cron or by hand: python -m workers.payment_status_refresh --limit 5000
+    raise SystemExit(main())
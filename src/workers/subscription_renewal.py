@@ -0,0 +1,221 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any
+
+from config.settings import settings
+from db.models import Plan
+from db.session import BatchSessionLocal
+from gateways.mercadopago.exceptions import MercadopagoCircuitOpenError
+from gateways.mercadopago.subscriptions_service import MercadopagoSubscriptionService
+from observability.logs import configure_logging
+from services.subscription_service import SubscriptionService, current_period
+
+logger = logging.getLogger(__name__)
+
+
+class RenewalStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.renewed = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.last_run: dict[str, Any] = {}
+
+    def record(self, report: dict[str, Any]):
+        with self._lock:
+            self.runs += 1
+            self.renewed += report["renewed"]
+            self.cancelled += report["cancelled"]
+            self.errors += report["errors"]
+            self.last_run = dict(report)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "renewed": self.renewed,
+                "cancelled": self.cancelled,
+                "errors": self.errors,
+                "last_run": dict(self.last_run),
+            }
+
+
+renewal_stats = RenewalStats()
+
+
+class SubscriptionRenewal:
+    """Rolls subscription periods forward and enforces cancel-at-period-end.
+
+    Authorized subscriptions whose ``current_period_end`` has passed are read
+    in chunks of ``chunk_size`` off the (status, current_period_end) index.
+    Those flagged ``cancel_at_period_end`` are cancelled in MercadoPago with
+    ``concurrency`` parallel calls; the others move to the billing period
+    containing now, computed in calendar months or years from their billing
+    anchor. Each chunk is written in one commit. Both outcomes are
+    idempotent, so overlapping runs from several processes are harmless.
+    Subscriptions whose cancellation failed are retried on the next run, and
+    a run stops early when the preapproval circuit breaker opens.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.subscription_renewal_interval,
+        chunk_size: int = settings.subscription_renewal_chunk_size,
+        concurrency: int = settings.subscription_renewal_concurrency,
+        session_factory=BatchSessionLocal,
+        mp_subscription: MercadopagoSubscriptionService | None = None,
+    ):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.session_factory = session_factory
+        self.mp_subscription = mp_subscription or MercadopagoSubscriptionService(
+            access_token=settings.mercadopago_access_token
+        )
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="subscription-renewal", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Subscription renewal failed")
+
+    def run_once(self, now: datetime | None = None) -> dict[str, Any]:
+        now = now or datetime.utcnow()
+        report = {
+            "due": 0,
+            "renewed": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "chunks": 0,
+            "aborted": None,
+        }
+        started = time.perf_counter()
+        after = None
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="subscription-renewal"
+        ) as pool:
+            while not self._stop.is_set() and not report["aborted"]:
+                after = self._process_chunk(now, after, pool, report)
+                if after is None:
+                    break
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        renewal_stats.record(report)
+        if report["due"]:
+            logger.info("Subscription renewal: %s", report)
+        return report
+
+    def _process_chunk(
+        self,
+        now: datetime,
+        after: tuple[datetime, int] | None,
+        pool: ThreadPoolExecutor,
+        report: dict[str, Any],
+    ) -> tuple[datetime, int] | None:
+        """Renew or cancel one chunk; returns the key to continue after, or None when done."""
+        db = self.session_factory()
+        try:
+            subs = SubscriptionService(
+                db=db, mp_subscription=self.mp_subscription
+            ).get_due_subscriptions(now, after, self.chunk_size)
+            if not subs:
+                return None
+            last = (subs[-1].current_period_end, subs[-1].id)
+            plans = {
+                p.id: p
+                for p in db.query(Plan).filter(Plan.id.in_({s.plan_id for s in subs}))
+            }
+            to_cancel = [s for s in subs if s.cancel_at_period_end]
+            gateway_ids = [s.gateway_subscription_id for s in to_cancel]
+            # End the read transaction so no connection is held during the MercadoPago calls
+            db.commit()
+            results = list(pool.map(self._cancel, gateway_ids))
+            for sub, error in zip(to_cancel, results):
+                if error is None:
+                    sub.status = "cancelled"
+                    sub.cancelled_at = now
+                    report["cancelled"] += 1
+                else:
+                    report["errors"] += 1
+                    if isinstance(error, MercadopagoCircuitOpenError):
+                        report["aborted"] = "circuit_open"
+                    else:
+                        logger.warning(
+                            "Subscription %s cancellation at period end failed: %s",
+                            sub.id,
+                            error,
+                        )
+            for sub in subs:
+                if sub.cancel_at_period_end:
+                    continue
+                plan = plans[sub.plan_id]
+                anchor = (
+                    sub.billing_anchor
+                    or sub.current_period_start
+                    or sub.current_period_end
+                )
+                sub.billing_anchor = anchor
+                sub.current_period_start, sub.current_period_end = current_period(
+                    anchor, plan.interval, plan.interval_count, now
+                )
+                report["renewed"] += 1
+            db.commit()
+            report["due"] += len(subs)
+            report["chunks"] += 1
+            return last
+        finally:
+            db.close()
+
+    def _cancel(self, gateway_subscription_id: str | None) -> Exception | None:
+        if not gateway_subscription_id:
+            return None
+        try:
+            self.mp_subscription.cancel_subscription(gateway_subscription_id)
+        except Exception as e:
+            return e
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Roll ended subscription periods forward and apply pending cancellations."
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=settings.subscription_renewal_chunk_size
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.subscription_renewal_concurrency
+    )
+    args = parser.parse_args(argv)
+    configure_logging()
+    report = SubscriptionRenewal(
+        chunk_size=args.chunk_size, concurrency=args.concurrency
+    ).run_once()
+    print(json.dumps(report))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    # One pass from cron or by hand: python -m workers.subscription_renewal
+    raise SystemExit(main())
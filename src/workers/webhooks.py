@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+
+from config.settings import settings
+from db.models import WebhookEvent
+from db.session import BatchSessionLocal
+from observability.logs import configure_logging
+from gateways.mercadopago.payment_service import MercadopagoPaymentService
+from gateways.mercadopago.subscriptions_service import MercadopagoSubscriptionService
+from services.payment_service import PaymentService
+from services.subscription_service import SubscriptionService
+from services.webhook_service import (
+    PAYMENT_TOPICS,
+    SUBSCRIPTION_TOPICS,
+    WebhookInboxService,
+    purge_processed_events,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ReconciliationStats:
+    """Rows touched by the batched status writes of the webhook workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.updated = {"payments": 0, "subscriptions": 0}
+        self.not_found = {"payments": 0, "subscriptions": 0}
+
+    def record(self, payments: dict, subscriptions: dict):
+        with self._lock:
+            self.batches += 1
+            for table, result in (
+                ("payments", payments),
+                ("subscriptions", subscriptions),
+            ):
+                self.updated[table] += result["updated"]
+                self.not_found[table] += len(result["not_found"])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "updated": dict(self.updated),
+                "not_found": dict(self.not_found),
+            }
+
+
+reconciliation_stats = ReconciliationStats()
+
+
+class WebhookWorkerPool:
+    """Threads draining the webhook inbox.
+
+    Each worker claims a batch of due events with ``SELECT ... FOR UPDATE SKIP
+    LOCKED``, fetches the current resource status from MercadoPago and applies
+    it. Failed events are retried with exponential backoff until
+    ``max_attempts``; events claimed by a worker that died are picked up again
+    after ``visibility_timeout`` seconds, so nothing acknowledged is lost.
+    Idle workers delete processed events older than ``retention`` seconds, at
+    most once per ``purge_interval`` across the pool.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.webhook_worker_concurrency,
+        batch_size: int = settings.webhook_worker_batch_size,
+        poll_interval: float = settings.webhook_worker_poll_interval,
+        visibility_timeout: float = settings.webhook_worker_visibility_timeout,
+        max_attempts: int = settings.webhook_worker_max_attempts,
+        retry_backoff: float = settings.webhook_worker_retry_backoff,
+        retention: float = settings.webhook_inbox_retention,
+        purge_interval: float = 60.0,
+        session_factory=BatchSessionLocal,
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.session_factory = session_factory
+        self.mp_payment = MercadopagoPaymentService(
+            access_token=settings.mercadopago_access_token
+        )
+        self.mp_subscription = MercadopagoSubscriptionService(
+            access_token=settings.mercadopago_access_token
+        )
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._purge_lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def start(self):
+        self._stop.clear()
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._run, name=f"webhook-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+                if not processed:
+                    self.purge_if_due()
+            except Exception:
+                logger.exception("Webhook worker iteration failed")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
+
+    def purge_if_due(self) -> int:
+        """Delete processed events past ``retention``; returns how many were removed."""
+        if self.retention <= 0:
+            return 0
+        with self._purge_lock:
+            now = time.monotonic()
+            if now < self._next_purge:
+                return 0
+            self._next_purge = now + self.purge_interval
+        db = self.session_factory()
+        try:
+            purged = purge_processed_events(db, self.retention)
+        finally:
+            db.close()
+        if purged:
+            logger.info("Webhook inbox: purged %s processed events", purged)
+        return purged
+
+    def run_once(self) -> int:
+        """Claim and process one batch. Returns the number of events claimed.
+
+        Statuses are fetched per event, then written with one bulk UPDATE per
+        table for the whole batch. Re-applying a batch after a crash between
+        the status write and marking its events done is harmless.
+        """
+        db = self.session_factory()
+        try:
+            inbox = WebhookInboxService(db)
+            events = inbox.claim(self.batch_size, self.visibility_timeout)
+            payment_statuses: dict[str, str] = {}
+            subscription_statuses: dict[str, str] = {}
+            fetched: list[WebhookEvent] = []
+            for event in events:
+                try:
+                    status = self._fetch_status(event)
+                except Exception as e:
+                    logger.warning(
+                        "Webhook event %s (%s %s) failed: %s",
+                        event.id,
+                        event.topic,
+                        event.resource_id,
+                        e,
+                    )
+                    inbox.mark_failed(
+                        event, str(e), self.max_attempts, self.retry_backoff
+                    )
+                    continue
+                if status and event.topic in PAYMENT_TOPICS:
+                    payment_statuses[event.resource_id] = status
+                elif status and event.topic in SUBSCRIPTION_TOPICS:
+                    subscription_statuses[event.resource_id] = status
+                fetched.append(event)
+            if not fetched:
+                return len(events)
+            try:
+                payments = PaymentService(
+                    db=db, mp_payment=self.mp_payment
+                ).update_payment_statuses(payment_statuses)
+                subscriptions = SubscriptionService(
+                    db=db, mp_subscription=self.mp_subscription
+                ).update_subscription_statuses(subscription_statuses)
+            except Exception as e:
+                db.rollback()
+                logger.warning("Webhook batch status update failed: %s", e)
+                for event in fetched:
+                    inbox.mark_failed(
+                        event, str(e), self.max_attempts, self.retry_backoff
+                    )
+                return len(events)
+            inbox.mark_done_many(fetched)
+            reconciliation_stats.record(payments, subscriptions)
+            if payments["not_found"] or subscriptions["not_found"]:
+                logger.info(
+                    "Webhook batch: no local row for payments %s, subscriptions %s",
+                    payments["not_found"],
+                    subscriptions["not_found"],
+                )
+            return len(events)
+        finally:
+            db.close()
+
+    def _fetch_status(self, event: WebhookEvent) -> str:
+        if event.topic in PAYMENT_TOPICS:
+            return self.mp_payment.get_payment(event.resource_id).get("status", "")
+        if event.topic in SUBSCRIPTION_TOPICS:
+            return self.mp_subscription.get_subscription(event.resource_id).get(
+                "status", ""
+            )
+        return ""
+
+
+if __name__ == "__main__":
+    # Run the workers as a standalone process: python -m workers.webhooks
+    configure_logging()
+    pool = WebhookWorkerPool()
+    pool.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pool.stop()